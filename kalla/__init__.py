@@ -0,0 +1,36 @@
+"""
+Core library for the Kalla Moobel RFQ tools.
+
+Submodules import their heavy dependencies (openai, anthropic, PyPDF2, PyMuPDF,
+Pillow, pandas) only when a function that needs them is called, so importing
+this package is cheap for CLI, batch and worker processes.
+"""
+
+import importlib
+
+# Public name -> submodule that defines it, resolved on first access
+_EXPORTS = {
+    "load_api_keys": "kalla.config",
+    "load_prompt": "kalla.prompts",
+    "ANALYSIS_TYPES": "kalla.prompts",
+    "ANALYSIS_PROMPTS": "kalla.prompts",
+    "extract_text_from_pdf": "kalla.pdf",
+    "extract_text_from_pdf_path": "kalla.pdf",
+    "pdf_to_images": "kalla.pdf",
+    "encode_image_to_base64": "kalla.vision",
+    "analyze_drawing_with_openai": "kalla.vision",
+    "analyze_drawing_with_anthropic": "kalla.vision",
+    "extract_specifications_with_openai": "kalla.extraction",
+    "extract_specifications_chunked": "kalla.extraction",
+    "generate_cost_estimate": "kalla.pricing",
+    "QuoteIndex": "kalla.similarity"
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'kalla' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
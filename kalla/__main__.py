@@ -0,0 +1,5 @@
+import sys
+
+from kalla.cli import main
+
+sys.exit(main())
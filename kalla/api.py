@@ -0,0 +1,384 @@
+"""
+Headless HTTP API for specification extraction, drawing analysis and cost estimation.
+
+Run with:
+    uvicorn kalla.api:app --host 0.0.0.0 --port 8000
+"""
+
+import os
+import re
+import json
+import uuid
+import asyncio
+import tempfile
+import time
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from kalla import pdf, vision, extraction, pricing, tiling, routing, screening, export, validation, budget as budgets
+from kalla.config import load_api_keys
+from kalla.prompts import ANALYSIS_TYPES
+from kalla.providers import vision_model
+from kalla.units import to_number
+from kalla.shared import shared_store
+
+load_api_keys()
+
+# Directory where multipart uploads are streamed before processing
+UPLOAD_DIR = os.getenv("KALLA_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "kalla_uploads"))
+
+# Maximum number of model calls running at the same time across all jobs
+MAX_CONCURRENT_CALLS = int(os.getenv("KALLA_MAX_CONCURRENT_CALLS", "8"))
+
+CHUNK_SIZE = 1024 * 1024
+
+# Finished jobs are kept this long, and at most this many jobs are kept in memory
+JOB_TTL_SECONDS = float(os.getenv("KALLA_JOB_TTL_SECONDS", "3600"))
+MAX_JOBS = int(os.getenv("KALLA_MAX_JOBS", "1000"))
+
+PROVIDERS = ["openai", "anthropic"]
+
+# Render resolutions accepted for PDF drawings
+MIN_DPI = 36
+MAX_DPI = 600
+
+class JobStore:
+    """Registry of background jobs, keyed by job id.
+
+    Jobs run in the process that accepted them. With a shared store (see kalla.shared)
+    each status change is published to it, so any replica can report on any job.
+    Finished jobs are dropped after ttl seconds, oldest first once more than max_jobs
+    are held; running jobs are never dropped.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_CALLS, store=None, ttl=JOB_TTL_SECONDS, max_jobs=MAX_JOBS):
+        self.jobs = {}
+        self.store = store
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._tasks = {}
+        self._semaphore = None
+        self._max_concurrent = max_concurrent
+
+    def _limit(self):
+        # Created lazily so the semaphore binds to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        return self._semaphore
+
+    def evict(self, now=None):
+        """Drop expired finished jobs, then the oldest finished ones beyond max_jobs"""
+        now = now or time.time()
+        finished = sorted(
+            (job for job in self.jobs.values() if job["finished_at"] is not None),
+            key=lambda job: job["finished_at"]
+        )
+        excess = len(self.jobs) - self.max_jobs
+        for job in finished:
+            if now - job["finished_at"] < self.ttl and excess <= 0:
+                break
+            del self.jobs[job["job_id"]]
+            excess -= 1
+
+    def submit(self, operation, func, *args, cleanup=None, **kwargs):
+        """Run a blocking function in the thread pool and track it as a job"""
+        self.evict()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "operation": operation,
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        self.jobs[job_id] = job
+
+        async def run():
+            try:
+                await self._publish(job)
+                async with self._limit():
+                    job["status"] = "running"
+                    await self._publish(job)
+                    job["result"] = await run_in_threadpool(func, *args, **kwargs)
+                job["status"] = "completed"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = time.time()
+                try:
+                    await self._publish(job)
+                finally:
+                    self._tasks.pop(job_id, None)
+                    if cleanup:
+                        cleanup()
+
+        self._tasks[job_id] = asyncio.ensure_future(run())
+        return job
+
+    async def _publish(self, job):
+        # Store writes can wait on the SQLite lock or the network, so they run off the event loop
+        if self.store is not None:
+            await run_in_threadpool(self.store.put_job, dict(job))
+
+    async def get(self, job_id):
+        """A job started here, or one published to the shared store by another process"""
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = await run_in_threadpool(self.store.get_job, job_id)
+        return job
+
+    async def wait(self, job_id):
+        task = self._tasks.get(job_id)
+        if task:
+            await task
+        return await self.get(job_id)
+
+jobs = JobStore(store=shared_store())
+
+async def save_upload(upload):
+    """Stream an uploaded file to UPLOAD_DIR in chunks and return its path"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    safe_name = re.sub(r'[^\w\-_\.]', '_', upload.filename or "upload")
+    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}_{safe_name}")
+    with open(path, "wb") as f:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+    await upload.close()
+    return path
+
+def _remove_files(paths):
+    def cleanup():
+        for path in paths:
+            if os.path.exists(path):
+                os.unlink(path)
+    return cleanup
+
+async def _job_response(request, job):
+    """Return the job handle, or wait for the result when called with ?wait=true"""
+    if request.query_params.get("wait", "").lower() in ("1", "true", "yes"):
+        job = await jobs.wait(job["job_id"])
+        status_code = 500 if job["status"] == "failed" else 200
+        return JSONResponse(job, status_code=status_code)
+    return JSONResponse({"job_id": job["job_id"], "status": job["status"]}, status_code=202)
+
+def analyze_drawing_files(files, analysis_type="comprehensive", provider="openai", dpi=150, tile=False,
+                          local_ocr=False, hedge=False, skip_blank=False, budget=None):
+    """Analyze every page/image in a list of (name, path) pairs.
+
+    tile splits large-format sheets into regions; local_ocr adds a Tesseract pre-pass when installed;
+    hedge also sends slow or failing calls to the other provider; skip_blank reports blank and
+    cover pages as skipped instead of analyzing them. With a budget (kalla.budget.Budget) pages are
+    analyzed most informative first and skipped or degraded as it runs out; results keep file order.
+    """
+    model_used = "Anthropic Claude" if provider == "anthropic" else f"OpenAI {vision_model()}"
+    if routing.routing_enabled():
+        model_used += " (routed)"
+    if hedge:
+        model_used += " (hedged)"
+    analyze = vision.drawing_analyzer(provider, hedge=hedge, local_ocr=local_ocr, budget=budget)
+
+    def run(image, pdf_file=None, page_number=None):
+        if tile:
+            return tiling.analyze_with_tiles(image, analysis_type, analyze, pdf_file, page_number)[0]
+        return analyze(image, analysis_type)
+
+    def analyze_page(name, image, pdf_file=None, page_index=None, priority=None, **fields):
+        if skip_blank:
+            screened = screening.classify_content(image, pdf_file, page_index)
+            if screened["content"] != "drawing":
+                return screening.skipped_result(name, screened, analysis_type=analysis_type,
+                                                model_used="", **fields)
+        reason = budget.skip_reason(priority) if budget is not None else None
+        if reason:
+            return screening.skipped_result(name, budgets.skipped_screening(reason, priority),
+                                            analysis_type=analysis_type, model_used="", **fields)
+        result = {
+            "drawing_name": name,
+            "analysis_type": analysis_type,
+            "model_used": model_used,
+            "analysis_result": run(image, pdf_file, page_index)
+        }
+        result.update(fields)
+        return result
+
+    pages = []
+    for name, path in files:
+        if name.lower().endswith(".pdf"):
+            images = pdf.pdf_to_images(path, dpi=dpi)
+            for j, image in enumerate(images):
+                pages.append(dict(
+                    name=f"{name} (Page {j+1})", image=image, pdf_file=path, page_index=j,
+                    file_type="pdf", page_number=j + 1, total_pages=len(images)
+                ))
+        else:
+            from PIL import Image
+            with Image.open(path) as image:
+                image.load()
+                pages.append(dict(name=name, image=image, file_type="image"))
+
+    order = list(range(len(pages)))
+    if budget is not None:
+        for page in pages:
+            page["priority"] = budgets.page_priority(page["image"])
+        order = budgets.priority_order([page["priority"] for page in pages])
+
+    results = {i: analyze_page(**pages[i]) for i in order}
+    return [results[i] for i in range(len(pages))]
+
+def extract_specifications_from_file(path, document_type):
+    pages = pdf.extract_pages_from_pdf_path(path)
+    return extraction.extract_specifications_chunked(pages, document_type)
+
+async def _json_object(request):
+    """The request body as a JSON object, or None when it is not valid JSON or not an object"""
+    try:
+        payload = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+async def create_specifications(request):
+    """Extract specifications from an uploaded PDF ('file') or from JSON {'text': ...}"""
+    if request.headers.get("content-type", "").startswith("multipart/"):
+        async with request.form() as form:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return JSONResponse({"error": "Missing 'file' upload"}, status_code=400)
+            document_type = form.get("document_type", "specification")
+            path = await save_upload(upload)
+        job = jobs.submit(
+            "extract_specifications", extract_specifications_from_file, path, document_type,
+            cleanup=_remove_files([path])
+        )
+    else:
+        payload = await _json_object(request)
+        if payload is None:
+            return JSONResponse({"error": "Body must be a JSON object"}, status_code=400)
+        if not payload.get("text") or not isinstance(payload["text"], (str, list)):
+            return JSONResponse({"error": "Provide 'text' or a multipart 'file'"}, status_code=400)
+        job = jobs.submit(
+            "extract_specifications", extraction.extract_specifications_chunked,
+            payload["text"], payload.get("document_type", "specification")
+        )
+    return await _job_response(request, job)
+
+async def create_drawing_analysis(request):
+    """Analyze uploaded drawings ('files', images or PDFs) with the selected provider"""
+    async with request.form() as form:
+        uploads = [u for u in form.getlist("files") if not isinstance(u, str)]
+        if not uploads:
+            return JSONResponse({"error": "Missing 'files' upload"}, status_code=400)
+        analysis_type = form.get("analysis_type", "comprehensive")
+        if analysis_type not in ANALYSIS_TYPES:
+            return JSONResponse({"error": f"Unknown analysis_type '{analysis_type}'"}, status_code=400)
+        provider = form.get("provider", "openai")
+        if provider not in PROVIDERS:
+            return JSONResponse({"error": f"Unknown provider '{provider}'"}, status_code=400)
+        try:
+            dpi = int(form.get("dpi") or 150)
+        except ValueError:
+            return JSONResponse({"error": "dpi must be an integer"}, status_code=400)
+        if not MIN_DPI <= dpi <= MAX_DPI:
+            return JSONResponse({"error": f"dpi must be between {MIN_DPI} and {MAX_DPI}"}, status_code=400)
+        tile = form.get("tile", "").lower() in ("1", "true", "yes")
+        local_ocr = form.get("ocr", "").lower() in ("1", "true", "yes")
+        hedge = form.get("hedge", "").lower() in ("1", "true", "yes")
+        skip_blank = form.get("skip_blank", "").lower() in ("1", "true", "yes")
+        try:
+            budget = budgets.Budget.from_env(
+                int(form.get("budget_tokens") or 0), float(form.get("budget_eur") or 0),
+                float(form.get("budget_seconds") or 0)
+            )
+        except ValueError:
+            return JSONResponse({"error": "Budgets must be numbers"}, status_code=400)
+        files = [(upload.filename or "upload", await save_upload(upload)) for upload in uploads]
+
+    job = jobs.submit(
+        "analyze_drawing", analyze_drawing_files,
+        files, analysis_type, provider, dpi, tile, local_ocr, hedge, skip_blank, budget,
+        cleanup=_remove_files([path for _, path in files])
+    )
+    return await _job_response(request, job)
+
+def checked_cost_estimate(spec_data, material_db, drawing_analyses=None):
+    """Model estimate with its arithmetic reconciled (see validation.checked_estimate)"""
+    return validation.checked_estimate(
+        lambda: pricing.generate_cost_estimate(spec_data, material_db, drawing_analyses),
+        pieces=to_number((spec_data or {}).get("quantity"), 1.0) or 1.0
+    )
+
+async def create_estimate(request):
+    """Generate a cost estimate from JSON {'spec_data', 'material_db', 'drawing_analyses'}"""
+    payload = await _json_object(request)
+    if payload is None:
+        return JSONResponse({"error": "Body must be a JSON object"}, status_code=400)
+    if "spec_data" not in payload:
+        return JSONResponse({"error": "Missing 'spec_data'"}, status_code=400)
+    if not isinstance(payload["spec_data"], dict) or not isinstance(payload.get("material_db") or {}, dict):
+        return JSONResponse({"error": "'spec_data' and 'material_db' must be objects"}, status_code=400)
+    if not isinstance(payload.get("drawing_analyses") or [], list):
+        return JSONResponse({"error": "'drawing_analyses' must be a list"}, status_code=400)
+    job = jobs.submit("generate_cost_estimate", checked_cost_estimate,
+                      payload["spec_data"], payload.get("material_db") or {}, payload.get("drawing_analyses"))
+    return await _job_response(request, job)
+
+def _iter_file(spool):
+    try:
+        while True:
+            chunk = spool.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
+
+async def create_export(request):
+    """Export JSON {'quotes', 'drawing_analyses', 'format', 'table'} as zip/xlsx/parquet/csv"""
+    payload = await _json_object(request)
+    if payload is None:
+        return JSONResponse({"error": "Body must be a JSON object"}, status_code=400)
+    if not all(isinstance(payload.get(field) or [], list) for field in ("quotes", "drawing_analyses")):
+        return JSONResponse({"error": "'quotes' and 'drawing_analyses' must be lists"}, status_code=400)
+    export_format = payload.get("format", "zip")
+    if export_format not in export.available_formats():
+        return JSONResponse({"error": f"Unsupported export format '{export_format}'"}, status_code=400)
+    table = payload.get("table")
+    if table is not None and (not isinstance(table, str) or table not in export.COLUMNS):
+        return JSONResponse({"error": f"Unknown table '{table}'"}, status_code=400)
+
+    spool = await run_in_threadpool(
+        export.export_file, export_format,
+        payload.get("quotes"), payload.get("drawing_analyses"), table
+    )
+    return StreamingResponse(
+        _iter_file(spool),
+        media_type=export.EXPORT_MIME[export_format],
+        headers={"Content-Disposition": f'attachment; filename="kalla_export.{export_format}"'}
+    )
+
+async def get_job(request):
+    job = await jobs.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job)
+
+app = Starlette(routes=[
+    Route("/health", health),
+    Route("/specifications", create_specifications, methods=["POST"]),
+    Route("/drawings/analyze", create_drawing_analysis, methods=["POST"]),
+    Route("/estimates", create_estimate, methods=["POST"]),
+    Route("/exports", create_export, methods=["POST"]),
+    Route("/jobs/{job_id}", get_job)
+])
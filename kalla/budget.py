@@ -0,0 +1,226 @@
+"""
+Cost and latency budgets per RFQ.
+
+A Budget caps the tokens, spend (EUR) and wall time of one RFQ's model calls. Every
+vision call made through a budgeted analyzer is charged. Before the call, its input
+tokens are estimated from the image size and its full output allowance is reserved
+in the same step as the limit check, so concurrent calls (tiles, parallel pages)
+overshoot a limit by at most one call each. Afterwards the reservation is
+settled against the length of the answer. Specification extraction and the cost
+estimate are charged the same way from their text. Spend uses MODEL_PRICES. Provider
+usage fields are not read, so the figures are estimates.
+
+Drawing pages are analyzed most informative first (by ink share), so whatever is
+degraded or skipped is the least useful part of the set. Once any limit is
+KALLA_BUDGET_DEGRADE_AT used (default 0.8), calls degrade: images are downscaled to
+KALLA_BUDGET_DEGRADED_PIXELS, the small model is used, and pages with less than
+KALLA_BUDGET_LOW_VALUE_INK ink are skipped. Once a limit is reached the remaining
+pages are skipped and reported. KALLA_BUDGET_ESTIMATE_RESERVE of each limit is held
+back from drawings for the cost estimate, which always runs.
+"""
+
+import os
+import json
+import time
+import threading
+
+# Default limits; 0 means unlimited
+BUDGET_TOKENS = int(os.getenv("KALLA_BUDGET_TOKENS", "0"))
+BUDGET_EUR = float(os.getenv("KALLA_BUDGET_EUR", "0"))
+BUDGET_SECONDS = float(os.getenv("KALLA_BUDGET_SECONDS", "0"))
+
+# Share of a limit after which calls degrade, and share held back for the cost estimate
+DEGRADE_AT = float(os.getenv("KALLA_BUDGET_DEGRADE_AT", "0.8"))
+ESTIMATE_RESERVE = float(os.getenv("KALLA_BUDGET_ESTIMATE_RESERVE", "0.15"))
+
+DEGRADED_PIXELS = int(os.getenv("KALLA_BUDGET_DEGRADED_PIXELS", "1024"))
+LOW_VALUE_INK = float(os.getenv("KALLA_BUDGET_LOW_VALUE_INK", "0.01"))
+
+# Output allowance of one drawing call (max_tokens in kalla.vision) and the prompt around the image
+VISION_OUTPUT_TOKENS = 1000
+PROMPT_TOKENS = 300
+
+# Approximate EUR per million (input, output) tokens; override with KALLA_MODEL_PRICES as JSON
+MODEL_PRICES = {
+    "gpt-4o": (2.3, 9.2),
+    "gpt-4o-mini": (0.14, 0.55),
+    "gpt-4.1": (1.85, 7.4),
+    "gpt-4.1-mini": (0.37, 1.5),
+    "claude-3-sonnet-20240229": (2.8, 14.0),
+    "claude-3-haiku-20240307": (0.23, 1.15)
+}
+MODEL_PRICES.update(json.loads(os.getenv("KALLA_MODEL_PRICES", "{}")))
+DEFAULT_PRICE = (5.0, 15.0)
+
+def model_price(model):
+    return tuple(MODEL_PRICES.get(model, DEFAULT_PRICE))
+
+def text_tokens(value):
+    """Rough token count of text or JSON (about four characters per token)"""
+    if value is None:
+        return 0
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return len(text) // 4 + 1
+
+def image_tokens(image):
+    """Input tokens of an image at high detail: 170 per 512 px tile after scaling to 2048 and 768 px, plus 85"""
+    width, height = image.size
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * (-(-int(width) // 512)) * (-(-int(height) // 512))
+
+class Budget:
+    """Tokens, spend and wall time of one RFQ against optional limits; thread-safe"""
+
+    def __init__(self, max_tokens=None, max_cost=None, max_seconds=None):
+        self.max_tokens = max_tokens or None
+        self.max_cost = max_cost or None
+        self.max_seconds = max_seconds or None
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.cost = 0.0
+        self.calls = 0
+        self.degraded_calls = 0
+        self.skipped_pages = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, max_tokens=None, max_cost=None, max_seconds=None):
+        """Budget with the given limits, falling back to KALLA_BUDGET_*; None when nothing is limited"""
+        budget = cls(max_tokens or BUDGET_TOKENS, max_cost or BUDGET_EUR, max_seconds or BUDGET_SECONDS)
+        return budget if budget.limited() else None
+
+    def limited(self):
+        return any((self.max_tokens, self.max_cost, self.max_seconds))
+
+    def seconds(self):
+        return time.monotonic() - self.started
+
+    def _shares(self):
+        # Used share of each limit; call with the lock held
+        return {
+            "tokens": self.tokens / self.max_tokens if self.max_tokens else 0.0,
+            "spend": self.cost / self.max_cost if self.max_cost else 0.0,
+            "time": self.seconds() / self.max_seconds if self.max_seconds else 0.0
+        }
+
+    def used(self):
+        """Largest used share of any limit"""
+        with self._lock:
+            return max(self._shares().values())
+
+    def exhausted(self, reserve=0.0):
+        return self.limited() and self.used() >= 1.0 - reserve
+
+    def degrading(self, reserve=0.0):
+        return self.limited() and self.used() >= DEGRADE_AT * (1.0 - reserve)
+
+    def _add(self, model, input_tokens, output_tokens, call):
+        # Call with the lock held
+        input_price, output_price = model_price(model)
+        self.tokens += input_tokens + output_tokens
+        self.cost += (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+        self.calls += call
+
+    def charge(self, model, input_tokens=0, output_tokens=0, call=False):
+        """Add (or, with negative counts, release) tokens and their price"""
+        with self._lock:
+            self._add(model, input_tokens, output_tokens, call)
+
+    def reserve(self, model, input_tokens, output_tokens, reserve=0.0):
+        """Charge a call about to be made unless the budget is exhausted; checked and charged in one step,
+        so concurrent calls cannot all pass the check before any of them is charged"""
+        with self._lock:
+            if self.limited() and max(self._shares().values()) >= 1.0 - reserve:
+                return False
+            self._add(model, input_tokens, output_tokens, True)
+            return True
+
+    def charge_text(self, model, prompt, output):
+        """Charge a text model call from its prompt and answer"""
+        self.charge(model, text_tokens(prompt), text_tokens(output), call=True)
+
+    def charge_image(self, model, image, output):
+        """Charge a vision call made outside analyzer() from its image and answer"""
+        self.charge(model, PROMPT_TOKENS + image_tokens(image), text_tokens(output), call=True)
+
+    def reason(self):
+        """Why pages are being skipped, e.g. 'RFQ budget exhausted (tokens 100%)'"""
+        with self._lock:
+            name, share = max(self._shares().items(), key=lambda item: item[1])
+        return f"RFQ budget exhausted ({name} {share:.0%})"
+
+    def skip_reason(self, priority=None, reserve=ESTIMATE_RESERVE):
+        """Reason to skip a drawing page of the given priority (ink share) before calling a model, or None"""
+        reason = None
+        if self.exhausted(reserve):
+            reason = self.reason()
+        elif priority is not None and priority < LOW_VALUE_INK and self.degrading(reserve):
+            reason = f"low-value page skipped to stay within the RFQ budget ({priority:.1%} ink)"
+        if reason:
+            with self._lock:
+                self.skipped_pages += 1
+        return reason
+
+    def report(self):
+        """Usage and limits for output alongside results"""
+        with self._lock:
+            return {
+                "tokens": self.tokens,
+                "cost_eur": round(self.cost, 4),
+                "seconds": round(self.seconds(), 2),
+                "calls": self.calls,
+                "degraded_calls": self.degraded_calls,
+                "skipped_pages": self.skipped_pages,
+                "limits": {"tokens": self.max_tokens, "cost_eur": self.max_cost, "seconds": self.max_seconds}
+            }
+
+    def analyzer(self, analyze, provider="openai", reserve=ESTIMATE_RESERVE):
+        """Wrap a vision call (image, analysis_type, note=None, model=None) with charging and degradation"""
+        from kalla import routing
+
+        small, large = routing.models("vision", provider)
+
+        def analyze_budgeted(image, analysis_type, note=None, model=None):
+            model = model or large
+            degraded = self.degrading(reserve)
+            if degraded:
+                image = image.copy()
+                image.thumbnail((DEGRADED_PIXELS, DEGRADED_PIXELS))
+                model = small
+
+            # Reserve the full output allowance until the answer's length is known
+            if not self.reserve(model, PROMPT_TOKENS + image_tokens(image), VISION_OUTPUT_TOKENS, reserve):
+                return f"Error: {self.reason()}"
+            if degraded:
+                with self._lock:
+                    self.degraded_calls += 1
+            output_tokens = 0
+            try:
+                result = analyze(image, analysis_type, note=note, model=model)
+                output_tokens = text_tokens(result)
+            finally:
+                # Replace the reservation with the answer's length; a call that raised releases all of it
+                self.charge(model, 0, output_tokens - VISION_OUTPUT_TOKENS)
+            return result
+        return analyze_budgeted
+
+# Render resolution used to rank PDF pages that have not been rendered yet
+PRIORITY_DPI = 36
+
+def page_priority(image, screening=None):
+    """How informative a page is likely to be: its ink share, taken from its screening when available"""
+    if screening and screening.get("ink") is not None:
+        return screening["ink"]
+    from kalla.screening import ink_density
+    return ink_density(image)
+
+def priority_order(priorities):
+    """Indices of priorities, most informative first"""
+    return sorted(range(len(priorities)), key=lambda i: priorities[i], reverse=True)
+
+def skipped_screening(reason, priority=None):
+    """Screening entry for a page skipped by the budget, for kalla.screening.skipped_result"""
+    return {"content": "budget", "reason": reason, "ink": priority}
@@ -0,0 +1,85 @@
+import os
+import json
+import tempfile
+import hashlib
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def image_digest(image):
+    """SHA-256 of a PIL image's pixels, size and mode"""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def cache_key(*parts):
+    """Stable key for any JSON-serializable combination of inputs"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """JSON result cache stored as one file per key; a cache without a directory is a no-op"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set(self, key, value):
+        if not self.directory:
+            return value
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial entry; the name is
+        # unique per write, so threads and processes storing the same key do not share a temporary file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f, default=str)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return value
+
+class MemoryCache:
+    """In-process cache with the same get/set interface as DiskCache.
+
+    With max_entries, the least recently used entry is dropped once the cache is full.
+    """
+
+    def __init__(self, max_entries=None):
+        self.entries = {}
+        self.max_entries = max_entries
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None and self.max_entries:
+            # Dicts keep insertion order, so re-inserting marks the entry as recently used
+            self.entries[key] = self.entries.pop(key)
+        return value
+
+    def set(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if self.max_entries:
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+        return value
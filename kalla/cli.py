@@ -0,0 +1,458 @@
+"""
+Command-line interface for scripted estimation.
+
+Usage:
+    python -m kalla estimate spec.pdf drawings/*.pdf --jobs 8 --format csv -o quote.csv
+    python -m kalla analyze drawings/*.pdf --analysis-type dimensions
+    python -m kalla export quotes/quote_history.json quote.json --format zip -o quotes.zip
+    python -m kalla stub --record --cassette rfq.jsonl
+    python -m kalla load --cassette rfq.jsonl --users 20 drawings/
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kalla import pdf, vision, extraction, pricing, nesting, tiling, ocr, routing, screening, export, validation, loadtest
+from kalla import budget as budgets
+from kalla.cache import DiskCache, cache_key, file_digest
+from kalla.config import load_api_keys
+from kalla.prompts import ANALYSIS_TYPES
+from kalla.providers import text_model, vision_model, ANTHROPIC_MODEL
+from kalla.similarity import QUOTE_HISTORY_PATH
+from kalla.units import to_number
+from kalla.shared import shared_cache
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff")
+
+class Progress:
+    """Thread-safe '[done/total] message' reporting on stderr"""
+
+    def __init__(self, total, enabled=True):
+        self.total = total
+        self.done = 0
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def step(self, message):
+        with self._lock:
+            self.done += 1
+            if self.enabled:
+                print(f"[{self.done}/{self.total}] {message}", file=sys.stderr, flush=True)
+
+def expand_drawings(paths):
+    """Turn drawing paths (files or directories) into one work unit per image or PDF page"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(IMAGE_EXTENSIONS + (".pdf",))
+            )
+        else:
+            files.append(path)
+
+    units = []
+    for path in files:
+        name = os.path.basename(path)
+        digest = file_digest(path)
+        if name.lower().endswith(".pdf"):
+            total_pages = pdf.pdf_page_count(path)
+            for page_number in range(1, total_pages + 1):
+                units.append({
+                    "drawing_name": f"{name} (Page {page_number})",
+                    "path": path,
+                    "digest": digest,
+                    "file_type": "pdf",
+                    "page_number": page_number,
+                    "total_pages": total_pages
+                })
+        else:
+            units.append({"drawing_name": name, "path": path, "digest": digest, "file_type": "image"})
+    return units
+
+def model_label(provider, model):
+    if routing.routing_enabled():
+        small, large = routing.models("vision", provider)
+        return f"{'Anthropic' if provider == 'anthropic' else 'OpenAI'} {small}/{large} (routed)"
+    return "Anthropic Claude" if provider == "anthropic" else f"OpenAI {model}"
+
+def text_models():
+    """Text model(s) that can produce an extraction, for cache keys"""
+    return list(routing.models("text")) if routing.routing_enabled() else text_model()
+
+def analyze_unit(unit, analysis_type, provider, dpi, cache, tile=False, local_ocr=False, hedge=False,
+                 skip_blank=False, budget=None):
+    """Analyze one image or PDF page, reusing a cached result when the inputs are unchanged.
+
+    With a budget (kalla.budget.Budget) the model calls are charged to it, and the page is
+    skipped when the budget is spent or nearly spent and the page is low-value.
+    """
+    model = ANTHROPIC_MODEL if provider == "anthropic" else vision_model()
+    key_parts = ["drawing", unit["digest"], unit.get("page_number"), dpi, analysis_type, provider, model]
+    if tile:
+        key_parts.append(["tiles", tiling.LARGE_FORMAT_MM, tiling.TILE_DPI, tiling.MAX_TILES])
+    if routing.routing_enabled():
+        key_parts.append(["routing", routing.models("vision", provider)])
+    if hedge:
+        key_parts.append("hedged")
+    if local_ocr and ocr.ocr_available():
+        key_parts.append(["ocr", ocr.MIN_CONFIDENCE, ocr.HINTED_IMAGE_PIXELS, ocr.LOCAL_ANALYSIS_TYPES])
+    key = cache_key(*key_parts)
+    analysis_result = cache.get(key)
+    result = {k: v for k, v in unit.items() if k not in ("path", "digest", "priority")}
+
+    if analysis_result is None:
+        reason = budget.skip_reason(unit.get("priority")) if budget is not None else None
+        if reason:
+            result.update(screening.skipped_result(unit["drawing_name"],
+                                                   budgets.skipped_screening(reason, unit.get("priority")),
+                                                   analysis_type=analysis_type, model_used=""))
+            return result
+
+        if unit["file_type"] == "pdf":
+            image = pdf.render_pdf_page(unit["path"], unit["page_number"] - 1, dpi=dpi)
+        else:
+            from PIL import Image
+            image = Image.open(unit["path"])
+
+        if skip_blank:
+            screened = screening.classify_content(
+                image,
+                pdf_file=unit["path"] if unit["file_type"] == "pdf" else None,
+                page_number=unit["page_number"] - 1 if unit["file_type"] == "pdf" else None
+            )
+            if screened["content"] != "drawing":
+                result.update(screening.skipped_result(unit["drawing_name"], screened,
+                                                       analysis_type=analysis_type, model_used=""))
+                return result
+
+        analyze = vision.drawing_analyzer(provider, hedge=hedge, local_ocr=local_ocr, budget=budget)
+
+        if tile:
+            analysis_result, _ = tiling.analyze_with_tiles(
+                image, analysis_type, analyze,
+                pdf_file=unit["path"] if unit["file_type"] == "pdf" else None,
+                page_number=unit["page_number"] - 1 if unit["file_type"] == "pdf" else None
+            )
+        else:
+            analysis_result = analyze(image, analysis_type)
+
+        # Error strings are returned rather than raised, so keep them out of the cache,
+        # and so are results that may come from a downscaled image or the small model
+        degraded = budget is not None and budget.degrading(budgets.ESTIMATE_RESERVE)
+        if isinstance(analysis_result, str) and not analysis_result.startswith("Error") and not degraded:
+            cache.set(key, analysis_result)
+
+    result.update({
+        "analysis_type": analysis_type,
+        "model_used": model_label(provider, model) + (" (hedged)" if hedge else ""),
+        "analysis_result": analysis_result
+    })
+    return result
+
+def extract_spec(path, cache, budget=None):
+    key = cache_key("specification", file_digest(path), text_models())
+    spec_data = cache.get(key)
+    if spec_data is None:
+        pages = pdf.extract_pages_from_pdf_path(path)
+        spec_data = cache.set(key, extraction.extract_specifications_chunked(pages, "specification"))
+        if budget is not None:
+            budget.charge_text(text_model(), pages, spec_data)
+    return spec_data
+
+def extract_items(path, cache, budget=None):
+    key = cache_key("items", file_digest(path), text_models())
+    item_list = cache.get(key)
+    if item_list is None:
+        pages = pdf.extract_pages_from_pdf_path(path)
+        item_list = cache.set(key, extraction.extract_items_chunked(pages, "specification"))
+        if budget is not None:
+            budget.charge_text(text_model(), pages, item_list)
+    return item_list
+
+def estimate(spec_data, material_db, drawing_analyses, cache, budget=None):
+    key = cache_key("estimate", spec_data, material_db, drawing_analyses, text_model(), "reconciled")
+    cost_estimate = cache.get(key)
+    if cost_estimate is None:
+        cost_estimate = cache.set(key, validation.checked_estimate(
+            lambda: pricing.generate_cost_estimate(spec_data, material_db, drawing_analyses),
+            pieces=to_number((spec_data or {}).get("quantity"), 1.0) or 1.0
+        ))
+        # The estimate always runs; the budget keeps ESTIMATE_RESERVE free for it
+        if budget is not None:
+            budget.charge_text(text_model(), [spec_data, material_db, drawing_analyses], cost_estimate)
+    return cost_estimate
+
+def unit_priority(unit):
+    """Ink share of an image or PDF page, rendered at low resolution"""
+    if unit["file_type"] == "pdf":
+        image = pdf.render_pdf_page(unit["path"], unit["page_number"] - 1, dpi=budgets.PRIORITY_DPI)
+    else:
+        from PIL import Image
+        image = Image.open(unit["path"])
+    return budgets.page_priority(image)
+
+def run_analyses(args, cache, progress, executor):
+    units = expand_drawings(args.drawings)
+    progress.total += len(units)
+
+    # Under a budget the most informative pages go first, so any degraded or skipped pages are the least useful
+    order = list(range(len(units)))
+    if args.budget is not None:
+        for unit, priority in zip(units, executor.map(unit_priority, units)):
+            unit["priority"] = priority
+        order = budgets.priority_order([unit["priority"] for unit in units])
+
+    def run(unit):
+        try:
+            result = analyze_unit(unit, args.analysis_type, args.provider, args.dpi, cache, tile=args.tile,
+                                  local_ocr=args.ocr, hedge=args.hedge, skip_blank=args.skip_blank,
+                                  budget=args.budget)
+        except Exception as e:
+            result = {k: v for k, v in unit.items() if k not in ("path", "digest", "priority")}
+            result.update({"analysis_type": args.analysis_type, "analysis_result": f"Error: {e}"})
+        progress.step(f"analyzed {unit['drawing_name']}")
+        return result
+
+    results = dict(zip(order, executor.map(run, [units[i] for i in order])))
+    return [results[i] for i in range(len(units))]
+
+def write_output(result, output_format, stream):
+    if output_format == "json":
+        json.dump(result, stream, indent=2, default=str)
+        stream.write("\n")
+        return
+
+    writer = csv.writer(stream)
+    if "items" in result:
+        columns = list(result["items"][0]) if result["items"] else ["item_id"]
+        writer.writerow(columns)
+        for item in result["items"]:
+            writer.writerow([item.get(column) for column in columns])
+        return
+
+    cost_estimate = result.get("cost_estimate")
+    if cost_estimate is None:
+        writer.writerow(["drawing_name", "analysis_type", "model_used", "analysis_result"])
+        for analysis in result.get("drawing_analyses", []):
+            writer.writerow([analysis.get(column) for column in
+                             ("drawing_name", "analysis_type", "model_used", "analysis_result")])
+        return
+
+    writer.writerow(["section", "item", "specification", "quantity", "unit_cost", "total_cost"])
+    for line in cost_estimate.get("material_costs") or []:
+        writer.writerow(["material", line.get("item"), line.get("specification"),
+                         line.get("quantity"), line.get("unit_cost"), line.get("total_cost")])
+    for line in cost_estimate.get("labor_costs") or []:
+        writer.writerow(["labor", line.get("operation"), "", line.get("hours"),
+                         line.get("hourly_rate"), line.get("total_cost")])
+    for section in ("overhead_costs", "profit_margin"):
+        block = cost_estimate.get(section) or {}
+        writer.writerow([section, "", block.get("percentage"), "", "", block.get("amount")])
+    writer.writerow(["total", "", "", cost_estimate.get("price_per_unit"), "", cost_estimate.get("total_cost")])
+
+# Function to pick the result cache: --cache-dir, else the shared store when one is configured
+def result_cache(cache_dir):
+    if cache_dir:
+        return DiskCache(cache_dir)
+    return shared_cache("cli", fallback=DiskCache(None))
+
+def command_estimate(args):
+    cache = result_cache(args.cache_dir)
+    progress = Progress(total=2, enabled=not args.quiet)
+
+    material_db = {}
+    if args.material_db:
+        with open(args.material_db, "r") as f:
+            material_db = json.load(f)
+
+    if args.items:
+        return estimate_items(args, cache, progress, material_db)
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        # Spec extraction runs alongside the drawing pages in the same pool
+        spec_future = executor.submit(extract_spec, args.spec, cache, args.budget)
+        drawing_analyses = run_analyses(args, cache, progress, executor)
+        spec_data = spec_future.result()
+        progress.step(f"extracted specifications from {os.path.basename(args.spec)}")
+
+    # Skipped blank and cover pages stay in the output but are not priced
+    priced_analyses = [analysis for analysis in drawing_analyses if not analysis.get("skipped")]
+    cost_estimate = estimate(spec_data, material_db, priced_analyses, cache, args.budget)
+    progress.step("generated cost estimate")
+
+    return {
+        "specifications": spec_data,
+        "drawing_analyses": drawing_analyses,
+        "cost_estimate": cost_estimate
+    }
+
+def estimate_items(args, cache, progress, material_db):
+    """Multi-item mode: extract every furniture line and price them all locally"""
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        items_future = executor.submit(extract_items, args.spec, cache, args.budget)
+        drawing_analyses = run_analyses(args, cache, progress, executor)
+        item_list = items_future.result()
+        progress.step(f"extracted {len(item_list.get('items') or [])} items from {os.path.basename(args.spec)}")
+
+    priced = pricing.price_items(item_list.get("items"), material_db)
+    nested = nesting.nest_materials(nesting.parts_from_items(item_list.get("items")), material_db)
+    progress.step("priced items")
+
+    return {
+        "project_name": item_list.get("project_name"),
+        "items": json.loads(priced["items"].to_json(orient="records")),
+        "totals": priced["totals"],
+        "nesting": nested,
+        "drawing_analyses": drawing_analyses
+    }
+
+def command_analyze(args):
+    cache = result_cache(args.cache_dir)
+    progress = Progress(total=0, enabled=not args.quiet)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        return {"drawing_analyses": run_analyses(args, cache, progress, executor)}
+
+def load_export_inputs(paths):
+    """Quotes and drawing analyses from quote history files and JSON output of estimate/analyze"""
+    quotes = []
+    drawing_analyses = []
+    for path in paths:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            quotes.extend(data)
+            continue
+        if data.get("cost_estimate") is not None:
+            quotes.append({
+                "timestamp": None,
+                "specifications": data.get("specifications"),
+                "cost_estimate": data["cost_estimate"]
+            })
+        drawing_analyses.extend(data.get("drawing_analyses") or [])
+    return quotes, drawing_analyses
+
+def command_export(args):
+    quotes, drawing_analyses = load_export_inputs(args.inputs or [QUOTE_HISTORY_PATH])
+    export.write_export(args.output, args.format, quotes, drawing_analyses, table=args.table)
+    if not args.quiet:
+        print(f"exported {len(quotes)} quotes and {len(drawing_analyses)} drawing analyses to {args.output}",
+              file=sys.stderr)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="kalla", description="Furniture RFQ extraction, drawing analysis and costing")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(subparser):
+        subparser.add_argument("drawings", nargs="*", help="Drawing images, PDFs or directories")
+        subparser.add_argument("--jobs", "-j", type=int, default=4, help="Parallel model calls (default: 4)")
+        subparser.add_argument("--analysis-type", choices=ANALYSIS_TYPES, default="comprehensive")
+        subparser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+        subparser.add_argument("--dpi", type=int, default=150, help="Render resolution for PDF pages")
+        subparser.add_argument("--tile", action="store_true",
+                               help="Analyze dense regions of large-format drawings as separate high-DPI crops")
+        subparser.add_argument("--hedge", action="store_true",
+                               help="Also send slow or failing drawing calls to the other provider if its key is set")
+        subparser.add_argument("--ocr", action="store_true",
+                               help="Read dimensions and labels with local Tesseract OCR first (if installed)")
+        subparser.add_argument("--skip-blank", action="store_true",
+                               help="Skip blank pages, cover sheets and text-only pages without a model call")
+        subparser.add_argument("--cache-dir", help="Directory for cached extraction and analysis results")
+        subparser.add_argument("--format", choices=["json", "csv"], default="json")
+        subparser.add_argument("--output", "-o", help="Output file (default: stdout)")
+        subparser.add_argument("--quiet", "-q", action="store_true", help="Disable progress reporting")
+        subparser.add_argument("--route", action="store_true",
+                               help="Route each page and chunk to a small or large model (same as KALLA_MODEL_ROUTING=1)")
+        subparser.add_argument("--max-tokens", type=int, help="Token budget for this run (default: KALLA_BUDGET_TOKENS)")
+        subparser.add_argument("--max-cost", type=float, help="Spend budget in EUR (default: KALLA_BUDGET_EUR)")
+        subparser.add_argument("--max-seconds", type=float, help="Wall time budget (default: KALLA_BUDGET_SECONDS)")
+
+    estimate_parser = subparsers.add_parser("estimate", help="Extract a spec, analyze drawings and price the job")
+    estimate_parser.add_argument("spec", help="Project specification PDF")
+    add_common(estimate_parser)
+    estimate_parser.add_argument("--material-db", help="Material database JSON file")
+    estimate_parser.add_argument("--items", action="store_true",
+                                 help="Extract and price every furniture line item (multi-item RFQ)")
+    estimate_parser.set_defaults(func=command_estimate)
+
+    analyze_parser = subparsers.add_parser("analyze", help="Analyze drawings only")
+    add_common(analyze_parser)
+    analyze_parser.set_defaults(func=command_analyze)
+
+    export_parser = subparsers.add_parser("export", help="Export saved quotes and analyses for BI/ERP import")
+    export_parser.add_argument("inputs", nargs="*",
+                               help="Quote history or estimate/analyze JSON files (default: the quote history)")
+    export_parser.add_argument("--format", choices=export.EXPORT_FORMATS, default="zip",
+                               help="zip and xlsx hold every table; csv and parquet hold one (see --table)")
+    export_parser.add_argument("--table", choices=list(export.COLUMNS), help="Table for csv or parquet output")
+    export_parser.add_argument("--output", "-o", required=True, help="Output file")
+    export_parser.add_argument("--quiet", "-q", action="store_true", help="Disable the summary on stderr")
+    export_parser.set_defaults(func=command_export)
+
+    stub_parser = subparsers.add_parser("stub", help="Record provider calls, or replay them from a local stub server")
+    stub_parser.add_argument("--cassette", required=True, help="JSONL file of recorded calls")
+    stub_parser.add_argument("--record", action="store_true",
+                             help="Forward calls to the real APIs and append them to the cassette")
+    stub_parser.add_argument("--host", default=loadtest.STUB_HOST)
+    stub_parser.add_argument("--port", type=int, default=loadtest.STUB_PORT)
+    loadtest.add_stub_options(stub_parser)
+    stub_parser.set_defaults(func=loadtest.command_stub)
+
+    load_parser = subparsers.add_parser("load", help="Drive simulated users through both pages against a stub")
+    load_parser.add_argument("drawings", nargs="*", help="Drawing images, PDFs or directories for the Drawing Analysis page")
+    load_parser.add_argument("--cassette", help="Recorded calls for a stub started by this command")
+    load_parser.add_argument("--stub", help="URL of a running stub instead, e.g. http://127.0.0.1:8900")
+    load_parser.add_argument("--port", type=int, default=loadtest.STUB_PORT, help="Port for the started stub")
+    load_parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users (default: 4)")
+    load_parser.add_argument("--iterations", type=int, default=1, help="Passes per user (default: 1)")
+    load_parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which users start")
+    load_parser.add_argument("--pages", nargs="+", choices=["rfq", "drawings"], default=["rfq", "drawings"])
+    load_parser.add_argument("--quiet", "-q", action="store_true", help="Disable progress reporting")
+    loadtest.add_stub_options(load_parser)
+    load_parser.set_defaults(func=loadtest.command_load)
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "load" and not (args.cassette or args.stub):
+        parser.error("load needs --cassette or --stub")
+    if args.command in ("export", "stub", "load"):
+        args.func(args)
+        return 0
+
+    if args.route:
+        os.environ["KALLA_MODEL_ROUTING"] = "1"
+
+    needs_openai = args.command == "estimate" or args.provider == "openai"
+    if needs_openai and not load_api_keys()["openai_api_key"]:
+        print("OpenAI API key not found. Add OPENAI_API_KEY to your .env file.", file=sys.stderr)
+        return 1
+
+    args.budget = budgets.Budget.from_env(args.max_tokens, args.max_cost, args.max_seconds)
+    result = args.func(args)
+
+    if args.budget is not None:
+        result["budget"] = args.budget.report()
+        if not args.quiet:
+            usage = result["budget"]
+            print(f"budget: {usage['tokens']} tokens, EUR {usage['cost_eur']:.2f}, {usage['seconds']}s, "
+                  f"{usage['degraded_calls']} degraded calls, {usage['skipped_pages']} pages skipped", file=sys.stderr)
+
+    if routing.routing_enabled() and not args.quiet:
+        for model, entry in routing.STATS.summary().items():
+            print(f"{model}: {entry['calls']} calls, {entry['escalations']} escalated, "
+                  f"{entry['mean_seconds']}s mean", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", newline="") as stream:
+            write_output(result, args.format, stream)
+    else:
+        write_output(result, args.format, sys.stdout)
+    return 0
@@ -0,0 +1,15 @@
+import os
+
+def _has_value(value):
+    return value is not None and value.strip() != ''
+
+def load_api_keys():
+    """Load API keys from the .env file into the environment and report which are present"""
+    # python-dotenv is only needed when keys are read, not on import
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    return {
+        'openai_api_key': _has_value(os.getenv("OPENAI_API_KEY")),
+        'anthropic_api_key': _has_value(os.getenv("ANTHROPIC_API_KEY"))
+    }
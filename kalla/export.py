@@ -0,0 +1,254 @@
+"""
+Bulk export of drawing analyses, specifications and quotes.
+
+Everything is flattened into four tables with fixed columns:
+
+- quotes: one row per quote with its totals
+- cost_lines: material, labor, overhead and margin lines of each quote
+- specifications: one row per extracted specification field (dotted paths such as
+  ``dimensions.length`` or ``materials.0.material_type``)
+- drawings: one row per analyzed drawing or PDF page
+
+Rows are generated lazily and written in batches, so hundreds of quotes can be
+exported without building the tables in memory. Tables can be written as CSV,
+Parquet (requires pyarrow), an Excel workbook with one sheet per table (requires
+openpyxl), or a zip bundle holding one CSV or Parquet file per table.
+"""
+
+import io
+import os
+import csv
+import zipfile
+import tempfile
+
+from kalla.units import to_number, unit_of
+
+# Rows per Parquet row group / record batch
+EXPORT_BATCH_ROWS = int(os.getenv("KALLA_EXPORT_BATCH_ROWS", "5000"))
+
+# Exports larger than this are spooled to a temporary file instead of memory
+EXPORT_SPOOL_BYTES = int(os.getenv("KALLA_EXPORT_SPOOL_BYTES", str(32 * 1024 * 1024)))
+
+EXPORT_FORMATS = ["zip", "xlsx", "parquet", "csv"]
+
+EXPORT_MIME = {
+    "zip": "application/zip",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv"
+}
+
+COLUMNS = {
+    "quotes": [
+        "quote_id", "timestamp", "project_name", "furniture_type", "quantity",
+        "total_cost", "price_per_unit", "delivery_timeline"
+    ],
+    "cost_lines": ["quote_id", "section", "item", "specification", "quantity", "unit", "unit_cost", "total_cost"],
+    "specifications": ["quote_id", "field", "value"],
+    "drawings": [
+        "drawing_name", "file_type", "page_number", "total_pages", "analysis_type",
+        "model_used", "skipped", "analysis_result"
+    ]
+}
+
+# Columns written as integers and as decimal numbers; everything else is text
+INTEGER_COLUMNS = {"quote_id", "page_number", "total_pages"}
+NUMERIC_COLUMNS = {"quantity", "total_cost", "price_per_unit", "unit_cost"}
+
+def _number(value, integer=False):
+    number = to_number(value)
+    if number is None:
+        return None
+    return int(number) if integer else float(number)
+
+def _typed(table, row):
+    """Row restricted to the table's columns, with numeric columns converted"""
+    typed = {}
+    for column in COLUMNS[table]:
+        value = row.get(column)
+        if column in INTEGER_COLUMNS or column in NUMERIC_COLUMNS:
+            value = _number(value, integer=column in INTEGER_COLUMNS)
+        elif value is not None:
+            value = str(value)
+        typed[column] = value
+    return typed
+
+def available_formats():
+    """EXPORT_FORMATS whose optional dependency is installed"""
+    from importlib.util import find_spec
+
+    required = {"xlsx": "openpyxl", "parquet": "pyarrow"}
+    return [f for f in EXPORT_FORMATS if f not in required or find_spec(required[f]) is not None]
+
+def flatten_fields(value, prefix=""):
+    """(dotted path, text) pairs for every scalar in nested dicts and lists.
+
+    Lists of plain values become one '; '-joined field.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten_fields(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        if all(not isinstance(item, (dict, list)) for item in value):
+            yield prefix, "; ".join(str(item) for item in value)
+        else:
+            for index, item in enumerate(value):
+                yield from flatten_fields(item, f"{prefix}.{index}")
+    elif value is not None:
+        yield prefix, str(value)
+
+def quote_rows(quotes):
+    for quote_id, quote in enumerate(quotes or [], start=1):
+        spec_data = quote.get("specifications") or {}
+        cost_estimate = quote.get("cost_estimate") or {}
+        yield _typed("quotes", {
+            "quote_id": quote_id,
+            "timestamp": quote.get("timestamp"),
+            "project_name": spec_data.get("project_name"),
+            "furniture_type": spec_data.get("furniture_type"),
+            "quantity": spec_data.get("quantity"),
+            "total_cost": cost_estimate.get("total_cost"),
+            "price_per_unit": cost_estimate.get("price_per_unit"),
+            "delivery_timeline": cost_estimate.get("delivery_timeline")
+        })
+
+def cost_line_rows(quotes):
+    """Cost lines in the same layout as the command line CSV estimate, with the unit of each
+    quantity ('sqm', 'sheets', 'hours') in its own column since quantities are exported as numbers"""
+    for quote_id, quote in enumerate(quotes or [], start=1):
+        cost_estimate = quote.get("cost_estimate") or {}
+        for line in cost_estimate.get("material_costs") or []:
+            yield _typed("cost_lines", {
+                "quote_id": quote_id, "section": "material", "item": line.get("item"),
+                "specification": line.get("specification"), "quantity": line.get("quantity"),
+                "unit": unit_of(line.get("quantity")) or None, "unit_cost": line.get("unit_cost"), "total_cost": line.get("total_cost")
+            })
+        for line in cost_estimate.get("labor_costs") or []:
+            yield _typed("cost_lines", {
+                "quote_id": quote_id, "section": "labor", "item": line.get("operation"),
+                "quantity": line.get("hours"), "unit": "hours", "unit_cost": line.get("hourly_rate"),
+                "total_cost": line.get("total_cost")
+            })
+        for section in ("overhead_costs", "profit_margin"):
+            block = cost_estimate.get(section)
+            if isinstance(block, dict):
+                yield _typed("cost_lines", {
+                    "quote_id": quote_id, "section": section,
+                    "specification": block.get("percentage"), "total_cost": block.get("amount")
+                })
+
+def specification_rows(quotes):
+    for quote_id, quote in enumerate(quotes or [], start=1):
+        for field, value in flatten_fields(quote.get("specifications") or {}):
+            yield {"quote_id": quote_id, "field": field, "value": value}
+
+def drawing_rows(drawing_analyses):
+    for analysis in drawing_analyses or []:
+        yield _typed("drawings", analysis)
+
+def export_tables(quotes=None, drawing_analyses=None):
+    """{table name: row iterator} for quotes ({'timestamp', 'specifications', 'cost_estimate'} dicts,
+    as saved by the RFQ page and QuoteIndex) and drawing analysis results"""
+    tables = {}
+    if quotes:
+        tables["quotes"] = quote_rows(quotes)
+        tables["cost_lines"] = cost_line_rows(quotes)
+        tables["specifications"] = specification_rows(quotes)
+    if drawing_analyses:
+        tables["drawings"] = drawing_rows(drawing_analyses)
+    return tables
+
+def write_csv(table, rows, stream):
+    """Write rows to a text stream as CSV with a header row"""
+    writer = csv.DictWriter(stream, fieldnames=COLUMNS[table])
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def parquet_schema(table):
+    import pyarrow as pa
+
+    def column_type(column):
+        if column in INTEGER_COLUMNS:
+            return pa.int64()
+        return pa.float64() if column in NUMERIC_COLUMNS else pa.string()
+
+    return pa.schema([(column, column_type(column)) for column in COLUMNS[table]])
+
+def write_parquet(table, rows, sink, batch_rows=EXPORT_BATCH_ROWS):
+    """Write rows to a path or binary stream as Parquet, one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(table)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in _batches(rows, batch_rows):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+def write_xlsx(tables, sink):
+    """Write each table to its own sheet of an Excel workbook at a path or binary stream"""
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of keeping every cell in memory
+    workbook = Workbook(write_only=True)
+    for table, rows in tables.items():
+        sheet = workbook.create_sheet(table)
+        sheet.append(COLUMNS[table])
+        for row in rows:
+            sheet.append([row[column] for column in COLUMNS[table]])
+    workbook.save(sink)
+
+def write_bundle(tables, sink, table_format="csv"):
+    """Write a zip with one CSV or Parquet file per table to a path or binary stream"""
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for table, rows in tables.items():
+            with bundle.open(f"{table}.{table_format}", "w") as member:
+                if table_format == "parquet":
+                    write_parquet(table, rows, member)
+                else:
+                    with io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                        write_csv(table, rows, text)
+
+def write_export(sink, export_format, quotes=None, drawing_analyses=None, table=None):
+    """Export quotes and drawing analyses to a path or binary stream.
+
+    'zip' and 'xlsx' hold every table; 'csv' and 'parquet' hold one table, the given
+    table or the first available one.
+    """
+    tables = export_tables(quotes, drawing_analyses)
+    if export_format == "zip":
+        return write_bundle(tables, sink)
+    if export_format == "xlsx":
+        return write_xlsx(tables, sink)
+    if export_format not in ("csv", "parquet"):
+        raise ValueError(f"Unknown export format '{export_format}'")
+
+    table = table or next(iter(tables), "drawings")
+    rows = tables.get(table) or iter(())
+    if export_format == "parquet":
+        return write_parquet(table, rows, sink)
+    if isinstance(sink, str):
+        with open(sink, "w", encoding="utf-8", newline="") as stream:
+            return write_csv(table, rows, stream)
+    stream = io.TextIOWrapper(sink, encoding="utf-8", newline="")
+    write_csv(table, rows, stream)
+    stream.flush()
+    # Leave the caller's stream open
+    stream.detach()
+
+def export_file(export_format, quotes=None, drawing_analyses=None, table=None):
+    """Export to a spooled temporary file rewound to the start, for downloads and HTTP responses"""
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    write_export(spool, export_format, quotes, drawing_analyses, table)
+    spool.seek(0)
+    return spool
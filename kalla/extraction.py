@@ -0,0 +1,384 @@
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from kalla import profiling, routing
+from kalla.prompts import load_prompt
+from kalla.providers import openai_client, text_model
+from kalla.units import to_number
+
+# Function to extract data using OpenAI
+def extract_specifications_with_openai(text, document_type, api_key=None, part=None, model=None):
+    client = openai_client(api_key)
+
+    # Get model from environment or use default
+    model = model or text_model()
+
+    system_prompt = load_prompt("rfq_analysis")
+
+    # When extracting one chunk of a long document, keep the model to what this part states
+    part_text = ""
+    if part:
+        part_text = (
+            f"This is part {part[0]} of {part[1]} of the document. Extract only what this part states "
+            "and leave fields that it does not mention empty."
+        )
+
+    user_prompt = f"""
+    Extract all relevant furniture manufacturing specifications from this {document_type} document.
+    {part_text}
+    The document text is provided below:
+
+    {text}
+
+    Return the extracted information as a JSON object with the following structure:
+    {{
+        "project_name": "Project name or identifier",
+        "furniture_type": "Type of furniture (e.g., table, chair, cabinet)",
+        "dimensions": {{
+            "length": "Length in mm",
+            "width": "Width in mm",
+            "height": "Height in mm"
+        }},
+        "materials": [
+            {{
+                "material_type": "Type of material",
+                "specifications": "Material specifications",
+                "quantity": "Required quantity"
+            }}
+        ],
+        "construction_methods": [
+            "List of construction methods required"
+        ],
+        "cut_list": [
+            {{
+                "part": "Panel or component name, e.g. top, side, shelf",
+                "material": "Sheet material of the part",
+                "length": "Length in mm",
+                "width": "Width in mm",
+                "quantity": "Number of this part per piece"
+            }}
+        ],
+        "finish_requirements": "Finish specifications",
+        "quantity": "Number of pieces to manufacture",
+        "delivery_requirements": "Delivery timeline and requirements",
+        "special_features": [
+            "List of special features or customizations"
+        ],
+        "quality_standards": "Quality standards and certifications",
+        "additional_notes": "Any additional requirements or notes"
+    }}
+    """
+
+    with profiling.stage("model.openai", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+
+    return json.loads(response.choices[0].message.content)
+
+# Maximum characters of document text sent in one extraction call
+CHUNK_CHARS = int(os.getenv("KALLA_CHUNK_CHARS", "24000"))
+
+# Maximum number of chunk extractions running at the same time
+EXTRACTION_WORKERS = int(os.getenv("KALLA_EXTRACTION_WORKERS", "4"))
+
+# Identity fields take the first value found; descriptive fields collect every distinct value
+FIRST_VALUE_FIELDS = ["project_name", "furniture_type", "quantity"]
+COMBINED_TEXT_FIELDS = ["finish_requirements", "delivery_requirements", "quality_standards", "additional_notes"]
+LIST_FIELDS = ["construction_methods", "special_features"]
+
+_EMPTY_VALUES = {"", "n/a", "na", "none", "not specified", "not mentioned", "unknown", "-"}
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and value.strip().lower() in _EMPTY_VALUES)
+
+def _normalize(value):
+    return re.sub(r"\s+", " ", str(value).strip().lower())
+
+def _wrap(text, max_chars):
+    """Cut text longer than max_chars at line breaks, else at spaces, else hard"""
+    while len(text) > max_chars:
+        cut = text.rfind("\n", 0, max_chars) + 1 or text.rfind(" ", 0, max_chars) + 1 or max_chars
+        yield text[:cut]
+        text = text[cut:]
+    if text:
+        yield text
+
+def _split_section(text, max_chars):
+    """Split text that is too long for one chunk at paragraph breaks, then at lines.
+
+    Pieces keep their separators and source order, so joining them gives back text.
+    """
+    parts = re.split(r"(\n\s*\n)", text)
+    # Each paragraph with the break that follows it
+    paragraphs = [paragraph + separator for paragraph, separator in zip(parts[::2], parts[1::2] + [""])]
+
+    pieces = []
+    current = ""
+    for paragraph in paragraphs:
+        for piece in _wrap(paragraph, max_chars):
+            if current and len(current) + len(piece) > max_chars:
+                pieces.append(current)
+                current = ""
+            current += piece
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_text(pages, max_chars=CHUNK_CHARS):
+    """Group page texts into chunks of at most max_chars, keeping pages whole where possible.
+
+    Pages are joined with a newline and chunks are cut between pieces, so joining the
+    chunks gives back the document up to the newlines at chunk boundaries.
+    """
+    if isinstance(pages, str):
+        pages = [pages]
+
+    chunks = []
+    current = ""
+    for page in pages:
+        for index, section in enumerate(_split_section(page or "", max_chars)):
+            # Pieces of one page follow each other directly; a new page starts on a new line
+            joiner = "\n" if current and index == 0 else ""
+            if current and len(current) + len(joiner) + len(section) > max_chars:
+                chunks.append(current)
+                current = ""
+                joiner = ""
+            current += joiner + section
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def _merge_materials(partials):
+    """Deduplicate materials by type and specification, keeping the largest stated quantity.
+
+    Long specs often restate a requirement in a summary and in a detail section, so
+    quantities for the same material are reconciled rather than summed.
+    """
+    merged = {}
+    for partial in partials:
+        for material in partial.get("materials") or []:
+            if not isinstance(material, dict) or _is_empty(material.get("material_type")):
+                continue
+            key = (_normalize(material.get("material_type")), _normalize(material.get("specifications") or ""))
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(material)
+                continue
+            quantity = to_number(material.get("quantity"))
+            existing_quantity = to_number(existing.get("quantity"))
+            if quantity is not None and (existing_quantity is None or quantity > existing_quantity):
+                existing["quantity"] = material.get("quantity")
+    return list(merged.values())
+
+def merge_specifications(partials):
+    """Merge partial specifications from document chunks, in chunk order, deterministically"""
+    merged = {}
+
+    for field in FIRST_VALUE_FIELDS:
+        merged[field] = next((p[field] for p in partials if not _is_empty(p.get(field))), "")
+
+    merged["dimensions"] = {}
+    for axis in ("length", "width", "height"):
+        merged["dimensions"][axis] = next(
+            (p["dimensions"][axis] for p in partials
+             if isinstance(p.get("dimensions"), dict) and not _is_empty(p["dimensions"].get(axis))),
+            ""
+        )
+
+    merged["materials"] = _merge_materials(partials)
+
+    for field in LIST_FIELDS:
+        seen = set()
+        merged[field] = []
+        for partial in partials:
+            for item in partial.get(field) or []:
+                if not _is_empty(item) and _normalize(item) not in seen:
+                    seen.add(_normalize(item))
+                    merged[field].append(item)
+
+    # Cut-list parts repeated verbatim in several chunks are kept once
+    seen = set()
+    merged["cut_list"] = []
+    for partial in partials:
+        for part in partial.get("cut_list") or []:
+            key = json.dumps(part, sort_keys=True).lower()
+            if isinstance(part, dict) and key not in seen:
+                seen.add(key)
+                merged["cut_list"].append(part)
+
+    for field in COMBINED_TEXT_FIELDS:
+        values = []
+        for partial in partials:
+            value = partial.get(field)
+            if not _is_empty(value) and _normalize(value) not in [_normalize(v) for v in values]:
+                values.append(value)
+        merged[field] = "; ".join(str(v) for v in values)
+
+    return merged
+
+def _extract_chunk(extract, text, document_type, api_key, part, confident):
+    """One extraction call, routed to a small or large model when routing is enabled"""
+    if not routing.routing_enabled():
+        return extract(text, document_type, api_key=api_key, part=part)
+    return routing.route_extraction(
+        lambda model: extract(text, document_type, api_key=api_key, part=part, model=model), text, confident
+    )
+
+def _has_items(item_list):
+    return isinstance(item_list, dict) and bool(item_list.get("items"))
+
+def extract_specifications_chunked(pages, document_type, api_key=None, max_chars=CHUNK_CHARS,
+                                   max_workers=EXTRACTION_WORKERS):
+    """Extract specifications from long documents chunk by chunk in parallel and merge them.
+
+    pages may be a list of page texts or a single string. Short documents are sent in one call.
+    """
+    chunks = chunk_text(pages, max_chars=max_chars)
+    if len(chunks) <= 1:
+        return _extract_chunk(extract_specifications_with_openai, "\n".join(chunks), document_type, api_key,
+                              None, routing.extraction_confident)
+
+    def extract(indexed_chunk):
+        index, chunk = indexed_chunk
+        return _extract_chunk(extract_specifications_with_openai, chunk, document_type, api_key,
+                              (index + 1, len(chunks)), routing.extraction_confident)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(executor.map(profiling.propagate(extract), enumerate(chunks)))
+    return merge_specifications(partials)
+
+# Function to extract an item list (one entry per furniture line) using OpenAI
+def extract_items_with_openai(text, document_type, api_key=None, part=None, model=None):
+    client = openai_client(api_key)
+    model = model or text_model()
+    system_prompt = load_prompt("rfq_analysis")
+
+    part_text = ""
+    if part:
+        part_text = (
+            f"This is part {part[0]} of {part[1]} of the document. List only the items this part describes."
+        )
+
+    user_prompt = f"""
+    List every furniture item to be manufactured in this {document_type} document, one entry per
+    distinct line item (each cabinet, worktop, panel, table, etc.).
+    {part_text}
+    The document text is provided below:
+
+    {text}
+
+    For each item, give the material takeoff and operation hours for ONE piece.
+    Return the item list as a JSON object with the following structure:
+    {{
+        "project_name": "Project name or identifier",
+        "items": [
+            {{
+                "item_id": "Position or item code from the document, e.g. K-01",
+                "description": "Short item description",
+                "furniture_type": "Type of furniture",
+                "quantity": "Number of pieces",
+                "dimensions": {{
+                    "length": "Length in mm",
+                    "width": "Width in mm",
+                    "height": "Height in mm"
+                }},
+                "materials": [
+                    {{
+                        "material_type": "Type of material",
+                        "specifications": "Material specifications",
+                        "quantity": "Quantity per piece with unit, e.g. 1.2 sqm or 4 pieces"
+                    }}
+                ],
+                "parts": [
+                    {{
+                        "part": "Panel or component name, e.g. top, side, shelf",
+                        "material": "Sheet material of the part",
+                        "length": "Length in mm",
+                        "width": "Width in mm",
+                        "quantity": "Number of this part per piece"
+                    }}
+                ],
+                "operations": [
+                    {{
+                        "operation": "Manufacturing operation, e.g. cutting, assembly, finishing",
+                        "hours": "Hours per piece"
+                    }}
+                ]
+            }}
+        ]
+    }}
+    """
+
+    with profiling.stage("model.openai", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+
+    return json.loads(response.choices[0].message.content)
+
+def _item_key(item):
+    """The whole item with its text normalized, for spotting the same item in two chunks"""
+    def normalized(value):
+        if isinstance(value, dict):
+            return {str(key): normalized(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [normalized(item) for item in value]
+        return _normalize(value) if isinstance(value, str) else value
+
+    return json.dumps(normalized(item), sort_keys=True, default=str)
+
+def merge_item_lists(partials):
+    """Concatenate item lists from document chunks, dropping items repeated across chunks.
+
+    An item is a repeat only when an earlier chunk has the same item_id and every other
+    field; identical items within one chunk are separate lines and are all kept, as are
+    items without an item_id. Partials and items that are not objects are skipped.
+    """
+    partials = [partial for partial in partials if isinstance(partial, dict)]
+    project_name = next((p["project_name"] for p in partials if not _is_empty(p.get("project_name"))), "")
+    # Occurrences of each item kept so far; a chunk adds only those beyond what earlier chunks had
+    kept = {}
+    items = []
+    for partial in partials:
+        in_chunk = {}
+        for item in partial.get("items") or []:
+            if not isinstance(item, dict):
+                continue
+            if _is_empty(item.get("item_id")):
+                items.append(item)
+                continue
+            key = _item_key(item)
+            in_chunk[key] = in_chunk.get(key, 0) + 1
+            if in_chunk[key] > kept.get(key, 0):
+                kept[key] = in_chunk[key]
+                items.append(item)
+    return {"project_name": project_name, "items": items}
+
+def extract_items_chunked(pages, document_type, api_key=None, max_chars=CHUNK_CHARS,
+                          max_workers=EXTRACTION_WORKERS):
+    """Item-list counterpart of extract_specifications_chunked"""
+    chunks = chunk_text(pages, max_chars=max_chars)
+    if len(chunks) <= 1:
+        return _extract_chunk(extract_items_with_openai, "\n".join(chunks), document_type, api_key, None, _has_items)
+
+    def extract(indexed_chunk):
+        index, chunk = indexed_chunk
+        return _extract_chunk(extract_items_with_openai, chunk, document_type, api_key,
+                              (index + 1, len(chunks)), _has_items)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(executor.map(profiling.propagate(extract), enumerate(chunks)))
+    return merge_item_lists(partials)
@@ -0,0 +1,148 @@
+"""
+Hedged requests and provider failover.
+
+A call goes to the preferred provider first. If it has not answered by that
+provider's deadline (the p95 of its recent successful latencies, or
+KALLA_HEDGE_DEFAULT_SECONDS until enough calls have been seen), the same request is
+sent to the alternate provider and whichever answers first wins. Server errors,
+rate limits, timeouts and connection errors fail over immediately. The losing call
+cannot be interrupted once its HTTP request is in flight, so it is cancelled if it
+has not started and otherwise left to finish with its result discarded.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+
+from kalla import profiling
+
+# Deadline before enough latencies have been recorded, and the lower bound afterwards
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("KALLA_HEDGE_DEFAULT_SECONDS", "20"))
+MIN_DEADLINE_SECONDS = float(os.getenv("KALLA_HEDGE_MIN_SECONDS", "3"))
+
+# Recent latencies kept per provider, and how many are needed before the p95 is used
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+HEDGE_WORKERS = int(os.getenv("KALLA_HEDGE_WORKERS", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS)
+        return _executor
+
+class LatencyTracker:
+    """Recent successful call latencies per provider"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider, seconds):
+        with self._lock:
+            self.latencies.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider, q=0.95):
+        with self._lock:
+            samples = sorted(self.latencies.get(provider) or [])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def deadline(self, provider):
+        with self._lock:
+            count = len(self.latencies.get(provider) or [])
+        if count < MIN_SAMPLES:
+            return DEFAULT_DEADLINE_SECONDS
+        return max(MIN_DEADLINE_SECONDS, self.percentile(provider))
+
+LATENCY = LatencyTracker()
+
+def is_retryable(error):
+    """Server errors, rate limits, timeouts and connection failures are worth sending elsewhere"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name or isinstance(error, (TimeoutError, ConnectionError))
+
+def _is_error_result(result):
+    # The vision functions report missing keys and Anthropic failures as "Error..." strings
+    return isinstance(result, str) and result.startswith("Error")
+
+def hedged(calls, tracker=LATENCY):
+    """Run calls, a list of (provider, fn) in preference order, hedging the first with the second.
+
+    Returns the first successful result. When every call fails, the last error result
+    is returned or the last exception raised.
+    """
+    pending = {}
+    last_error = None
+    last_error_result = None
+    remaining = list(calls)
+
+    def launch():
+        provider, fn = remaining.pop(0)
+        start = time.time()
+
+        def run():
+            result = fn()
+            if not _is_error_result(result):
+                tracker.record(provider, time.time() - start)
+            return result
+        pending[_pool().submit(profiling.propagate(run))] = provider
+
+    launch()
+    deadline = time.time() + tracker.deadline(calls[0][0])
+
+    while pending:
+        timeout = max(0.0, deadline - time.time()) if remaining else None
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Primary is past its deadline: hedge with the next provider
+            launch()
+            continue
+
+        for future in done:
+            pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                if not is_retryable(e) and not pending and not remaining:
+                    raise
+                last_error = e
+                if remaining and is_retryable(e):
+                    launch()
+                continue
+
+            if _is_error_result(result):
+                last_error_result = result
+                if remaining:
+                    launch()
+                continue
+
+            for other in pending:
+                other.cancel()
+            return result
+
+    if last_error_result is not None:
+        return last_error_result
+    raise last_error
+
+def hedged_analyzer(analyzers, tracker=LATENCY):
+    """Vision callable (image, analysis_type, note=None) hedging across (provider, analyze) pairs"""
+    def analyze_hedged(image, analysis_type, note=None):
+        return hedged(
+            [(provider, partial(analyze, image, analysis_type, note=note)) for provider, analyze in analyzers],
+            tracker=tracker
+        )
+    return analyze_hedged
@@ -0,0 +1,503 @@
+"""
+Recorded provider traffic, a local replay stub and a load generator.
+
+The OpenAI and Anthropic clients read OPENAI_BASE_URL and ANTHROPIC_BASE_URL, so the
+app can be pointed at a local server without code changes:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 ANTHROPIC_BASE_URL=http://127.0.0.1:8900
+
+Record: ``python -m kalla stub --record --cassette rfq.jsonl`` forwards every call to
+the real API and appends the request/response pair to the cassette. Headers, and so
+API keys, are never written; key-like strings in bodies are replaced and base64 image
+data is reduced to a digest, which keeps cassettes small and safe to share.
+
+Replay: ``python -m kalla stub --cassette rfq.jsonl`` answers from the cassette. A
+request is matched by its redacted body first, then by any recording of the same
+model and kind (text or vision), then by endpoint, so new drawings and specs still
+get a realistic answer. Latency follows --latency (the recorded one by default),
+--error-rate injects provider-shaped 429/5xx errors, and --max-in-flight rejects
+calls over a concurrency limit with 429, like a provider rate limit.
+
+Load: ``python -m kalla load --cassette rfq.jsonl --users 20`` starts the stub,
+then drives simulated users through the RFQ Analysis and Drawing Analysis pages and
+reports latency percentiles, errors and throughput per step. Each user is a
+streamlit.testing AppTest session in its own process: AppTest swaps global Streamlit
+state on every run, so sessions cannot share a process. In-process caches and pools
+are therefore per user; set KALLA_SHARED_STORE to load the shared store as well.
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import time
+import random
+import hashlib
+import threading
+
+STUB_HOST = os.getenv("KALLA_STUB_HOST", "127.0.0.1")
+STUB_PORT = int(os.getenv("KALLA_STUB_PORT", "8900"))
+
+UPSTREAMS = {
+    "openai": os.getenv("KALLA_OPENAI_UPSTREAM", "https://api.openai.com"),
+    "anthropic": os.getenv("KALLA_ANTHROPIC_UPSTREAM", "https://api.anthropic.com")
+}
+PROVIDER_PATHS = {"/v1/chat/completions": "openai", "/v1/messages": "anthropic"}
+
+# Strings at least this long made only of base64 characters are image data
+REDACT_MIN_CHARS = 256
+
+_secret_pattern = re.compile(r"\b(sk-(?:ant-)?[A-Za-z0-9_\-]{16,})")
+_base64_pattern = re.compile(r"^(data:[\w/+.\-]+;base64,)?([A-Za-z0-9+/=\s]+)$")
+
+# Headers not forwarded upstream when recording
+HOP_HEADERS = {"host", "content-length", "connection", "accept-encoding", "transfer-encoding"}
+
+def redact(value):
+    """Copy of a request or response body with key-like strings replaced and base64 data digested"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if not isinstance(value, str):
+        return value
+    if len(value) >= REDACT_MIN_CHARS:
+        match = _base64_pattern.match(value)
+        if match:
+            digest = hashlib.sha256(match.group(2).encode()).hexdigest()[:16]
+            return f"{match.group(1) or ''}<sha256:{digest} chars:{len(match.group(2))}>"
+    return _secret_pattern.sub("<redacted>", value)
+
+def has_image(body):
+    text = json.dumps(body)
+    return '"image_url"' in text or '"type": "image"' in text
+
+def request_signature(body):
+    """(exact key, model, kind) of a request body, computed on its redacted form"""
+    redacted = redact(body)
+    key = hashlib.sha256(json.dumps(redacted, sort_keys=True).encode()).hexdigest()
+    return key, redacted.get("model"), "vision" if has_image(redacted) else "text"
+
+class Cassette:
+    """Recorded request/response pairs in a JSONL file, indexed for replay"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = []
+        self._index = {}
+        self._turns = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, entry):
+        self.entries.append(entry)
+        for match_key in self._match_keys(entry["path"], entry["key"], entry["model"], entry["kind"]):
+            self._index.setdefault(match_key, []).append(entry)
+
+    @staticmethod
+    def _match_keys(path, key, model, kind):
+        # Most to least specific
+        return [("exact", path, key), ("model", path, model, kind), ("kind", path, kind), ("path", path)]
+
+    def record(self, path, body, status, response, latency):
+        key, model, kind = request_signature(body)
+        entry = {
+            "path": path,
+            "key": key,
+            "model": model,
+            "kind": kind,
+            "request": redact(body),
+            "status": status,
+            "response": redact(response),
+            "latency": round(latency, 3)
+        }
+        with self._lock:
+            self._add(entry)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def match(self, path, body):
+        """(entry, match level) for a request, cycling through equally good recordings; (None, None) on a miss"""
+        key, model, kind = request_signature(body)
+        with self._lock:
+            for match_key in self._match_keys(path, key, model, kind):
+                entries = self._index.get(match_key)
+                if entries:
+                    turn = self._turns.get(match_key, 0)
+                    self._turns[match_key] = turn + 1
+                    return entries[turn % len(entries)], match_key[0]
+        return None, None
+
+def parse_latency(spec, rng=random):
+    """Latency function (recorded seconds -> seconds) for 'recorded', 'fixed:S', 'uniform:A,B' or 'lognormal:MEDIAN,SIGMA'"""
+    name, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",")] if args else []
+    if name == "recorded":
+        scale = values[0] if values else 1.0
+        return lambda recorded: (recorded or 0.0) * scale
+    if name == "fixed":
+        return lambda recorded: values[0]
+    if name == "uniform":
+        return lambda recorded: rng.uniform(values[0], values[1])
+    if name == "lognormal":
+        import math
+        return lambda recorded: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+def error_body(provider, status, message=None):
+    """Error payload in the provider's format"""
+    kind = {
+        404: "not_found_error", 429: "rate_limit_error", 500: "api_error", 503: "overloaded_error", 529: "overloaded_error"
+    }.get(status, "api_error")
+    message = message or f"Injected {status} from the kalla stub"
+    if provider == "anthropic":
+        return {"type": "error", "error": {"type": kind, "message": message}}
+    return {"error": {"message": message, "type": kind, "code": status}}
+
+class StubStats:
+    """Counters served on GET /stats"""
+
+    def __init__(self):
+        self.counts = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def enter(self, limit=0):
+        """Start a request; False if it would exceed limit"""
+        with self._lock:
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def summary(self):
+        with self._lock:
+            return dict(self.counts, in_flight=self.in_flight, peak_in_flight=self.peak_in_flight)
+
+def stub_app(cassette, latency="recorded", error_rate=0.0, error_statuses=(429, 500), max_in_flight=0,
+             record=False, upstreams=None, seed=None):
+    """Starlette app serving the OpenAI and Anthropic endpoints from a Cassette, or recording them when record is set"""
+    import asyncio
+
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    rng = random.Random(seed)
+    delay = parse_latency(latency, rng)
+    upstreams = upstreams or UPSTREAMS
+    stats = StubStats()
+
+    async def forward(request, provider, body):
+        import httpx
+
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_HEADERS}
+        start = time.monotonic()
+        async with httpx.AsyncClient(timeout=600) as client:
+            response = await client.post(upstreams[provider] + request.url.path, json=body, headers=headers)
+        payload = response.json()
+        cassette.record(request.url.path, body, response.status_code, payload, time.monotonic() - start)
+        stats.count("recorded")
+        return JSONResponse(payload, status_code=response.status_code)
+
+    async def provider_call(request):
+        path = request.url.path
+        provider = PROVIDER_PATHS[path]
+        body = await request.json()
+        if record:
+            return await forward(request, provider, body)
+
+        if not stats.enter(max_in_flight):
+            stats.count("rejected")
+            return JSONResponse(error_body(provider, 429), status_code=429)
+        try:
+            stats.count("requests")
+            entry, level = cassette.match(path, body)
+            await asyncio.sleep(delay(entry["latency"] if entry else None))
+            if rng.random() < error_rate:
+                status = rng.choice(error_statuses)
+                stats.count(f"injected_{status}")
+                return JSONResponse(error_body(provider, status), status_code=status)
+            if entry is None:
+                stats.count("misses")
+                return JSONResponse(error_body(provider, 404, f"No recording for {path} in the cassette"),
+                                    status_code=404)
+            stats.count(f"matched_{level}")
+            return JSONResponse(entry["response"], status_code=entry["status"])
+        finally:
+            stats.leave()
+
+    async def stats_endpoint(request):
+        return JSONResponse(dict(stats.summary(), recordings=len(cassette)))
+
+    app = Starlette(routes=[Route(path, provider_call, methods=["POST"]) for path in PROVIDER_PATHS] +
+                    [Route("/stats", stats_endpoint)])
+    app.state.stats = stats
+    return app
+
+class StubServer:
+    """Uvicorn server for a stub app on a background thread"""
+
+    def __init__(self, app, host=STUB_HOST, port=STUB_PORT):
+        import uvicorn
+
+        self.url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"Stub server could not start on {self.url}")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+def point_clients_at(url):
+    """Send OpenAI and Anthropic calls made in this process to a stub at url"""
+    os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+    os.environ["ANTHROPIC_BASE_URL"] = url
+    # The stub ignores keys, but the pages refuse to start without one
+    os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+    os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-stub")
+
+# Specification used by simulated RFQ users; its length varies per user and iteration so every run is a cache miss
+LOAD_SPEC = {
+    "project_name": "Load test table",
+    "furniture_type": "Conference Table",
+    "dimensions": {"length": "3000", "width": "1200", "height": "750"},
+    "materials": [{"material_type": "Solid Oak", "specifications": "Grade A, 25mm", "quantity": "3.6 sqm"}],
+    "quantity": "1"
+}
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages")
+
+class LoadStats:
+    """Durations and failures per step of the simulated users"""
+
+    def __init__(self):
+        self.durations = {}
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def add(self, step, seconds, error=None):
+        with self._lock:
+            self.durations.setdefault(step, []).append(seconds)
+            if error:
+                self.failures.setdefault(step, []).append(error)
+
+    def merge(self, durations, failures):
+        """Add the durations and failures of another LoadStats, e.g. from a user process"""
+        with self._lock:
+            for step, values in durations.items():
+                self.durations.setdefault(step, []).extend(values)
+            for step, values in failures.items():
+                self.failures.setdefault(step, []).extend(values)
+
+    def summary(self, elapsed):
+        import numpy as np
+
+        with self._lock:
+            steps = {}
+            for step, durations in self.durations.items():
+                p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+                steps[step] = {
+                    "count": len(durations),
+                    "errors": len(self.failures.get(step, [])),
+                    "p50": round(float(p50), 3),
+                    "p95": round(float(p95), 3),
+                    "p99": round(float(p99), 3),
+                    "max": round(max(durations), 3),
+                    "per_second": round(len(durations) / elapsed, 3) if elapsed else None
+                }
+            return {
+                "elapsed": round(elapsed, 2),
+                "steps": steps,
+                "sample_errors": {step: errors[:3] for step, errors in self.failures.items()}
+            }
+
+def _timed(stats, step, action, check):
+    start = time.monotonic()
+    try:
+        app = action()
+        error = check(app)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    stats.add(step, time.monotonic() - start, error)
+
+def _page_error(app):
+    if app.exception:
+        return app.exception[0].value
+    return None
+
+def rfq_user(stats, user, iteration, timeout=120):
+    """One pass through the RFQ Analysis page: open it, load the demo material database and generate an estimate"""
+    from streamlit.testing.v1 import AppTest
+    from kalla.similarity import QuoteIndex
+
+    spec = copy.deepcopy(LOAD_SPEC)
+    spec["dimensions"]["length"] = str(2000 + user * 10 + iteration)
+    app = AppTest.from_file(os.path.join(PAGES_DIR, "1_RFQ_Analysis.py"), default_timeout=timeout)
+    app.session_state["use_demo_data"] = True
+    app.session_state["extracted_spec_data"] = spec
+    # An empty quote index, so the estimate is not served from a similar saved quote
+    app.session_state["quote_index"] = QuoteIndex()
+
+    _timed(stats, "rfq: open", app.run, _page_error)
+    _timed(stats, "rfq: load materials", lambda: _button(app, "Load Material Database").click().run(), _page_error)
+
+    def estimate_error(app):
+        return _page_error(app) or (None if app.session_state["cost_estimate"] else "no cost estimate")
+    _timed(stats, "rfq: estimate", lambda: _button(app, "Generate Cost Estimate").click().run(), estimate_error)
+
+def drawing_user(stats, handles, timeout=300):
+    """One pass through the Drawing Analysis page with stored uploads: open it and analyze every drawing"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(PAGES_DIR, "2_Drawing_Analysis.py"), default_timeout=timeout)
+    app.session_state["uploaded_files"] = list(handles)
+    _timed(stats, "drawings: open", app.run, _page_error)
+
+    def analysis_error(app):
+        failed = [result["drawing_name"] for result in app.session_state["analysis_results"]
+                  if str(result.get("analysis_result", "")).startswith("Error")]
+        return _page_error(app) or (f"{len(failed)} page(s) failed: {failed[0]}" if failed else None)
+    _timed(stats, "drawings: analyze", lambda: _button(app, "Analyze Drawings").click().run(), analysis_error)
+
+def _button(app, label):
+    for button in app.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"No '{label}' button on the page")
+
+def drawing_handles(paths):
+    """Stored upload handles for drawing files, as the Drawing Analysis page keeps them"""
+    import mimetypes
+
+    from kalla.uploads import store_upload
+
+    handles = []
+    for path in paths:
+        with open(path, "rb") as f:
+            upload = _NamedFile(f, os.path.basename(path), mimetypes.guess_type(path)[0])
+            handles.append(store_upload(upload))
+    return handles
+
+class _NamedFile:
+    """File object with the name and type attributes of a Streamlit upload"""
+
+    def __init__(self, f, name, type):
+        self._f = f
+        self.name = name
+        self.type = type
+
+    def read(self, *args):
+        return self._f.read(*args)
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+def simulated_user(index, iterations, handles, pages, delay):
+    """Run one user's passes in a user process; returns its (durations, failures)"""
+    stats = LoadStats()
+    time.sleep(delay)
+    for iteration in range(iterations):
+        if "rfq" in pages:
+            rfq_user(stats, index, iteration)
+        if "drawings" in pages and handles:
+            drawing_user(stats, handles)
+    return stats.durations, stats.failures
+
+def run_load(users=4, iterations=1, drawings=(), pages=("rfq", "drawings"), ramp_seconds=0.0, progress=None):
+    """Drive users concurrent simulated users through the pages and return LoadStats.summary().
+
+    Users run in spawned processes, which inherit the environment, so point_clients_at
+    must be called first.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    stats = LoadStats()
+    handles = drawing_handles(drawings) if drawings else []
+
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=users, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Session starts are spread over the ramp-up
+        futures = [
+            executor.submit(simulated_user, index, iterations, handles, tuple(pages), ramp_seconds * index / users)
+            for index in range(users)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            stats.merge(*future.result())
+            if progress:
+                progress(f"[{done}/{users}] users finished")
+    return stats.summary(time.monotonic() - start)
+
+def command_stub(args):
+    cassette = Cassette(args.cassette)
+    app = stub_app(cassette, latency=args.latency, error_rate=args.error_rate,
+                   error_statuses=tuple(args.error_statuses), max_in_flight=args.max_in_flight,
+                   record=args.record, seed=args.seed)
+    mode = "recording to" if args.record else f"replaying {len(cassette)} recordings from"
+    print(f"kalla stub on http://{args.host}:{args.port}, {mode} {args.cassette}\n"
+          f"  OPENAI_BASE_URL=http://{args.host}:{args.port}/v1 ANTHROPIC_BASE_URL=http://{args.host}:{args.port}",
+          file=sys.stderr)
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+def command_load(args):
+    from kalla.cli import expand_drawings
+
+    drawings = sorted({unit["path"] for unit in expand_drawings(args.drawings)})
+    report = lambda message: print(message, file=sys.stderr, flush=True) if not args.quiet else None
+
+    def load():
+        return run_load(args.users, args.iterations, drawings, pages=args.pages, ramp_seconds=args.ramp,
+                        progress=report)
+
+    if args.stub:
+        point_clients_at(args.stub)
+        result = load()
+    else:
+        app = stub_app(Cassette(args.cassette), latency=args.latency, error_rate=args.error_rate,
+                       error_statuses=tuple(args.error_statuses), max_in_flight=args.max_in_flight, seed=args.seed)
+        with StubServer(app, port=args.port) as server:
+            point_clients_at(server.url)
+            result = load()
+            result["stub"] = app.state.stats.summary()
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+def add_stub_options(parser):
+    parser.add_argument("--latency", default="recorded",
+                        help="recorded[:SCALE], fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA (default: recorded)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with an error")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 500],
+                        help="Statuses of injected errors (default: 429 500)")
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="Answer calls beyond this many in flight with 429 (default: no limit)")
+    parser.add_argument("--seed", type=int, help="Seed for latency and error sampling")
@@ -0,0 +1,216 @@
+"""
+Sheet-material nesting and cut lists.
+
+Parts are packed onto standard sheets with a guillotine heuristic (best-area fit,
+shorter-leftover-axis split, parts sorted largest first, 90° rotation allowed, best of
+several tie-break rules), which handles hundreds of parts in milliseconds and gives
+sheet counts and yield for pricing instead of model-guessed square metres.
+"""
+
+import os
+import re
+
+from kalla.pricing import match_materials
+from kalla.units import to_number
+
+# Saw kerf added between parts, in mm
+KERF_MM = float(os.getenv("KALLA_KERF_MM", "4"))
+
+_sheet_size_pattern = re.compile(r"(\d+(?:[.,]\d+)?)\s*[x×]\s*(\d+(?:[.,]\d+)?)")
+
+def sheet_size(material):
+    """(length, width) in mm from a material DB entry's 'sheet_size' ('2800x2070') or sheet_length/sheet_width"""
+    if material.get("sheet_length") and material.get("sheet_width"):
+        return to_number(material["sheet_length"]), to_number(material["sheet_width"])
+    match = _sheet_size_pattern.search(str(material.get("sheet_size") or ""))
+    if not match:
+        return None
+    return tuple(float(value.replace(",", ".")) for value in match.groups())
+
+def _expand(parts):
+    pieces = []
+    for part in parts:
+        length, width = to_number(part.get("length")), to_number(part.get("width"))
+        if not length or not width:
+            continue
+        count = int(to_number(part.get("quantity"), 1.0) or 1)
+        pieces.extend([(part.get("name") or "part", max(length, width), min(length, width))] * count)
+    # Largest first packs tighter and keeps the free-rectangle lists short
+    pieces.sort(key=lambda piece: (piece[1], piece[1] * piece[2]), reverse=True)
+    return pieces
+
+# Tie-breaks between free rectangles with equal leftover area, given
+# (leftover width, leftover height, rotated); pack_sheets keeps the best result of each
+TIE_BREAKS = [
+    lambda leftover_w, leftover_h, rotated: min(leftover_w, leftover_h),
+    lambda leftover_w, leftover_h, rotated: max(leftover_w, leftover_h),
+    lambda leftover_w, leftover_h, rotated: (rotated, min(leftover_w, leftover_h))
+]
+
+def _best_fit(sheets, length, width, allow_rotation, tie_break=TIE_BREAKS[0]):
+    """Free rectangle with the least leftover area that fits the part, across all open sheets"""
+    best = None
+    orientations = [(length, width)]
+    if allow_rotation and length != width:
+        orientations.append((width, length))
+    for sheet_index, sheet in enumerate(sheets):
+        for rect_index, (_, _, rect_w, rect_h) in enumerate(sheet["free"]):
+            for part_w, part_h in orientations:
+                if part_w <= rect_w and part_h <= rect_h:
+                    score = (rect_w * rect_h - part_w * part_h,
+                             tie_break(rect_w - part_w, rect_h - part_h, part_w != length))
+                    if best is None or score < best[0]:
+                        best = (score, sheet_index, rect_index, part_w, part_h)
+    return best
+
+def _place(sheet, rect_index, part_w, part_h):
+    x, y, rect_w, rect_h = sheet["free"].pop(rect_index)
+    leftover_w, leftover_h = rect_w - part_w, rect_h - part_h
+    # Split along the shorter leftover axis so the remaining rectangles stay as large as possible
+    if leftover_w < leftover_h:
+        new_rects = [(x + part_w, y, leftover_w, part_h), (x, y + part_h, rect_w, leftover_h)]
+    else:
+        new_rects = [(x + part_w, y, leftover_w, rect_h), (x, y + part_h, part_w, leftover_h)]
+    sheet["free"].extend(rect for rect in new_rects if rect[2] > 0 and rect[3] > 0)
+    return x, y
+
+def _pack(pieces, usable_l, usable_w, kerf, allow_rotation, tie_break):
+    sheets = []
+    unplaced = []
+    parts_area = 0.0
+
+    for name, length, width in pieces:
+        best = _best_fit(sheets, length + kerf, width + kerf, allow_rotation, tie_break)
+        if best is None:
+            sheets.append({"free": [(0.0, 0.0, usable_l, usable_w)], "placements": []})
+            best = _best_fit(sheets[-1:], length + kerf, width + kerf, allow_rotation, tie_break)
+            if best is None:
+                sheets.pop()
+                unplaced.append({"name": name, "length": length, "width": width})
+                continue
+            best = (best[0], len(sheets) - 1) + best[2:]
+
+        _, sheet_index, rect_index, part_w, part_h = best
+        x, y = _place(sheets[sheet_index], rect_index, part_w, part_h)
+        sheets[sheet_index]["placements"].append({
+            "name": name,
+            "x": x,
+            "y": y,
+            "length": part_w - kerf,
+            "width": part_h - kerf,
+            "rotated": (part_w - kerf) != length
+        })
+        parts_area += length * width
+
+    return sheets, unplaced, parts_area
+
+def pack_sheets(parts, sheet_length, sheet_width, kerf=KERF_MM, allow_rotation=True):
+    """Pack parts (dicts with name, length, width, quantity in mm) onto sheets of one size.
+
+    Runs the packer with each tie-break rule and keeps the layout using fewer sheets.
+    Returns sheet count, yield (part area / sheet area), per-sheet placements and any
+    parts that are larger than a sheet.
+    """
+    pieces = _expand(parts)
+    # Parts touching the sheet edge need no kerf, so grow the usable sheet by one kerf
+    usable_l, usable_w = sheet_length + kerf, sheet_width + kerf
+
+    sheets, unplaced, parts_area = min(
+        (_pack(pieces, usable_l, usable_w, kerf, allow_rotation, tie_break) for tie_break in TIE_BREAKS),
+        key=lambda packed: len(packed[0])
+    )
+
+    sheet_area = len(sheets) * sheet_length * sheet_width
+    return {
+        "sheets": len(sheets),
+        "sheet_size": [sheet_length, sheet_width],
+        "parts_area_sqm": round(parts_area / 1e6, 3),
+        "sheet_area_sqm": round(sheet_area / 1e6, 3),
+        "yield": round(parts_area / sheet_area, 4) if sheet_area else 0.0,
+        "layouts": [sheet["placements"] for sheet in sheets],
+        "unplaced": unplaced
+    }
+
+def parts_from_spec(spec_data, material_db):
+    """Cut-list parts for a single-item spec.
+
+    Uses the spec's cut_list when the extraction provides one; otherwise each sheet
+    material in the spec gets one panel of the overall length x width per piece.
+    """
+    spec_data = spec_data or {}
+    pieces = to_number(spec_data.get("quantity"), 1.0) or 1.0
+    parts = []
+
+    for entry in spec_data.get("cut_list") or []:
+        parts.append({
+            "name": entry.get("part") or "part",
+            "material": entry.get("material") or "",
+            "length": entry.get("length"),
+            "width": entry.get("width"),
+            "quantity": (to_number(entry.get("quantity"), 1.0) or 1.0) * pieces
+        })
+    if parts:
+        return parts
+
+    dimensions = spec_data.get("dimensions") or {}
+    sheet_materials = _sheet_materials(material_db)
+    for material in spec_data.get("materials") or []:
+        material_type = material.get("material_type") if isinstance(material, dict) else material
+        if _match_sheet_material(material_type, sheet_materials):
+            parts.append({
+                "name": f"{material_type} panel",
+                "material": material_type,
+                "length": dimensions.get("length"),
+                "width": dimensions.get("width"),
+                "quantity": pieces
+            })
+    return parts
+
+def parts_from_items(items):
+    """Cut-list parts from a multi-item list, multiplied by each item's quantity"""
+    parts = []
+    for item in items or []:
+        pieces = to_number(item.get("quantity"), 1.0) or 1.0
+        for entry in item.get("parts") or []:
+            parts.append({
+                "name": f"{item.get('item_id') or ''} {entry.get('part') or 'part'}".strip(),
+                "material": entry.get("material") or "",
+                "length": entry.get("length"),
+                "width": entry.get("width"),
+                "quantity": (to_number(entry.get("quantity"), 1.0) or 1.0) * pieces
+            })
+    return parts
+
+def _sheet_materials(material_db):
+    return [m for m in (material_db or {}).get("materials") or [] if sheet_size(m)]
+
+# Material DB fields nesting reads: the name to match parts by and the sheet geometry
+SHEET_FIELDS = ("name", "sheet_size", "sheet_length", "sheet_width")
+
+def sheet_fingerprint(material_db):
+    """The sheet materials' names and sizes, so price changes do not invalidate a nesting"""
+    return [{field: material.get(field) for field in SHEET_FIELDS} for material in _sheet_materials(material_db)]
+
+def _match_sheet_material(material_type, sheet_materials):
+    if not sheet_materials:
+        return None
+    match = match_materials([{"item": material_type}], sheet_materials)[0]
+    return next((m for m in sheet_materials if m.get("name") == match["material"]), None)
+
+def nest_materials(parts, material_db, kerf=KERF_MM):
+    """Nest parts per sheet material in the DB; returns {material name: packing result}.
+
+    Parts whose material has no sheet size in the DB are left to the model's takeoff.
+    """
+    sheet_materials = _sheet_materials(material_db)
+    grouped = {}
+    for part in parts:
+        material = _match_sheet_material(part.get("material"), sheet_materials)
+        if material:
+            grouped.setdefault(material["name"], (material, []))[1].append(part)
+
+    results = {}
+    for name, (material, material_parts) in grouped.items():
+        length, width = sheet_size(material)
+        results[name] = pack_sheets(material_parts, length, width, kerf=kerf)
+    return results
@@ -0,0 +1,109 @@
+"""
+Typed records for extracted specifications and cost estimates.
+
+The model returns numbers as text ("85.00", "3.6 sqm", "40x40mm", "4-6 weeks").
+normalize_spec and normalize_estimate parse them once, when a specification or
+estimate is received, into plain numbers in canonical units (mm, sqm, pcs, h,
+weeks, EUR). The records can be summed and checked against recomputed totals, and
+stored quotes can be compared as DataFrame columns (quotes_frame).
+"""
+
+from kalla.units import parse_measure, to_mm, to_number
+
+def _measure_fields(value, name):
+    measure = parse_measure(value)
+    return {name: measure["value"], f"{name}_unit": measure["unit"]}
+
+def _amount(value):
+    return parse_measure(value)["value"]
+
+def normalize_spec(spec_data):
+    """Dimensions in mm, piece count, delivery weeks and material quantities of a specification"""
+    spec_data = spec_data or {}
+    dimensions = spec_data.get("dimensions") or {}
+    delivery = parse_measure(spec_data.get("delivery_requirements"))
+    weeks = delivery["unit"] == "weeks"
+    return {
+        "length_mm": to_mm(dimensions.get("length")),
+        "width_mm": to_mm(dimensions.get("width")),
+        "height_mm": to_mm(dimensions.get("height")),
+        "quantity": to_number(spec_data.get("quantity"), 1.0) or 1.0,
+        "delivery_weeks_low": delivery["low"] if weeks else None,
+        "delivery_weeks_high": delivery["high"] if weeks else None,
+        "materials": [
+            dict(material_type=material.get("material_type"), **_measure_fields(material.get("quantity"), "quantity"))
+            for material in spec_data.get("materials") or [] if isinstance(material, dict)
+        ]
+    }
+
+def normalize_estimate(cost_estimate):
+    """Cost lines and totals of an estimate as numbers.
+
+    lines_total is the sum of the line totals as returned, before overhead and margin,
+    for checking the model's arithmetic against a recomputation.
+    """
+    cost_estimate = cost_estimate or {}
+    material_costs = [
+        dict(
+            item=line.get("item"),
+            unit_cost=_amount(line.get("unit_cost")),
+            total_cost=_amount(line.get("total_cost")),
+            **_measure_fields(line.get("quantity"), "quantity")
+        )
+        for line in cost_estimate.get("material_costs") or []
+    ]
+    labor_costs = [
+        {
+            "operation": line.get("operation"),
+            "hours": _amount(line.get("hours")),
+            "hourly_rate": _amount(line.get("hourly_rate")),
+            "total_cost": _amount(line.get("total_cost"))
+        }
+        for line in cost_estimate.get("labor_costs") or []
+    ]
+    overhead = cost_estimate.get("overhead_costs") or {}
+    margin = cost_estimate.get("profit_margin") or {}
+    delivery = parse_measure(cost_estimate.get("delivery_timeline"))
+    weeks = delivery["unit"] == "weeks"
+
+    material_total = sum(line["total_cost"] or 0.0 for line in material_costs)
+    labor_total = sum(line["total_cost"] or 0.0 for line in labor_costs)
+    return {
+        "material_costs": material_costs,
+        "labor_costs": labor_costs,
+        "material_total": round(material_total, 2),
+        "labor_total": round(labor_total, 2),
+        "lines_total": round(material_total + labor_total, 2),
+        "overhead_percentage": _amount(overhead.get("percentage")) if isinstance(overhead, dict) else None,
+        "overhead_amount": _amount(overhead.get("amount")) if isinstance(overhead, dict) else None,
+        "margin_percentage": _amount(margin.get("percentage")) if isinstance(margin, dict) else None,
+        "margin_amount": _amount(margin.get("amount")) if isinstance(margin, dict) else None,
+        "total_cost": _amount(cost_estimate.get("total_cost")),
+        "price_per_unit": _amount(cost_estimate.get("price_per_unit")),
+        "delivery_weeks_low": delivery["low"] if weeks else None,
+        "delivery_weeks_high": delivery["high"] if weeks else None
+    }
+
+def normalize_quote(quote):
+    """One flat typed record per saved quote ({'timestamp', 'specifications', 'cost_estimate'})"""
+    spec_data = quote.get("specifications") or {}
+    spec = normalize_spec(spec_data)
+    estimate = normalize_estimate(quote.get("cost_estimate"))
+    record = {
+        "timestamp": quote.get("timestamp"),
+        "project_name": spec_data.get("project_name"),
+        "furniture_type": spec_data.get("furniture_type")
+    }
+    # Delivery comes from the estimate, which answers the specification's requirement
+    record.update({key: value for key, value in spec.items() if key != "materials" and not key.startswith("delivery")})
+    record.update({key: value for key, value in estimate.items() if key not in ("material_costs", "labor_costs")})
+    return record
+
+def quotes_frame(records):
+    """DataFrame of normalize_quote records with numeric columns as floats"""
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(records)
+    numeric = [column for column in frame.columns if column not in ("timestamp", "project_name", "furniture_type")]
+    frame[numeric] = frame[numeric].astype(float)
+    return frame
@@ -0,0 +1,164 @@
+"""
+Optional local OCR pre-pass for scanned and hand-drawn sketches.
+
+When pytesseract and the Tesseract binary are installed, dimension values and labels
+are read locally in a process pool and passed to the vision model as compact text
+hints with their positions, alongside a downscaled image. For analysis types that
+only need the text on the drawing (dimensions), a confident OCR result answers the
+question without a model call. Without Tesseract every function falls back to the
+plain vision call.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# Worker processes for OCR
+OCR_WORKERS = int(os.getenv("KALLA_OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Words below this Tesseract confidence (0-100) are ignored
+MIN_CONFIDENCE = float(os.getenv("KALLA_OCR_MIN_CONFIDENCE", "60"))
+
+# Longer side of the image sent to the vision model when OCR hints accompany it
+HINTED_IMAGE_PIXELS = int(os.getenv("KALLA_OCR_IMAGE_PIXELS", "1024"))
+
+# Analysis types answered from OCR alone when it finds at least MIN_LOCAL_DIMENSIONS values
+LOCAL_ANALYSIS_TYPES = [t for t in os.getenv("KALLA_OCR_LOCAL_TYPES", "dimensions").split(",") if t]
+MIN_LOCAL_DIMENSIONS = int(os.getenv("KALLA_OCR_MIN_DIMENSIONS", "3"))
+
+_dimension_pattern = re.compile(
+    r"^(?P<prefix>[ØøRr⌀]?)(?P<value>\d+(?:[.,]\d+)?)(?:\s*(?P<unit>mm|cm|m)\b)?(?:[xX×](?P<second>\d+(?:[.,]\d+)?))?$"
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _ocr_pool():
+    # Created once under the lock; concurrent first calls would otherwise each start a pool
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+        return _pool
+
+@lru_cache(maxsize=None)
+def ocr_available():
+    """True when pytesseract and the Tesseract binary can be used"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def words_from_data(data, width, height, min_confidence=MIN_CONFIDENCE):
+    """Recognized words from pytesseract.image_to_data output with centre positions as page fractions"""
+    words = []
+    for text, conf, left, top, w, h in zip(data["text"], data["conf"], data["left"], data["top"],
+                                           data["width"], data["height"]):
+        text = str(text).strip()
+        if not text or float(conf) < min_confidence:
+            continue
+        words.append({
+            "text": text,
+            "x": round((left + w / 2) / width, 3),
+            "y": round((top + h / 2) / height, 3),
+            "confidence": float(conf)
+        })
+    return words
+
+def hints_from_words(words):
+    """Split recognized words into dimension values and text labels"""
+    dimensions = []
+    labels = []
+    for word in words:
+        match = _dimension_pattern.match(word["text"])
+        # Tesseract often reads "1200 mm" as two words
+        if word["text"].lower() in ("mm", "cm", "m"):
+            if dimensions and not dimensions[-1]["unit"]:
+                dimensions[-1]["unit"] = word["text"].lower()
+                dimensions[-1]["text"] += f" {word['text']}"
+            continue
+        if match:
+            dimensions.append({
+                "text": word["text"],
+                "value": float(match.group("value").replace(",", ".")),
+                "unit": match.group("unit") or "",
+                "x": word["x"],
+                "y": word["y"]
+            })
+        elif len(re.sub(r"[^A-Za-z]", "", word["text"])) >= 2:
+            labels.append({"text": word["text"], "x": word["x"], "y": word["y"]})
+    return {"dimensions": dimensions, "labels": labels}
+
+def _ocr_worker(image):
+    import pytesseract
+
+    data = pytesseract.image_to_data(image.convert("L"), output_type=pytesseract.Output.DICT)
+    return hints_from_words(words_from_data(data, *image.size))
+
+def ocr_hints(image):
+    """Dimension and label hints for an image, read in the shared OCR process pool.
+
+    Returns None when Tesseract is not available or OCR fails.
+    """
+    if not ocr_available():
+        return None
+    try:
+        return _ocr_pool().submit(_ocr_worker, image).result()
+    except Exception:
+        return None
+
+def _position(item):
+    return f"({item['x']:.0%},{item['y']:.0%})"
+
+def format_hints(hints):
+    """Compact text form of OCR hints for the vision prompt or a local answer"""
+    lines = []
+    if hints.get("dimensions"):
+        lines.append("Dimensions: " + "; ".join(f"{d['text']} {_position(d)}" for d in hints["dimensions"]))
+    if hints.get("labels"):
+        lines.append("Labels: " + "; ".join(f"{l['text']} {_position(l)}" for l in hints["labels"]))
+    return "\n".join(lines)
+
+def answers_locally(hints, analysis_type):
+    return bool(hints) and analysis_type in LOCAL_ANALYSIS_TYPES and len(hints["dimensions"]) >= MIN_LOCAL_DIMENSIONS
+
+def analyze_with_ocr(image, analysis_type, analyze, hints=None):
+    """Analyze a drawing with local OCR hints.
+
+    hints default to ocr_hints(image). analyze is called as analyze(image, analysis_type,
+    note=...) with a downscaled image and the hints as a note; without hints it gets the
+    original image. Returns the analysis text and whether the model call was skipped.
+    """
+    if hints is None:
+        hints = ocr_hints(image)
+    if not hints or not (hints["dimensions"] or hints["labels"]):
+        return analyze(image, analysis_type), False
+
+    if answers_locally(hints, analysis_type):
+        return (
+            "Dimensions read by local OCR (positions as % of width, height):\n" + format_hints(hints)
+        ), True
+
+    note = (
+        "Text read from the full-resolution drawing by local OCR, with positions as % of width, height. "
+        "Use these values for dimensions and labels rather than re-reading small text:\n" + format_hints(hints)
+    )
+    small = image.copy()
+    small.thumbnail((HINTED_IMAGE_PIXELS, HINTED_IMAGE_PIXELS))
+    return analyze(small, analysis_type, note=note), False
+
+def ocr_analyzer(analyze):
+    """Wrap a vision call so whole-image analyses go through analyze_with_ocr.
+
+    Calls with a note (such as tiles of a large sheet) are passed through unchanged, so
+    the wrapper composes with tiling.analyze_with_tiles.
+    """
+    def analyze_image(image, analysis_type, note=None):
+        if note is not None:
+            return analyze(image, analysis_type, note=note)
+        return analyze_with_ocr(image, analysis_type, analyze)[0]
+    return analyze_image
@@ -0,0 +1,133 @@
+import os
+import mmap
+import tempfile
+from io import BytesIO
+
+from kalla import profiling
+
+# Function to extract text from an uploaded PDF
+def extract_text_from_pdf(pdf_file):
+    return "".join(extract_pages_from_pdf(pdf_file))
+
+# Function to extract text from PDF file path
+def extract_text_from_pdf_path(file_path):
+    return "".join(extract_pages_from_pdf_path(file_path))
+
+def extract_pages_from_pdf(pdf_file):
+    """Text of each page of an uploaded PDF (any object with getvalue(), or a path such as a StoredUpload)"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return extract_pages_from_pdf_path(pdf_file)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+        temp_file.write(pdf_file.getvalue())
+        temp_path = temp_file.name
+
+    try:
+        return extract_pages_from_pdf_path(temp_path)
+    finally:
+        os.unlink(temp_path)
+
+def extract_pages_from_pdf_path(file_path):
+    """Text of each page of a PDF file, read through a memory map rather than into memory"""
+    import PyPDF2
+
+    with profiling.stage("pdf.extract_text"), open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # Empty files cannot be mapped; let PyPDF2 report them
+            return [page.extract_text() for page in PyPDF2.PdfReader(file).pages]
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pdf_reader = PyPDF2.PdfReader(mapped)
+            return [page.extract_text() for page in pdf_reader.pages]
+
+def _png_to_pil(pix):
+    """PIL Image of a rendered pixmap, through PNG"""
+    from PIL import Image
+
+    with profiling.stage("pdf.png_to_pil"):
+        image = Image.open(BytesIO(pix.tobytes("png")))
+        if profiling.current() is not None:
+            # PIL decodes lazily; decode here so the stage includes it
+            image.load()
+    return image
+
+# Function to convert PDF to images
+def pdf_to_images(pdf_file, dpi=150):
+    """Convert PDF pages to PIL Images; pdf_file may be a path or a file-like object"""
+    import fitz  # PyMuPDF for better PDF handling
+
+    pdf_document = open_pdf(pdf_file)
+
+    images = []
+    try:
+        for page_num in range(len(pdf_document)):
+            page = pdf_document.load_page(page_num)
+            # Render page to image
+            mat = fitz.Matrix(dpi/72, dpi/72)  # 72 is the default DPI
+            with profiling.stage("pdf.render", page=page_num + 1, dpi=dpi):
+                pix = page.get_pixmap(matrix=mat)
+
+            # Convert to PIL Image
+            images.append(_png_to_pil(pix))
+    finally:
+        pdf_document.close()
+
+    return images
+
+def pdf_page_count(path):
+    """Number of pages in a PDF file without rendering it"""
+    import fitz
+
+    with fitz.open(path) as pdf_document:
+        return len(pdf_document)
+
+def render_pdf_page(path, page_number, dpi=150):
+    """Render a single zero-based page of a PDF file to a PIL Image"""
+    import fitz
+
+    with fitz.open(path) as pdf_document:
+        page = pdf_document.load_page(page_number)
+        with profiling.stage("pdf.render", page=page_number + 1, dpi=dpi):
+            pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
+        return _png_to_pil(pix)
+
+def open_pdf(pdf_file):
+    """Open a PDF with PyMuPDF from a path or a file-like object (rewound afterwards).
+
+    Paths, including StoredUpload handles, are opened from disk without reading the whole file.
+    """
+    import fitz
+
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return fitz.open(os.fspath(pdf_file))
+    pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
+    pdf_file.seek(0)  # Reset file pointer
+    return pdf_document
+
+def pdf_page_sizes(pdf_file):
+    """(width, height) in mm of each page; pdf_file may be a path or a file-like object"""
+    with open_pdf(pdf_file) as pdf_document:
+        return [(page.rect.width * 25.4 / 72, page.rect.height * 25.4 / 72) for page in pdf_document]
+
+def render_pdf_regions(pdf_file, page_number, boxes, dpi=300, max_pixels=None):
+    """Render regions of a zero-based page to PIL Images.
+
+    boxes are (x0, y0, x1, y1) fractions of the page, so only the clipped area is
+    rasterized at the higher resolution. max_pixels caps the longer side of each crop
+    by lowering its DPI.
+    """
+    import fitz
+    from PIL import Image
+
+    images = []
+    with open_pdf(pdf_file) as pdf_document:
+        page = pdf_document.load_page(page_number)
+        rect = page.rect
+        for x0, y0, x1, y1 in boxes:
+            clip = fitz.Rect(rect.x0 + x0 * rect.width, rect.y0 + y0 * rect.height,
+                             rect.x0 + x1 * rect.width, rect.y0 + y1 * rect.height)
+            region_dpi = dpi
+            if max_pixels:
+                region_dpi = min(dpi, max_pixels * 72 / max(clip.width, clip.height))
+            pix = page.get_pixmap(matrix=fitz.Matrix(region_dpi/72, region_dpi/72), clip=clip)
+            images.append(Image.open(BytesIO(pix.tobytes("png"))))
+    return images
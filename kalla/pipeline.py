@@ -0,0 +1,103 @@
+"""
+Dependency-tracked estimation pipeline.
+
+Each stage is a node whose cache key combines a fingerprint of its own inputs with
+the keys of the nodes it depends on. When an input changes only that node and its
+downstream dependents get a new key, so everything upstream is served from the memo:
+changing a labor rate reprices locally without calling the model again.
+"""
+
+from kalla import profiling
+from kalla.cache import MemoryCache, cache_key
+from kalla.units import to_number
+
+class Node:
+    def __init__(self, name, func, deps=(), fingerprint=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.fingerprint = fingerprint
+
+class Pipeline:
+    """Graph of memoized nodes; memo is any object with get/set (MemoryCache, DiskCache)"""
+
+    def __init__(self, memo=None):
+        self.memo = memo if memo is not None else MemoryCache()
+        self.nodes = {}
+        self.computed = []
+
+    def add(self, name, func, deps=(), fingerprint=None):
+        """Register or replace a node; func receives the values of deps in order"""
+        self.nodes[name] = Node(name, func, deps, fingerprint)
+
+    def key(self, name):
+        node = self.nodes[name]
+        return cache_key(name, node.fingerprint, [self.key(dep) for dep in node.deps])
+
+    def get(self, name):
+        """Return a node's value, computing it and any stale dependencies as needed"""
+        key = self.key(name)
+        value = self.memo.get(key)
+        if value is None:
+            node = self.nodes[name]
+            args = [self.get(dep) for dep in node.deps]
+            with profiling.stage(f"pipeline.{name}"):
+                value = node.func(*args)
+            self.memo.set(key, value)
+            self.computed.append(name)
+        return value
+
+def add_estimate_nodes(pipeline, spec_node, drawing_nodes, material_db, generate=None, takeoff_fingerprint=None):
+    """Add takeoff, material matching and pricing nodes on top of spec and drawing nodes.
+
+    - nesting: local cut-list packing of sheet materials (see kalla.nesting)
+    - takeoff: model call producing quantities and hours; depends on the spec, drawings
+      and the material DB without prices (see pricing.takeoff_material_db), not on the
+      nesting, whose sheet quantities are applied in pricing. Its arithmetic is reconciled
+      locally, and it is regenerated only when the structure is broken (see
+      validation.checked_estimate)
+    - material_matching: local match of takeoff lines to DB materials and prices
+    - pricing: local application of prices, labor rates, overhead and margin
+
+    generate defaults to pricing.generate_cost_estimate and receives
+    (spec_data, material_db, drawing_analyses); pass takeoff_fingerprint when it closes
+    over other inputs (such as a reference estimate) that should invalidate the takeoff.
+    """
+    from kalla import pricing, nesting, validation
+
+    generate = generate or pricing.generate_cost_estimate
+    material_db = material_db or {}
+    takeoff_db = pricing.takeoff_material_db(material_db)
+    drawing_nodes = list(drawing_nodes)
+
+    pipeline.add(
+        "nesting",
+        lambda spec_data: nesting.nest_materials(nesting.parts_from_spec(spec_data, material_db), material_db),
+        deps=[spec_node],
+        fingerprint=[nesting.sheet_fingerprint(material_db), nesting.KERF_MM]
+    )
+    pipeline.add(
+        "takeoff",
+        lambda spec_data, *drawing_analyses: validation.checked_estimate(
+            lambda: generate(spec_data, takeoff_db, list(drawing_analyses) or None),
+            pieces=to_number((spec_data or {}).get("quantity"), 1.0) or 1.0, priced=False
+        ),
+        deps=[spec_node] + drawing_nodes,
+        fingerprint=[takeoff_db, takeoff_fingerprint]
+    )
+    pipeline.add(
+        "material_matching",
+        lambda takeoff: pricing.match_materials(takeoff.get("material_costs"), material_db.get("materials")),
+        deps=["takeoff"],
+        fingerprint=material_db.get("materials")
+    )
+    pipeline.add(
+        "pricing",
+        lambda spec_data, takeoff, matches, nested: pricing.price_estimate(
+            takeoff, matches, material_db.get("labor_rates"),
+            pieces=to_number((spec_data or {}).get("quantity"), 1.0) or 1.0,
+            nesting=nested
+        ),
+        deps=[spec_node, "takeoff", "material_matching", "nesting"],
+        fingerprint=material_db.get("labor_rates")
+    )
@@ -0,0 +1,189 @@
+"""
+Speculative work on uploaded drawings.
+
+As soon as a file is uploaded its pages are rasterized and screened (ink, vector
+paths and text layer, see kalla.screening) in the background, and each drawing page
+is analyzed with the options currently selected, which are the defaults (a
+comprehensive analysis) until the user changes them. By the time Analyze is
+clicked the results are mostly ready. They are looked up by file content, page
+and options, so a click with other options misses and runs as before.
+
+Work is cancellable: changing the options or removing a file cancels its queued
+analyses, and a running one finishes but its result is dropped. Uploads are passed
+as bytes or StoredUpload handles (kalla.uploads), never as open streams, so workers
+never share a file position with the page.
+"""
+
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+# Pages rasterized and analyzed concurrently for all sessions
+PREFETCH_WORKERS = int(os.getenv("KALLA_PREFETCH_WORKERS", "4"))
+
+# Set KALLA_PREFETCH=0 to wait for the Analyze click before any work or model call
+PREFETCH_ON_UPLOAD = os.getenv("KALLA_PREFETCH", "1").lower() not in ("0", "false", "no")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="kalla-prefetch")
+        return _executor
+
+def upload_digest(source):
+    """Digest of upload bytes, or the digest a StoredUpload already carries"""
+    digest = getattr(source, "digest", None)
+    return digest if digest else hashlib.sha256(source).hexdigest()
+
+def _reader(source):
+    # Bytes get a private stream per use; paths and StoredUpload handles are opened from disk
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def prepare_file(source, is_pdf, screen=True):
+    """Rasterize and screen an upload (bytes or a StoredUpload): {"images", "screenings"}.
+
+    PDF pages are rendered like pdf.pdf_to_images; screenings are None when screen is off.
+    """
+    from PIL import Image
+    from kalla import pdf, screening
+
+    if is_pdf:
+        images = pdf.pdf_to_images(_reader(source))
+        screenings = screening.screen_pdf_pages(_reader(source), images) if screen else [None] * len(images)
+    else:
+        image = Image.open(_reader(source))
+        # Decode now, in the worker, rather than on first use in the page
+        image.load()
+        images = [image]
+        screenings = [screening.classify_content(image)] if screen else [None]
+    return {"images": images, "screenings": screenings}
+
+def _is_error(result):
+    analysis_result = result[0] if isinstance(result, tuple) else result
+    return isinstance(analysis_result, str) and analysis_result.startswith("Error")
+
+class Prefetcher:
+    """Background preparation and analysis of one session's uploads.
+
+    analyze(image, pdf_file, page_number, options) runs a page with hashable options
+    (provider, analysis type, tiling, ...) and must not touch Streamlit session state;
+    pdf_file is a file-like object or None for images, page_number zero-based.
+    """
+
+    def __init__(self, analyze, pool=None):
+        self.analyze = analyze
+        self.pool = pool or _pool()
+        # Re-entrant: a done-callback on finished work runs at once, inside start()
+        self.lock = threading.RLock()
+        # digest -> {"prepared": future, "options": options, "analyses": {page: future}, "cancel": Event, ...}
+        self.entries = {}
+
+    def start(self, source, is_pdf, options=None, screen=True):
+        """Begin preparing an upload, and analyzing its drawing pages when options are given.
+
+        Calling it again with the same file is cheap; with different options the
+        previous analyses are cancelled and new ones started. source is the upload's
+        bytes or its StoredUpload handle. Returns the file digest.
+        """
+        digest = upload_digest(source)
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None or entry["screen"] != screen:
+                if entry is not None:
+                    self._cancel(entry)
+                entry = {
+                    "prepared": self.pool.submit(prepare_file, source, is_pdf, screen),
+                    "pdf_source": source if is_pdf else None, "screen": screen,
+                    "options": None, "analyses": {}, "cancel": threading.Event(), "scheduled": None
+                }
+                self.entries[digest] = entry
+            if options is not None and entry["options"] != options:
+                self._cancel(entry)
+                entry.update(options=options, analyses={}, cancel=threading.Event())
+                entry["prepared"].add_done_callback(
+                    lambda prepared, entry=entry, cancel=entry["cancel"]: self._analyze_pages(entry, cancel)
+                )
+        return digest
+
+    def _analyze_pages(self, entry, cancel):
+        """Submit the drawing pages of a prepared upload, once per options change"""
+        prepared = entry["prepared"]
+        if cancel.is_set() or prepared.cancelled() or prepared.exception() is not None:
+            return
+        result = prepared.result()
+        pdf_source = entry["pdf_source"]
+        with self.lock:
+            if cancel.is_set() or entry["scheduled"] is cancel:
+                return
+            entry["scheduled"] = cancel
+            options = entry["options"]
+            for page, (image, screening) in enumerate(zip(result["images"], result["screenings"])):
+                if screening and screening["content"] != "drawing":
+                    continue
+                pdf_file = _reader(pdf_source) if pdf_source is not None else None
+                entry["analyses"][page] = self.pool.submit(
+                    self._run, cancel, image, pdf_file, page if pdf_source is not None else None, options
+                )
+
+    def _run(self, cancel, image, pdf_file, page_number, options):
+        # Checked once more before the model call, in case the work was cancelled while queued
+        if cancel.is_set():
+            raise CancelledError()
+        return self.analyze(image, pdf_file, page_number, options)
+
+    def _cancel(self, entry):
+        entry["cancel"].set()
+        for future in entry["analyses"].values():
+            future.cancel()
+
+    def prepared(self, digest):
+        """{"images", "screenings"} of a started upload, waiting for it if needed; None if unknown or failed"""
+        entry = self.entries.get(digest)
+        if entry is None:
+            return None
+        try:
+            return entry["prepared"].result()
+        except Exception:
+            return None
+
+    def analysis(self, digest, page, options):
+        """The prefetched analysis of a page with these options, waiting for it if it is running.
+
+        None when there is none, it was cancelled, failed or returned an error string,
+        so the caller runs the page itself.
+        """
+        entry = self.entries.get(digest)
+        if entry is None or entry["options"] != options or self.prepared(digest) is None:
+            return None
+        with self.lock:
+            # Waiters can wake before the done-callback has submitted the pages
+            self._analyze_pages(entry, entry["cancel"])
+            if entry["options"] != options:
+                return None
+            future = entry["analyses"].get(page)
+        if future is None:
+            return None
+        try:
+            result = future.result()
+        except Exception:
+            return None
+        return None if _is_error(result) else result
+
+    def cancel(self, digest=None):
+        """Cancel pending work for one upload, or for all of them"""
+        with self.lock:
+            for key, entry in self.entries.items():
+                if digest is None or key == digest:
+                    self._cancel(entry)
+
+    def retain(self, digests):
+        """Cancel and forget uploads that are no longer present"""
+        with self.lock:
+            for digest in [key for key in self.entries if key not in digests]:
+                self._cancel(self.entries.pop(digest))
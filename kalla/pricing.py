@@ -0,0 +1,320 @@
+import os
+import json
+
+from kalla import profiling
+from kalla.prompts import load_prompt
+from kalla.providers import openai_client, text_model
+from kalla.text import tokens
+from kalla.units import to_number, unit_of
+
+# Overhead and margin applied to multi-item quotes unless the caller overrides them
+DEFAULT_OVERHEAD_PERCENTAGE = float(os.getenv("KALLA_OVERHEAD_PERCENTAGE", "15"))
+DEFAULT_MARGIN_PERCENTAGE = float(os.getenv("KALLA_MARGIN_PERCENTAGE", "10"))
+
+# Function to generate cost estimate
+def generate_cost_estimate(spec_data, material_db, drawing_analyses=None, reference_estimate=None, api_key=None):
+    client = openai_client(api_key)
+
+    # Get model from environment or use default
+    model = text_model()
+
+    system_prompt = load_prompt("rfq_analysis")
+
+    # Prepare drawing analyses text if available
+    drawing_analyses_text = ""
+    if drawing_analyses and len(drawing_analyses) > 0:
+        drawing_analyses_text = "DRAWING ANALYSES:\n"
+        for i, analysis in enumerate(drawing_analyses):
+            drawing_analyses_text += f"\nDrawing {i+1}: {analysis['drawing_name']}\n"
+            drawing_analyses_text += f"Analysis: {analysis['analysis_result']}\n"
+            drawing_analyses_text += "-" * 50 + "\n"
+
+    # Prepare reference estimate text when refining a quote scaled from a similar past job
+    reference_text = ""
+    if reference_estimate:
+        reference_text = "REFERENCE ESTIMATE (scaled from a similar past quote, refine rather than start over):\n"
+        reference_text += json.dumps(reference_estimate, indent=2)
+
+    user_prompt = f"""
+    Generate a detailed cost estimate for the following furniture manufacturing project:
+
+    PROJECT SPECIFICATIONS:
+    {json.dumps(spec_data, indent=2)}
+
+    MATERIAL DATABASE:
+    {json.dumps(material_db, indent=2)}
+
+    {drawing_analyses_text}
+
+    {reference_text}
+
+    Return the cost estimate as a JSON object with the following structure:
+    {{
+        "project_summary": "Brief overview of the project",
+        "material_costs": [
+            {{
+                "item": "Material name",
+                "specification": "Material specification",
+                "quantity": "Required quantity",
+                "unit_cost": "Cost per unit",
+                "total_cost": "Total cost for this material"
+            }}
+        ],
+        "labor_costs": [
+            {{
+                "operation": "Manufacturing operation",
+                "hours": "Estimated hours",
+                "hourly_rate": "Hourly rate",
+                "total_cost": "Total labor cost"
+            }}
+        ],
+        "overhead_costs": {{
+            "percentage": "Overhead percentage",
+            "amount": "Overhead amount"
+        }},
+        "profit_margin": {{
+            "percentage": "Profit margin percentage",
+            "amount": "Profit amount"
+        }},
+        "total_cost": "Total project cost",
+        "price_per_unit": "Price per furniture piece",
+        "delivery_timeline": "Estimated delivery timeline",
+        "notes": "Additional notes and recommendations"
+    }}
+    """
+
+    with profiling.stage("model.openai", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+
+    return json.loads(response.choices[0].message.content)
+
+def recompute_totals(estimate, pieces=1):
+    """Sum line totals, apply overhead and margin percentages in order, and set the totals.
+
+    Overhead is charged on materials plus labor, and margin on that subtotal plus overhead.
+    A block whose percentage cannot be read keeps its stated amount rather than being
+    zeroed (validation.structure_issues reports it).
+    """
+    subtotal = 0.0
+    for section in ("material_costs", "labor_costs"):
+        for line in estimate.get(section) or []:
+            subtotal += to_number(line.get("total_cost"), 0.0) or 0.0
+
+    for section in ("overhead_costs", "profit_margin"):
+        block = estimate.get(section)
+        if isinstance(block, dict):
+            percentage = to_number(block.get("percentage"))
+            if percentage is None:
+                subtotal += to_number(block.get("amount"), 0.0) or 0.0
+                continue
+            amount = subtotal * percentage / 100
+            block["amount"] = f"{amount:.2f}"
+            subtotal += amount
+
+    estimate["total_cost"] = f"{subtotal:.2f}"
+    estimate["price_per_unit"] = f"{subtotal / (pieces or 1):.2f}"
+    return estimate
+
+def material_unit_price(material):
+    """Return (price, unit) from the first 'price_per_<unit>' field of a material DB entry"""
+    for key, value in material.items():
+        if key.startswith("price_per_"):
+            return to_number(value), key[len("price_per_"):]
+    return None, None
+
+def takeoff_material_db(material_db):
+    """Material DB as sent to the model: names and specifications only, no prices or rates.
+
+    Keeping prices out of the prompt means a price or labor rate change does not
+    invalidate the model's quantity takeoff; prices are applied locally instead.
+    """
+    material_db = material_db or {}
+    return {
+        "materials": [
+            {key: value for key, value in material.items() if not key.startswith("price_per_")}
+            for material in material_db.get("materials") or []
+        ],
+        "labor_operations": sorted(material_db.get("labor_rates") or {})
+    }
+
+def match_materials(material_costs, materials):
+    """Match each estimate material line to the closest material DB entry by name"""
+    matches = []
+    for line in material_costs or []:
+        line_tokens = tokens(line.get("item")) | tokens(line.get("specification"))
+        best, best_score = None, 0.0
+        for material in materials or []:
+            # Share of the DB name's words that appear in the line item
+            name_tokens = tokens(material.get("name"))
+            if not name_tokens:
+                continue
+            score = len(line_tokens & name_tokens) / len(name_tokens)
+            if score > best_score:
+                best, best_score = material, score
+
+        unit_price, unit = material_unit_price(best) if best else (None, None)
+        matches.append({
+            "item": line.get("item"),
+            "material": best.get("name") if best else None,
+            "unit_price": unit_price,
+            "unit": unit,
+            "supplier": best.get("supplier") if best else None
+        })
+    return matches
+
+def _labor_rate(operation, labor_rates):
+    operation_tokens = tokens(operation)
+    for name, rate in (labor_rates or {}).items():
+        if tokens(name) & operation_tokens:
+            return to_number(rate)
+    return None
+
+def price_estimate(takeoff, matches, labor_rates=None, pieces=1, nesting=None):
+    """Price a model takeoff locally from matched material prices and labor rates.
+
+    nesting maps sheet material names to packing results (see kalla.nesting); matched
+    lines for those materials take their quantity from the sheet count instead of the model.
+    The sheets hold every part of the material, so the first line matched to it gets the
+    whole count and further lines (other parts on the same board) get zero.
+    """
+    estimate = json.loads(json.dumps(takeoff, default=str))
+
+    nested = set()
+    for line, match in zip(estimate.get("material_costs") or [], matches):
+        packed = (nesting or {}).get(match["material"])
+        if packed:
+            first = match["material"] not in nested
+            nested.add(match["material"])
+            if match["unit"] == "sheet":
+                line["quantity"] = f"{packed['sheets'] if first else 0} sheets"
+            else:
+                line["quantity"] = f"{packed['sheet_area_sqm'] if first else 0.0:.2f} sqm"
+        quantity = to_number(line.get("quantity"))
+        if match["unit_price"] is not None and quantity is not None:
+            line["unit_cost"] = f"{match['unit_price']:.2f}"
+            line["total_cost"] = f"{quantity * match['unit_price']:.2f}"
+
+    for line in estimate.get("labor_costs") or []:
+        hours = to_number(line.get("hours"))
+        rate = _labor_rate(line.get("operation"), labor_rates)
+        if rate is not None and hours is not None:
+            line["hourly_rate"] = f"{rate:.2f}"
+            line["total_cost"] = f"{hours * rate:.2f}"
+
+    return recompute_totals(estimate, pieces=pieces)
+
+ITEM_COLUMNS = ["line", "item_id", "description", "furniture_type", "length", "width", "height", "quantity"]
+MATERIAL_COLUMNS = ["line", "item_id", "material", "specification", "quantity_per_piece", "unit"]
+OPERATION_COLUMNS = ["line", "item_id", "operation", "hours_per_piece"]
+
+def items_to_frames(items):
+    """Flatten an extracted item list into item, material and operation DataFrames.
+
+    Rows are keyed by line, the item's 1-based position in the list: item ids come from
+    the model and may repeat.
+    """
+    import pandas as pd
+
+    item_rows, material_rows, operation_rows = [], [], []
+    for i, item in enumerate(items or []):
+        item_id = str(item.get("item_id") or f"item-{i+1}")
+        dimensions = item.get("dimensions") or {}
+        item_rows.append({
+            "line": i + 1,
+            "item_id": item_id,
+            "description": item.get("description") or "",
+            "furniture_type": item.get("furniture_type") or "",
+            "length": to_number(dimensions.get("length")),
+            "width": to_number(dimensions.get("width")),
+            "height": to_number(dimensions.get("height")),
+            "quantity": to_number(item.get("quantity"), 1.0) or 1.0
+        })
+        for material in item.get("materials") or []:
+            material_rows.append({
+                "line": i + 1,
+                "item_id": item_id,
+                "material": material.get("material_type") or "",
+                "specification": material.get("specifications") or "",
+                "quantity_per_piece": to_number(material.get("quantity"), 0.0),
+                "unit": unit_of(material.get("quantity"))
+            })
+        for operation in item.get("operations") or []:
+            operation_rows.append({
+                "line": i + 1,
+                "item_id": item_id,
+                "operation": operation.get("operation") or "",
+                "hours_per_piece": to_number(operation.get("hours"), 0.0)
+            })
+
+    return (
+        pd.DataFrame(item_rows, columns=ITEM_COLUMNS),
+        pd.DataFrame(material_rows, columns=MATERIAL_COLUMNS),
+        pd.DataFrame(operation_rows, columns=OPERATION_COLUMNS)
+    )
+
+def price_items(items, material_db, overhead_percentage=DEFAULT_OVERHEAD_PERCENTAGE,
+                margin_percentage=DEFAULT_MARGIN_PERCENTAGE):
+    """Price every line item of a multi-item RFQ as vectorized table operations.
+
+    Each distinct material and operation is matched against the material DB once and
+    broadcast to all lines. Returns per-item, material-line and operation-line DataFrames
+    plus aggregate totals; material lines without a DB price count as unpriced.
+    """
+    material_db = material_db or {}
+    items_df, materials_df, operations_df = items_to_frames(items)
+    pieces = items_df[["line", "quantity"]].rename(columns={"quantity": "pieces"})
+
+    # Materials: match distinct (material, specification) pairs, then broadcast prices
+    unique_materials = materials_df[["material", "specification"]].drop_duplicates()
+    matches = match_materials(
+        [{"item": m, "specification": spec} for m, spec in unique_materials.itertuples(index=False)],
+        material_db.get("materials")
+    )
+    unique_materials = unique_materials.assign(
+        matched_material=[match["material"] for match in matches],
+        unit_price=[match["unit_price"] for match in matches]
+    )
+    materials_df = materials_df.merge(unique_materials, on=["material", "specification"], how="left")
+    materials_df = materials_df.merge(pieces, on="line", how="left")
+    materials_df["total_quantity"] = materials_df["quantity_per_piece"] * materials_df["pieces"]
+    materials_df["total_cost"] = (materials_df["total_quantity"] * materials_df["unit_price"].astype(float)).round(2)
+
+    # Operations: look up each distinct operation's labor rate once
+    labor_rates = material_db.get("labor_rates")
+    rates = {operation: _labor_rate(operation, labor_rates) for operation in operations_df["operation"].unique()}
+    operations_df = operations_df.merge(pieces, on="line", how="left")
+    operations_df["hourly_rate"] = operations_df["operation"].map(rates).astype(float)
+    operations_df["total_hours"] = operations_df["hours_per_piece"] * operations_df["pieces"]
+    operations_df["total_cost"] = (operations_df["total_hours"] * operations_df["hourly_rate"]).round(2)
+
+    per_item = items_df.set_index("line")
+    per_item["material_cost"] = materials_df.groupby("line")["total_cost"].sum(min_count=1)
+    per_item["labor_cost"] = operations_df.groupby("line")["total_cost"].sum(min_count=1)
+    per_item[["material_cost", "labor_cost"]] = per_item[["material_cost", "labor_cost"]].fillna(0.0)
+    direct = per_item["material_cost"] + per_item["labor_cost"]
+    per_item["overhead"] = (direct * overhead_percentage / 100).round(2)
+    per_item["margin"] = ((direct + per_item["overhead"]) * margin_percentage / 100).round(2)
+    per_item["total_cost"] = (direct + per_item["overhead"] + per_item["margin"]).round(2)
+    per_item["price_per_unit"] = (per_item["total_cost"] / per_item["quantity"]).round(2)
+    per_item = per_item.reset_index()
+
+    totals = {
+        "item_count": int(len(per_item)),
+        "piece_count": float(per_item["quantity"].sum()),
+        "material_cost": round(float(per_item["material_cost"].sum()), 2),
+        "labor_cost": round(float(per_item["labor_cost"].sum()), 2),
+        "overhead": round(float(per_item["overhead"].sum()), 2),
+        "margin": round(float(per_item["margin"].sum()), 2),
+        "total_cost": round(float(per_item["total_cost"].sum()), 2),
+        "unpriced_material_lines": int(materials_df["unit_price"].isna().sum()),
+        "unpriced_operation_lines": int(operations_df["hourly_rate"].isna().sum())
+    }
+
+    return {"items": per_item, "materials": materials_df, "operations": operations_df, "totals": totals}
@@ -0,0 +1,223 @@
+"""
+Opt-in profiling of page runs.
+
+Library code marks its stages with ``stage(name)``: PDF text extraction (PyPDF2),
+page rendering (fitz), PNG to PIL conversion, JPEG/base64 encoding, screening, tiling,
+pipeline nodes and model calls (request round trip, i.e. network plus model time).
+Outside a profiled run a stage costs one context variable lookup.
+
+A page run becomes profiled inside ``with Profile(name)``. Every stage entered in that
+context is recorded with its start, duration, thread and nesting depth, which gives the
+waterfall shown in the sidebar. Work handed to thread pools is recorded when submitted
+through ``propagate`` (tiling, hedging and chunked extraction do). Optionally the run
+is also profiled with cProfile (the script thread only) and tracemalloc (top allocation
+sites). ``dump`` writes the stages as JSON, the cProfile stats as .prof (for pstats or
+snakeviz) and the tracemalloc snapshot to KALLA_PROFILE_DIR.
+
+cProfile and tracemalloc hook the whole interpreter, so only one run at a time uses
+them: a run started while another holds them records its stages only and sets
+``tools_busy``. tracemalloc started outside kalla is left running.
+
+Enable it with the Profiling checkboxes in the sidebar, or by default for every run with
+KALLA_PROFILE=1 (KALLA_PROFILE=cprofile,tracemalloc adds those).
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+
+PROFILE = [mode.strip() for mode in os.getenv("KALLA_PROFILE", "").lower().split(",") if mode.strip()]
+PROFILE_ENABLED = bool(PROFILE) and PROFILE != ["0"]
+PROFILE_CPROFILE = "cprofile" in PROFILE
+PROFILE_TRACEMALLOC = "tracemalloc" in PROFILE
+
+PROFILE_DIR = os.getenv("KALLA_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "kalla_profiles"))
+
+# Allocation sites kept in a run's summary
+TOP_ALLOCATIONS = 10
+
+# Held by the one run using cProfile and tracemalloc, which are process-wide
+_tools_lock = threading.Lock()
+
+_current = contextvars.ContextVar("kalla_profile", default=None)
+_depth = contextvars.ContextVar("kalla_profile_depth", default=0)
+
+def current():
+    """Profile of the run in progress in this context, or None"""
+    return _current.get()
+
+@contextmanager
+def stage(name, **info):
+    """Time a stage of the current profiled run; does nothing outside one"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth.reset(token)
+        profile.record(name, start, time.perf_counter(), depth, info)
+
+def propagate(func):
+    """func bound to the calling context, so stages it runs on a pool thread are recorded in the current run"""
+    profile = _current.get()
+    if profile is None:
+        return func
+    depth = _depth.get()
+
+    def run_in_profile(*args, **kwargs):
+        _current.set(profile)
+        _depth.set(depth)
+        return func(*args, **kwargs)
+
+    # A fresh context per call: one context cannot be entered by several pool threads at once
+    return lambda *args, **kwargs: contextvars.Context().run(run_in_profile, *args, **kwargs)
+
+class Profile:
+    """Stages, and optionally cProfile stats and a tracemalloc snapshot, of one run"""
+
+    def __init__(self, name, cprofile=PROFILE_CPROFILE, memory=PROFILE_TRACEMALLOC):
+        self.name = name
+        self.cprofile = cprofile
+        self.memory = memory
+        self.stages = []
+        self.started_at = None
+        self.seconds = None
+        self.stats = None
+        self.snapshot = None
+        self.tools_busy = False
+        self._start = None
+        self._profiler = None
+        self._holds_tools = False
+        self._stop_tracemalloc = False
+        self._running = False
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end, depth, info=None):
+        if not self._running:
+            # e.g. a hedged call that lost the race and finished after the run
+            return
+        with self._lock:
+            self.stages.append({
+                "stage": name,
+                "start": start - self._start,
+                "seconds": end - start,
+                "depth": depth,
+                "thread": threading.current_thread().name,
+                **(info or {})
+            })
+
+    def start(self):
+        """Make this the current run and start cProfile and tracemalloc if requested and not in use by another run"""
+        if self.cprofile or self.memory:
+            self._holds_tools = _tools_lock.acquire(blocking=False)
+            self.tools_busy = not self._holds_tools
+        if self._holds_tools and self.memory:
+            import tracemalloc
+            self._stop_tracemalloc = not tracemalloc.is_tracing()
+            if self._stop_tracemalloc:
+                tracemalloc.start()
+        if self._holds_tools and self.cprofile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._running = True
+        _current.set(self)
+        return self
+
+    def stop(self):
+        """End the run; safe to call more than once"""
+        if not self._running:
+            return self
+        self._running = False
+        if _current.get() is self:
+            _current.set(None)
+        self.seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            import pstats
+            self._profiler.disable()
+            self.stats = pstats.Stats(self._profiler)
+        if self._holds_tools and self.memory:
+            import tracemalloc
+            self.snapshot = tracemalloc.take_snapshot()
+            if self._stop_tracemalloc:
+                tracemalloc.stop()
+        if self._holds_tools:
+            self._holds_tools = False
+            _tools_lock.release()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def waterfall(self):
+        """Stages ordered by start time"""
+        with self._lock:
+            return sorted(self.stages, key=lambda entry: entry["start"])
+
+    def totals(self):
+        """Total seconds and count per stage name, slowest first"""
+        totals = {}
+        for entry in self.waterfall():
+            total = totals.setdefault(entry["stage"], {"stage": entry["stage"], "seconds": 0.0, "count": 0})
+            total["seconds"] += entry["seconds"]
+            total["count"] += 1
+        return sorted(totals.values(), key=lambda total: total["seconds"], reverse=True)
+
+    def top_functions(self, limit=15):
+        """(function, cumulative seconds, calls) from cProfile, by cumulative time"""
+        if self.stats is None:
+            return []
+        rows = [
+            (f"{os.path.basename(filename)}:{line}({function})", cumulative, calls)
+            for (filename, line, function), (_, calls, _, cumulative, _) in self.stats.stats.items()
+        ]
+        return sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+
+    def top_allocations(self, limit=TOP_ALLOCATIONS):
+        """(source line, KiB, blocks) from the tracemalloc snapshot, largest first"""
+        if self.snapshot is None:
+            return []
+        return [
+            (str(stat.traceback), stat.size / 1024, stat.count)
+            for stat in self.snapshot.statistics("lineno")[:limit]
+        ]
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "tools_busy": self.tools_busy,
+            "stages": self.waterfall(),
+            "totals": self.totals(),
+            "top_functions": self.top_functions(),
+            "top_allocations": self.top_allocations()
+        }
+
+    def dump(self, directory=PROFILE_DIR):
+        """Write <name>-<time>.json (and .prof, .tracemalloc) to directory; returns the JSON path"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at)) + f"-{int(self.started_at * 1000) % 1000:03d}"
+        base = os.path.join(directory, f"{self.name}-{stamp}")
+        with open(base + ".json", "w") as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+        if self.stats is not None:
+            self.stats.dump_stats(base + ".prof")
+        if self.snapshot is not None:
+            self.snapshot.dump(base + ".tracemalloc")
+        return base + ".json"
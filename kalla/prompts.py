@@ -0,0 +1,43 @@
+import os
+from functools import lru_cache
+
+# Directory holding the system prompts, overridable for deployments outside the repo
+PROMPTS_DIR = os.getenv(
+    "KALLA_PROMPTS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+)
+
+ANALYSIS_TYPES = ["comprehensive", "dimensions", "materials", "construction", "complexity"]
+
+ANALYSIS_PROMPTS = {
+    "dimensions": "Analyze this drawing to extract all dimensions, measurements, and size specifications. Identify length, width, height, thickness, and any other critical measurements.",
+    "materials": "Analyze this drawing to identify material requirements, specifications, and types. Look for wood types, hardware, finishes, and any special materials needed.",
+    "construction": "Analyze this drawing to identify construction methods, joinery techniques, and assembly requirements. Look for joints, fasteners, and construction details.",
+    "complexity": "Analyze this drawing to assess manufacturing complexity, difficulty level, and potential challenges. Consider precision requirements, special tools needed, and skill level required.",
+    "comprehensive": "Provide a comprehensive analysis of this technical drawing including dimensions, materials, construction methods, complexity assessment, and manufacturing recommendations."
+}
+
+@lru_cache(maxsize=None)
+def load_prompt(name):
+    """Read a system prompt from the prompts directory"""
+    with open(os.path.join(PROMPTS_DIR, f"{name}.md"), "r") as f:
+        return f.read()
+
+def analysis_prompt(analysis_type):
+    """User prompt for a drawing analysis type, defaulting to comprehensive"""
+    return ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["comprehensive"])
+
+# Analysis types answered as separate sections by one combined call; comprehensive is assembled from them
+SECTION_TYPES = [t for t in ANALYSIS_TYPES if t != "comprehensive"]
+
+def combined_analysis_prompt():
+    """User prompt asking for every analysis section in one JSON response"""
+    questions = "\n".join(f'- "{t}": {ANALYSIS_PROMPTS[t]}' for t in SECTION_TYPES)
+    return (
+        "Answer each of the following about this drawing. Return a JSON object with exactly these keys, "
+        "each value a detailed plain-text answer:\n" + questions
+    )
+
+def combine_sections(sections):
+    """Comprehensive analysis text assembled from section answers"""
+    return "\n\n".join(f"{t.upper()}\n{sections[t]}" for t in SECTION_TYPES if sections.get(t))
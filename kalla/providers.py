@@ -0,0 +1,22 @@
+import os
+
+# Default models, overridable through the environment
+DEFAULT_TEXT_MODEL = "gpt-4.1"
+DEFAULT_VISION_MODEL = "gpt-4o"
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-sonnet-20240229")
+
+def text_model():
+    """Model used for specification extraction and costing"""
+    return os.getenv("OPENAI_MODEL", DEFAULT_TEXT_MODEL)
+
+def vision_model():
+    """Vision-capable model used for drawing analysis"""
+    return os.getenv("OPENAI_MODEL", DEFAULT_VISION_MODEL)
+
+def openai_client(api_key=None):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+def anthropic_client(api_key=None):
+    import anthropic
+    return anthropic.Anthropic(api_key=api_key or os.getenv("ANTHROPIC_API_KEY"))
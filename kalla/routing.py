@@ -0,0 +1,164 @@
+"""
+Model routing by page and task.
+
+Each job is classified with cheap local heuristics (blank or cover page, simple
+detail, dense plan; short or long specification) and sent to a small fast model or
+the large one. A small-model answer that looks unreliable (invalid JSON, mostly
+empty extraction, a short or hedging drawing analysis) is retried on the large
+model. Routing is enabled with KALLA_MODEL_ROUTING=1 (or --route on the command
+line); per-model call counts, escalations and latency are kept in STATS.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+
+from kalla.providers import text_model, vision_model, ANTHROPIC_MODEL
+
+SMALL_TEXT_MODEL = os.getenv("KALLA_SMALL_TEXT_MODEL", "gpt-4.1-mini")
+SMALL_VISION_MODEL = os.getenv("KALLA_SMALL_VISION_MODEL", "gpt-4o-mini")
+ANTHROPIC_SMALL_MODEL = os.getenv("ANTHROPIC_SMALL_MODEL", "claude-3-haiku-20240307")
+
+# Specification text longer than this goes to the large text model
+LONG_SPEC_CHARS = int(os.getenv("KALLA_LONG_SPEC_CHARS", "12000"))
+
+# Page classification thresholds on the ink-transition grid (see tiling.detail_grid)
+BLANK_PAGE_DETAIL = 0.002
+DENSE_CELL_DETAIL = 0.1
+DENSE_PAGE_SHARE = 0.2
+
+# Drawing analyses shorter than this, or with this many hedges, are retried on the large model
+MIN_ANALYSIS_CHARS = 200
+MAX_HEDGES = 2
+
+# Extractions with fewer filled top-level fields than this share are retried on the large model
+MIN_FILLED_SHARE = 0.3
+
+_hedge_pattern = re.compile(
+    r"\b(unable to|cannot|can't|not legible|illegible|unclear|not possible to determine|too small to read)\b",
+    re.IGNORECASE
+)
+
+def routing_enabled():
+    return os.getenv("KALLA_MODEL_ROUTING", "").lower() in ("1", "true", "yes")
+
+class RouterStats:
+    """Thread-safe record of routed calls"""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, task, job_class, model, escalated, seconds):
+        with self._lock:
+            self.records.append({
+                "task": task,
+                "job_class": job_class,
+                "model": model,
+                "escalated": escalated,
+                "seconds": round(seconds, 3)
+            })
+
+    def summary(self):
+        """Calls, escalations and mean latency per first-choice model"""
+        with self._lock:
+            records = list(self.records)
+        summary = {}
+        for record in records:
+            entry = summary.setdefault(record["model"], {"calls": 0, "escalations": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["escalations"] += record["escalated"]
+            entry["seconds"] += record["seconds"]
+        for entry in summary.values():
+            entry["mean_seconds"] = round(entry.pop("seconds") / entry["calls"], 3)
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+STATS = RouterStats()
+
+def classify_page(image):
+    """'blank' (empty or cover page), 'simple' (single detail) or 'dense' (busy plan)"""
+    from kalla.tiling import detail_grid
+
+    small = image.copy()
+    small.thumbnail((512, 512))
+    density, _, _, _ = detail_grid(small, 16)
+    if float(density.mean()) < BLANK_PAGE_DETAIL:
+        return "blank"
+    if float((density >= DENSE_CELL_DETAIL).mean()) >= DENSE_PAGE_SHARE:
+        return "dense"
+    return "simple"
+
+def classify_text(text):
+    return "long_spec" if len(text or "") > LONG_SPEC_CHARS else "short_spec"
+
+def models(kind, provider="openai"):
+    """(small, large) models for 'vision' or 'text' jobs"""
+    if kind == "text":
+        return SMALL_TEXT_MODEL, text_model()
+    if provider == "anthropic":
+        return ANTHROPIC_SMALL_MODEL, ANTHROPIC_MODEL
+    return SMALL_VISION_MODEL, vision_model()
+
+def choose_model(job_class, kind, provider="openai"):
+    small, large = models(kind, provider)
+    return large if job_class in ("dense", "long_spec") else small
+
+def analysis_confident(text, job_class):
+    if not text or text.startswith("Error"):
+        return False
+    if job_class == "blank":
+        return True
+    return len(text) >= MIN_ANALYSIS_CHARS and len(_hedge_pattern.findall(text)) < MAX_HEDGES
+
+def _filled(value):
+    if isinstance(value, dict):
+        return any(_filled(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_filled(item) for item in value)
+    return value not in (None, "") and str(value).strip().lower() not in ("n/a", "not specified", "unknown")
+
+def extraction_confident(result):
+    if not isinstance(result, dict) or not result:
+        return False
+    return sum(1 for value in result.values() if _filled(value)) / len(result) >= MIN_FILLED_SHARE
+
+def vision_analyzer(analyze, provider="openai"):
+    """Wrap a vision call (image, analysis_type, note=..., model=...) with page routing and escalation"""
+    def analyze_routed(image, analysis_type, note=None):
+        job_class = classify_page(image)
+        model = choose_model(job_class, "vision", provider)
+        large = models("vision", provider)[1]
+
+        start = time.time()
+        result = analyze(image, analysis_type, note=note, model=model)
+        escalated = model != large and not analysis_confident(result, job_class)
+        if escalated:
+            result = analyze(image, analysis_type, note=note, model=large)
+        STATS.record("vision", job_class, model, escalated, time.time() - start)
+        return result
+    return analyze_routed
+
+def route_extraction(extract, text, confident=extraction_confident):
+    """Run extract(model) -> dict on the model chosen for text, escalating on invalid or unconfident JSON"""
+    job_class = classify_text(text)
+    model = choose_model(job_class, "text")
+    large = models("text")[1]
+
+    start = time.time()
+    try:
+        result = extract(model)
+        escalated = model != large and not confident(result)
+    except (json.JSONDecodeError, ValueError):
+        if model == large:
+            raise
+        escalated = True
+    if escalated:
+        result = extract(large)
+    STATS.record("extraction", job_class, model, escalated, time.time() - start)
+    return result
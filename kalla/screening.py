@@ -0,0 +1,101 @@
+"""
+Blank and cover page screening.
+
+Cheap local checks run before any vision call: the ink density and detail of a
+downscaled render, plus, for PDF pages, the number of vector drawing objects,
+embedded images and words from PyMuPDF. Pages with no manufacturing content
+(empty pages, cover sheets and text-only title or notes pages) can then be skipped.
+"""
+
+import os
+
+from kalla import profiling
+
+# Share of dark pixels below which a render counts as empty
+BLANK_INK = float(os.getenv("KALLA_BLANK_INK", "0.002"))
+
+# A PDF page with fewer vector drawing paths than this and no embedded image has no geometry
+MIN_VECTOR_OBJECTS = int(os.getenv("KALLA_MIN_VECTOR_OBJECTS", "10"))
+
+# Pages with more ink than this are analyzed without further checks; text-only pages
+# below it (cover sheets, title pages) are skipped
+COVER_MAX_INK = 0.03
+
+SCREEN_PIXELS = 256
+
+# Grey levels a pixel must be darker than the paper around it to count as ink
+INK_CONTRAST = int(os.getenv("KALLA_INK_CONTRAST", "20"))
+
+# Side of the window (on the downscaled render) the local paper brightness is taken over
+BACKGROUND_WINDOW = 31
+
+def ink_density(image):
+    """Share of dark pixels in a downscaled grayscale render.
+
+    Ink is measured against the paper around each pixel rather than a fixed grey level,
+    so grey or yellowed paper, scans and unevenly lit photos of a blank sheet are not
+    counted as ink. The paper brightness is the local maximum, smoothed; a single
+    histogram mode would fail on a photo lit from one side. Pages that are noisy
+    overall (paper texture, show-through) raise the threshold by their typical
+    distance from the paper, which is zero on a clean render. Filled areas much wider
+    than the window only count along their edges.
+    """
+    import numpy as np
+    from PIL import ImageFilter
+
+    small = image.convert("L")
+    small.thumbnail((SCREEN_PIXELS, SCREEN_PIXELS))
+    background = small.filter(ImageFilter.MaxFilter(BACKGROUND_WINDOW)).filter(ImageFilter.BoxBlur(BACKGROUND_WINDOW // 2))
+    darkness = np.asarray(background, dtype=np.int16) - np.asarray(small, dtype=np.int16)
+    return float((darkness > np.median(darkness) + INK_CONTRAST).mean())
+
+def vector_stats(pdf_file, page_number):
+    """Vector drawing paths, embedded images and words on a zero-based PDF page"""
+    from kalla.pdf import open_pdf
+
+    with open_pdf(pdf_file) as pdf_document:
+        page = pdf_document.load_page(page_number)
+        return {
+            "drawings": len(page.get_cdrawings()),
+            "images": len(page.get_images()),
+            "words": len(page.get_text("words"))
+        }
+
+def classify_content(image, pdf_file=None, page_number=None):
+    """Screen one page or image; returns {"content": "blank" | "cover" | "drawing", "reason": ...}.
+
+    For PDF pages (pdf_file and zero-based page_number) the vector objects are counted
+    too, but only when the render has little ink: listing the paths of a dense plan
+    takes longer than rendering it. Raster images are only screened for blank pages.
+    """
+    with profiling.stage("screening"):
+        ink = ink_density(image)
+        if ink >= COVER_MAX_INK:
+            return {"content": "drawing", "reason": "", "ink": round(ink, 4)}
+
+        stats = vector_stats(pdf_file, page_number) if pdf_file is not None else None
+    if ink < BLANK_INK and not (stats and stats["drawings"] >= MIN_VECTOR_OBJECTS):
+        return {"content": "blank", "reason": f"blank page ({ink:.2%} ink)", "ink": round(ink, 4)}
+
+    if stats and not stats["images"] and stats["drawings"] < MIN_VECTOR_OBJECTS:
+        return {
+            "content": "cover",
+            "reason": f"no drawing geometry ({stats['drawings']} vector paths, {stats['words']} words)",
+            "ink": round(ink, 4)
+        }
+
+    return {"content": "drawing", "reason": "", "ink": round(ink, 4)}
+
+def screen_pdf_pages(pdf_file, images):
+    """classify_content for each rendered page of a PDF"""
+    return [classify_content(image, pdf_file, number) for number, image in enumerate(images)]
+
+def skipped_result(name, screening, **fields):
+    """Analysis-result entry for a page that was not sent to a model"""
+    result = {
+        "drawing_name": name,
+        "analysis_result": f"Skipped: {screening['reason']}",
+        "skipped": screening["content"]
+    }
+    result.update(fields)
+    return result
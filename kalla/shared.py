@@ -0,0 +1,221 @@
+"""
+State shared between processes and replicas.
+
+Set KALLA_SHARED_STORE to a SQLite file (``/srv/kalla/shared.db`` or
+``sqlite:////srv/kalla/shared.db``) or a Redis URL (``redis://host:6379/0``,
+requires the redis package) and every Streamlit replica, API worker and command
+line run uses it for:
+
+- caches: model results by content key (pipeline stages, combined drawing sections,
+  command line results), so a result computed on one replica is a hit on all others
+- jobs: API job records, so any replica can answer GET /jobs/{id}
+- quotes: the quote history, appended to by id so replicas pick up each other's quotes
+
+Without it everything stays per process, as before.
+
+Lock strategy. SQLite runs in WAL mode: readers never block and are never blocked,
+and writers take the database lock with BEGIN IMMEDIATE for one short transaction
+(a single upsert or append), waiting up to KALLA_SHARED_LOCK_TIMEOUT seconds for
+another writer. No lock is held across a model call. Cache values are deterministic
+for their key, so two replicas racing on the same miss both compute and the last
+write wins with an equal value; job records are only written by the replica running
+the job; quotes are append-only. Redis gives the same guarantees with single-key
+commands (SET, RPUSH) and a script for the one-time quote import.
+
+The SQLite file must be on a local disk shared by the replicas (one host or a shared
+volume with working POSIX locks, not NFS); use Redis across hosts.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from kalla.cache import MemoryCache
+
+SHARED_STORE = os.getenv("KALLA_SHARED_STORE", "")
+
+# Seconds a writer waits for the SQLite lock before failing
+SHARED_LOCK_TIMEOUT = float(os.getenv("KALLA_SHARED_LOCK_TIMEOUT", "10"))
+
+# Entries kept in each process in front of the shared store
+SHARED_LOCAL_ENTRIES = int(os.getenv("KALLA_SHARED_LOCAL_ENTRIES", "256"))
+
+def _dumps(value):
+    # No default=str: a value that does not round-trip through JSON is not shared
+    return json.dumps(value)
+
+class SqliteStore:
+    """Shared store in a SQLite file; one connection per thread"""
+
+    def __init__(self, path, timeout=SHARED_LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._write() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, "
+                       "updated_at REAL, PRIMARY KEY (namespace, key))")
+            db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, value TEXT, updated_at REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS quotes (id INTEGER PRIMARY KEY AUTOINCREMENT, value TEXT)")
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit mode; transactions are opened explicitly in _write
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _write(self):
+        db = self._db()
+        # Take the write lock up front so the transaction cannot fail half way on a busy database
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def get(self, namespace, key):
+        row = self._db().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace, key, value):
+        payload = _dumps(value)
+        with self._write() as db:
+            db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (namespace, key, payload, time.time()))
+
+    def put_job(self, job):
+        payload = json.dumps(job, default=str)
+        with self._write() as db:
+            db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)", (job["job_id"], payload, time.time()))
+
+    def get_job(self, job_id):
+        row = self._db().execute("SELECT value FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def append_quote(self, quote):
+        payload = _dumps(quote)
+        with self._write() as db:
+            return db.execute("INSERT INTO quotes (value) VALUES (?)", (payload,)).lastrowid
+
+    def seed_quotes(self, quotes):
+        """Append quotes only if the store has none, e.g. to import a JSON history once"""
+        with self._write() as db:
+            if db.execute("SELECT 1 FROM quotes LIMIT 1").fetchone():
+                return False
+            db.executemany("INSERT INTO quotes (value) VALUES (?)", [(_dumps(quote),) for quote in quotes])
+            return True
+
+    def quotes_since(self, after_id=0):
+        """(id, quote) pairs appended after after_id, oldest first"""
+        rows = self._db().execute("SELECT id, value FROM quotes WHERE id > ? ORDER BY id", (after_id,)).fetchall()
+        return [(quote_id, json.loads(value)) for quote_id, value in rows]
+
+class RedisStore:
+    """Shared store in Redis, with the same interface as SqliteStore"""
+
+    SEED_SCRIPT = "if redis.call('LLEN', KEYS[1]) == 0 then redis.call('RPUSH', KEYS[1], unpack(ARGV)) return 1 end return 0"
+
+    def __init__(self, url, prefix="kalla"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    def get(self, namespace, key):
+        value = self.client.get(self._key("cache", namespace, key))
+        return json.loads(value) if value is not None else None
+
+    def set(self, namespace, key, value):
+        self.client.set(self._key("cache", namespace, key), _dumps(value))
+
+    def put_job(self, job):
+        self.client.set(self._key("job", job["job_id"]), json.dumps(job, default=str))
+
+    def get_job(self, job_id):
+        value = self.client.get(self._key("job", job_id))
+        return json.loads(value) if value is not None else None
+
+    def append_quote(self, quote):
+        # List positions are 1-based ids, matching SqliteStore
+        return self.client.rpush(self._key("quotes"), _dumps(quote))
+
+    def seed_quotes(self, quotes):
+        if not quotes:
+            return False
+        # Check and append in one server-side step so two replicas cannot both import
+        return bool(self.client.eval(self.SEED_SCRIPT, 1, self._key("quotes"), *[_dumps(q) for q in quotes]))
+
+    def quotes_since(self, after_id=0):
+        values = self.client.lrange(self._key("quotes"), after_id, -1)
+        return [(after_id + i + 1, json.loads(value)) for i, value in enumerate(values)]
+
+def open_store(url):
+    """SqliteStore or RedisStore for a KALLA_SHARED_STORE value"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SqliteStore(url)
+
+_store = None
+_store_lock = threading.Lock()
+
+def shared_store():
+    """The process-wide store configured by KALLA_SHARED_STORE, or None"""
+    global _store
+    if not SHARED_STORE:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = open_store(SHARED_STORE)
+        return _store
+
+class SharedCache:
+    """get/set cache backed by a shared store, with a small in-process LRU in front.
+
+    Values that cannot be stored as JSON are kept in the local cache only.
+    """
+
+    def __init__(self, store, namespace, max_entries=SHARED_LOCAL_ENTRIES):
+        self.store = store
+        self.namespace = namespace
+        self.local = MemoryCache(max_entries=max_entries)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.store.get(self.namespace, key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        try:
+            self.store.set(self.namespace, key, value)
+        except (TypeError, ValueError):
+            pass
+        return value
+
+def shared_cache(namespace, fallback=None):
+    """SharedCache for namespace when a shared store is configured, otherwise fallback (a MemoryCache by default)"""
+    store = shared_store()
+    if store is None:
+        return fallback if fallback is not None else MemoryCache()
+    return SharedCache(store, namespace)
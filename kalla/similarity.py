@@ -0,0 +1,213 @@
+import os
+import json
+import math
+
+from kalla.pricing import recompute_totals
+from kalla.text import tokens as _tokens, jaccard as _jaccard
+from kalla.units import to_number as _to_number, to_mm, replace_number, unit_of, canonical_unit
+from kalla.normalize import normalize_quote, quotes_frame
+
+# Default location of the persisted quote history
+QUOTE_HISTORY_PATH = os.getenv("QUOTE_HISTORY_PATH", "quotes/quote_history.json")
+
+# Minimum similarity score for a past quote to be offered as a scaled estimate
+SIMILARITY_THRESHOLD = float(os.getenv("QUOTE_SIMILARITY_THRESHOLD", "0.8"))
+
+# Relative weight of each feature group in the similarity score
+FEATURE_WEIGHTS = {
+    "furniture_type": 0.35,
+    "dimensions": 0.30,
+    "materials": 0.25,
+    "construction_methods": 0.10
+}
+
+def spec_features(spec_data):
+    """Reduce an extracted specification to the features used for similarity search"""
+    spec_data = spec_data or {}
+    dimensions = spec_data.get("dimensions") or {}
+
+    materials = set()
+    for material in spec_data.get("materials") or []:
+        if isinstance(material, dict):
+            materials |= _tokens(material.get("material_type"))
+        else:
+            materials |= _tokens(material)
+
+    construction = set()
+    for method in spec_data.get("construction_methods") or []:
+        construction |= _tokens(method)
+
+    return {
+        "furniture_type": _tokens(spec_data.get("furniture_type")),
+        # In mm, so "3 m" and "3000" compare as equal
+        "dimensions": [to_mm(dimensions.get(axis)) for axis in ("length", "width", "height")],
+        "materials": materials,
+        "construction_methods": construction,
+        "quantity": _to_number(spec_data.get("quantity"), 1.0) or 1.0
+    }
+
+def _dimension_similarity(a, b):
+    """Mean ratio of matching dimensions; unknown axes are ignored"""
+    ratios = []
+    for x, y in zip(a, b):
+        if x and y and x > 0 and y > 0:
+            ratios.append(min(x, y) / max(x, y))
+    if not ratios:
+        return 0.5
+    return sum(ratios) / len(ratios)
+
+def feature_similarity(a, b):
+    """Weighted similarity in [0, 1] between two feature dicts from spec_features"""
+    scores = {
+        "furniture_type": _jaccard(a["furniture_type"], b["furniture_type"]),
+        "dimensions": _dimension_similarity(a["dimensions"], b["dimensions"]),
+        "materials": _jaccard(a["materials"], b["materials"]),
+        "construction_methods": _jaccard(a["construction_methods"], b["construction_methods"])
+    }
+    return sum(FEATURE_WEIGHTS[key] * score for key, score in scores.items())
+
+def _footprint(dimensions):
+    """Plan area (length x width) in mm², falling back to whichever axes are known"""
+    known = [d for d in dimensions[:2] if d]
+    if not known:
+        return None
+    return math.prod(known)
+
+def scale_estimate(estimate, source_spec, target_spec):
+    """Scale a historical cost estimate to a new specification of the same family.
+
+    Material lines scale with the plan area and piece count, except lines counted in
+    pieces (legs, handles, hinges), which scale with the piece count only. Labor scales
+    with the piece count and half of the size change, and overhead and margin keep
+    their original percentages.
+    """
+    source = spec_features(source_spec)
+    target = spec_features(target_spec)
+
+    count_factor = target["quantity"] / source["quantity"]
+    source_area = _footprint(source["dimensions"])
+    target_area = _footprint(target["dimensions"])
+    size_factor = target_area / source_area if source_area and target_area else 1.0
+    labor_factor = count_factor * (1 + (size_factor - 1) * 0.5)
+
+    scaled = json.loads(json.dumps(estimate, default=str))
+
+    for line in scaled.get("material_costs") or []:
+        counted = canonical_unit(unit_of(line.get("quantity")))[0] == "pcs"
+        factor = count_factor if counted else size_factor * count_factor
+        quantity = _to_number(line.get("quantity"))
+        if quantity is not None:
+            line["quantity"] = replace_number(line.get("quantity"), quantity * factor)
+        total = (_to_number(line.get("total_cost"), 0.0) or 0.0) * factor
+        line["total_cost"] = f"{total:.2f}"
+
+    for line in scaled.get("labor_costs") or []:
+        hours = _to_number(line.get("hours"))
+        if hours is not None:
+            line["hours"] = f"{hours * labor_factor:.1f}"
+        total = (_to_number(line.get("total_cost"), 0.0) or 0.0) * labor_factor
+        line["total_cost"] = f"{total:.2f}"
+
+    return recompute_totals(scaled, pieces=target["quantity"])
+
+class QuoteIndex:
+    """In-memory nearest-neighbour index over past quotes, persisted as JSON.
+
+    With a shared store (see kalla.shared) quotes are appended there instead, so
+    every process sees the same history; the JSON file at path is only imported into
+    an empty store. Call refresh() to pick up quotes added by other processes.
+    """
+
+    def __init__(self, path=None, store=None):
+        self.path = path
+        self.store = store
+        self.quotes = []
+        self._features = []
+        self._records = []
+        self._frame = None
+        self._last_id = 0
+        saved = []
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                saved = json.load(f)
+        if store is None:
+            for quote in saved:
+                self._append(quote)
+        else:
+            if saved:
+                store.seed_quotes(saved)
+            self.refresh()
+
+    def __len__(self):
+        return len(self.quotes)
+
+    def _append(self, quote):
+        self.quotes.append(quote)
+        self._features.append(spec_features(quote.get("specifications")))
+        # Numbers are parsed once per quote, when it enters the index
+        self._records.append(normalize_quote(quote))
+        self._frame = None
+
+    def refresh(self):
+        """Append quotes added to the shared store since the last refresh; returns how many"""
+        if self.store is None:
+            return 0
+        added = self.store.quotes_since(self._last_id)
+        for quote_id, quote in added:
+            self._append(quote)
+            self._last_id = quote_id
+        return len(added)
+
+    def frame(self):
+        """Typed DataFrame with one row per quote (see kalla.normalize.normalize_quote)"""
+        if self._frame is None:
+            self._frame = quotes_frame(self._records)
+        return self._frame
+
+    def add(self, spec_data, cost_estimate, timestamp=None):
+        """Add a finished quote to the index and persist it if a path is configured"""
+        quote = {
+            "timestamp": str(timestamp) if timestamp is not None else None,
+            "specifications": spec_data,
+            "cost_estimate": cost_estimate
+        }
+        if self.store is not None:
+            self.store.append_quote(quote)
+            # Quotes other processes added in the meantime come in first, keeping the store's order
+            self.refresh()
+            return quote
+        self._append(quote)
+        self.save()
+        return quote
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.quotes, f, indent=2, default=str)
+
+    def nearest(self, spec_data, k=3):
+        """Return up to k (score, quote) pairs, best match first"""
+        target = spec_features(spec_data)
+        scored = [
+            (feature_similarity(target, features), quote)
+            for features, quote in zip(self._features, self.quotes)
+        ]
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return scored[:k]
+
+    def suggest_estimate(self, spec_data, threshold=SIMILARITY_THRESHOLD):
+        """Scale the closest past quote to spec_data, or return None if nothing is close enough"""
+        matches = self.nearest(spec_data, k=1)
+        if not matches or matches[0][0] < threshold:
+            return None
+        score, quote = matches[0]
+        estimate = scale_estimate(quote["cost_estimate"], quote["specifications"], spec_data)
+        return {
+            "similarity": round(score, 3),
+            "source_quote": quote,
+            "cost_estimate": estimate
+        }
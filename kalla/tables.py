@@ -0,0 +1,82 @@
+"""
+Display tables for extracted specifications and cost estimates.
+
+Nested model JSON is flattened into a Field/Value table, and cost lines are normalized
+into DataFrames whose numeric columns ('3.6 sqm', '€85.00') are parsed once. Tables
+are memoized by the content of their input, so Streamlit reruns reuse the same
+frames instead of rebuilding them; treat returned frames as read-only.
+"""
+
+import os
+
+from kalla.cache import MemoryCache, cache_key
+from kalla.units import to_numbers, parse_measures
+
+# Built tables kept per memo before the least recently used is dropped
+TABLE_MEMO_ENTRIES = int(os.getenv("KALLA_TABLE_MEMO_ENTRIES", "64"))
+
+# Cost line fields holding numbers in model output
+NUMERIC_COST_COLUMNS = ["quantity", "unit_cost", "total_cost", "hours", "hourly_rate"]
+
+def table_memo():
+    return MemoryCache(max_entries=TABLE_MEMO_ENTRIES)
+
+def memoized(memo, name, build, *inputs):
+    """build(*inputs), reused from memo while the inputs' content is unchanged"""
+    key = cache_key(name, *inputs)
+    value = memo.get(key)
+    if value is None:
+        value = memo.set(key, build(*inputs))
+    return value
+
+def flatten_json(data):
+    """Field/Value DataFrame of every scalar in nested JSON, with paths like 'materials[0].material_type'"""
+    import pandas as pd
+
+    fields, values = [], []
+    stack = [("", data)]
+    while stack:
+        prefix, value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(reversed([(f"{prefix}.{key}" if prefix else str(key), item) for key, item in value.items()]))
+        elif isinstance(value, list):
+            stack.extend(reversed([(f"{prefix}[{i}]", item) for i, item in enumerate(value)]))
+        else:
+            fields.append(prefix)
+            # One text column keeps mixed values displayable
+            values.append("" if value is None else str(value))
+    return pd.DataFrame({"Field": fields, "Value": values})
+
+def cost_lines_frame(lines):
+    """DataFrame of cost lines with numeric columns parsed; a quantity's canonical unit gets its own column"""
+    import pandas as pd
+
+    frame = pd.json_normalize(lines or [])
+    for column in NUMERIC_COST_COLUMNS:
+        if column not in frame:
+            continue
+        if column != "quantity":
+            frame[column] = to_numbers(frame[column])
+            continue
+        # Quantities are converted to canonical units (mm, sqm, pcs) so lines can be compared
+        measures = parse_measures(frame[column])
+        frame[column] = measures["value"]
+        if measures["unit"].ne("").any():
+            frame.insert(frame.columns.get_loc(column) + 1, "unit", measures["unit"])
+    return frame
+
+def estimate_frames(cost_estimate):
+    """Material and labor cost tables of an estimate"""
+    cost_estimate = cost_estimate or {}
+    return {
+        "material_costs": cost_lines_frame(cost_estimate.get("material_costs")),
+        "labor_costs": cost_lines_frame(cost_estimate.get("labor_costs"))
+    }
+
+def json_to_df(memo, json_data):
+    """Memoized flatten_json"""
+    return memoized(memo, "json", flatten_json, json_data)
+
+def estimate_tables(memo, cost_estimate):
+    """Memoized estimate_frames"""
+    return memoized(memo, "estimate", estimate_frames, cost_estimate)
@@ -0,0 +1,15 @@
+import re
+
+def tokens(text):
+    """Lower-case word tokens used for fuzzy matching of free-text fields"""
+    if not text:
+        return set()
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+def jaccard(a, b):
+    """Overlap of two token sets; two empty sets count as identical"""
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
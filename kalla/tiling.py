@@ -0,0 +1,257 @@
+"""
+Region-of-interest tiling for large-format drawings.
+
+An A1/A0 sheet rendered whole is downscaled by the vision model until small
+dimension text is unreadable. Instead, the page is analyzed once as a low-resolution
+overview, the densest regions (title block, dimension clusters, detail callouts) are
+found from the ink distribution of that overview, and only those regions are
+re-rendered at high DPI and analyzed concurrently. The findings are merged into one
+analysis text.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from kalla import profiling
+
+# Pages whose longer side exceeds this many mm are tiled (A1 and larger by default)
+LARGE_FORMAT_MM = float(os.getenv("KALLA_LARGE_FORMAT_MM", "600"))
+
+# Render resolution for region crops
+TILE_DPI = int(os.getenv("KALLA_TILE_DPI", "300"))
+
+# Maximum number of regions sent per page
+MAX_TILES = int(os.getenv("KALLA_MAX_TILES", "6"))
+
+# Longer side of a crop in pixels; larger crops are downscaled by the models anyway
+TILE_MAX_PIXELS = int(os.getenv("KALLA_TILE_MAX_PIXELS", "2048"))
+
+# Maximum number of tile analyses running at the same time
+TILE_WORKERS = int(os.getenv("KALLA_TILE_WORKERS", "4"))
+
+# Density grid resolution along the longer side of the page
+GRID_CELLS = 16
+
+# Cells with less than this share of the busiest cell's detail, or fewer ink
+# transitions per pixel than MIN_DETAIL, are treated as plain geometry or paper
+DETAIL_SHARE = 0.3
+MIN_DETAIL = 0.01
+
+# Largest share of the page one region may cover before it is split
+MAX_REGION_AREA = 0.25
+
+def is_large_format(width_mm, height_mm, threshold_mm=LARGE_FORMAT_MM):
+    return max(width_mm, height_mm) > threshold_mm
+
+def is_large_image(image, max_pixels=TILE_MAX_PIXELS):
+    """Images more than twice the size a model accepts lose detail when sent whole"""
+    return max(image.size) > 2 * max_pixels
+
+def detail_grid(image, cells):
+    """Ink transitions per pixel in each grid cell.
+
+    Text, dimension strings and callouts change between ink and paper far more often
+    than the long outlines and borders of the geometry, so counting transitions rather
+    than ink picks out the regions whose detail is lost when the sheet is downscaled.
+    """
+    import numpy as np
+
+    ink = np.asarray(image.convert("L"), dtype=np.uint8) < 160
+    height, width = ink.shape
+    cell = max(1, -(-max(height, width) // cells))
+    rows, cols = -(-height // cell), -(-width // cell)
+
+    transitions = np.zeros((rows * cell, cols * cell), dtype=np.float32)
+    transitions[:height, 1:width] += ink[:, 1:] != ink[:, :-1]
+    transitions[1:height, :width] += ink[1:, :] != ink[:-1, :]
+    density = transitions.reshape(rows, cell, cols, cell).mean(axis=(1, 3))
+    return density, cell, width, height
+
+def _components(mask):
+    """4-connected groups of True cells as lists of (row, col)"""
+    rows, cols = len(mask), len(mask[0]) if len(mask) else 0
+    seen = set()
+    groups = []
+    for row in range(rows):
+        for col in range(cols):
+            if not mask[row][col] or (row, col) in seen:
+                continue
+            stack, group = [(row, col)], []
+            seen.add((row, col))
+            while stack:
+                r, c = stack.pop()
+                group.append((r, c))
+                for nr, nc in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                    if 0 <= nr < rows and 0 <= nc < cols and mask[nr][nc] and (nr, nc) not in seen:
+                        seen.add((nr, nc))
+                        stack.append((nr, nc))
+            groups.append(group)
+    return groups
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def _split(box):
+    """Split a box covering too much of the page into quadrants"""
+    x0, y0, x1, y1 = box
+    if (x1 - x0) * (y1 - y0) <= MAX_REGION_AREA:
+        return [box]
+    xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+    boxes = []
+    for quadrant in ((x0, y0, xm, ym), (xm, y0, x1, ym), (x0, ym, xm, y1), (xm, ym, x1, y1)):
+        boxes.extend(_split(quadrant))
+    return boxes
+
+def detect_regions(image, max_regions=MAX_TILES, cells=GRID_CELLS):
+    """Dense regions of a drawing as (x0, y0, x1, y1) page fractions, densest first.
+
+    The page is divided into a coarse grid; cells with at least DETAIL_SHARE of the
+    busiest cell's detail (text, dimension strings, hatching) are grouped into connected regions,
+    padded by one cell, merged where they overlap and split when they cover more than
+    a quarter of the page.
+    """
+    density, cell, width, height = detail_grid(image, cells)
+    if not density.any():
+        return []
+
+    threshold = max(MIN_DETAIL, DETAIL_SHARE * float(density.max()))
+    mask = (density >= threshold).tolist()
+
+    regions = []
+    for group in _components(mask):
+        rows = [r for r, _ in group]
+        cols = [c for _, c in group]
+        box = [
+            max(0.0, (min(cols) - 1) * cell / width),
+            max(0.0, (min(rows) - 1) * cell / height),
+            min(1.0, (max(cols) + 2) * cell / width),
+            min(1.0, (max(rows) + 2) * cell / height)
+        ]
+        regions.append([box, float(sum(density[r, c] for r, c in group))])
+
+    # Padding can make neighbouring regions overlap; merge them so no text is sent twice
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                if _overlaps(regions[i][0], regions[j][0]):
+                    a, b = regions[i][0], regions[j][0]
+                    regions[i] = [[min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])],
+                                  regions[i][1] + regions[j][1]]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    regions.sort(key=lambda region: region[1], reverse=True)
+    boxes = []
+    for box, _ in regions:
+        boxes.extend(tuple(round(value, 4) for value in part) for part in _split(tuple(box)))
+    return boxes[:max_regions]
+
+def region_label(box):
+    """Human-readable position of a region, e.g. 'bottom-right'"""
+    x = (box[0] + box[2]) / 2
+    y = (box[1] + box[3]) / 2
+    vertical = "top" if y < 1 / 3 else "bottom" if y > 2 / 3 else "middle"
+    horizontal = "left" if x < 1 / 3 else "right" if x > 2 / 3 else "center"
+    return "center" if (vertical, horizontal) == ("middle", "center") else f"{vertical}-{horizontal}"
+
+def tile_note(box):
+    x0, y0, x1, y1 = box
+    return (
+        f"This image is a high-resolution crop of the {region_label(box)} region of a larger drawing sheet "
+        f"(x {x0:.0%}-{x1:.0%}, y {y0:.0%}-{y1:.0%}). Report only what is legible in this crop, "
+        "including exact dimension values, title block entries and detail callouts."
+    )
+
+def pdf_page_tiles(pdf_file, page_number, overview, dpi=TILE_DPI, max_tiles=MAX_TILES):
+    """High-DPI crops of the dense regions of a zero-based PDF page, as (box, image) pairs"""
+    from kalla import pdf
+
+    boxes = detect_regions(overview, max_regions=max_tiles)
+    images = pdf.render_pdf_regions(pdf_file, page_number, boxes, dpi=dpi, max_pixels=TILE_MAX_PIXELS)
+    return list(zip(boxes, images))
+
+def image_tiles(image, max_tiles=MAX_TILES):
+    """Crops of the dense regions of a large raster drawing at its native resolution, as (box, image) pairs"""
+    overview = image.copy()
+    overview.thumbnail((TILE_MAX_PIXELS, TILE_MAX_PIXELS))
+    width, height = image.size
+    tiles = []
+    for box in detect_regions(overview, max_regions=max_tiles):
+        crop = image.crop((int(box[0] * width), int(box[1] * height), int(box[2] * width), int(box[3] * height)))
+        crop.thumbnail((TILE_MAX_PIXELS, TILE_MAX_PIXELS))
+        tiles.append((box, crop))
+    return tiles
+
+def _lines(text):
+    return [line for line in (text or "").splitlines() if line.strip()]
+
+def _line_key(line):
+    return re.sub(r"[\s*#\-•]+", " ", line.lower()).strip()
+
+def merge_tile_findings(overview_result, tile_results):
+    """Combine the overview analysis with per-region findings.
+
+    tile_results are (box, text) pairs; lines already stated in the overview or an
+    earlier region are dropped, and failed region analyses are left out.
+    """
+    seen = {_line_key(line) for line in _lines(overview_result)}
+    sections = [f"Whole sheet overview:\n{overview_result}"]
+    for box, text in tile_results:
+        if not text or text.startswith("Error"):
+            continue
+        new_lines = []
+        for line in _lines(text):
+            key = _line_key(line)
+            if key and key not in seen:
+                seen.add(key)
+                new_lines.append(line)
+        if new_lines:
+            sections.append(f"Detail, {region_label(box)} region:\n" + "\n".join(new_lines))
+    return "\n\n".join(sections)
+
+def analyze_tiled(overview, tiles, analysis_type, analyze, max_workers=TILE_WORKERS):
+    """Analyze the overview and every tile concurrently and merge the findings.
+
+    analyze is called as analyze(image, analysis_type, note=...), e.g.
+    vision.analyze_drawing_with_openai with the API key bound.
+    """
+    def run(job):
+        image, note = job
+        return analyze(image, analysis_type, note=note)
+
+    jobs = [(overview, None)] + [(image, tile_note(box)) for box, image in tiles]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(profiling.propagate(run), jobs))
+    if not tiles or results[0].startswith("Error"):
+        return results[0]
+    return merge_tile_findings(results[0], [(box, text) for (box, _), text in zip(tiles, results[1:])])
+
+def analyze_with_tiles(image, analysis_type, analyze, pdf_file=None, page_number=None):
+    """Analyze a drawing, tiling it first when it is large-format.
+
+    For a PDF page pass pdf_file and the zero-based page_number with the rendered page as
+    image, so crops are re-rendered from the vector source at TILE_DPI; raster drawings
+    are cropped at their native resolution. Returns the analysis text and the boxes of
+    the regions that were analyzed separately (empty when the drawing was sent whole).
+    """
+    from kalla import pdf
+
+    if pdf_file is not None:
+        large = is_large_format(*pdf.pdf_page_sizes(pdf_file)[page_number])
+    else:
+        large = is_large_image(image)
+    if not large:
+        return analyze(image, analysis_type), []
+
+    with profiling.stage("tiling.render_tiles"):
+        if pdf_file is not None:
+            tiles = pdf_page_tiles(pdf_file, page_number, image)
+        else:
+            tiles = image_tiles(image)
+    return analyze_tiled(image, tiles, analysis_type, analyze), [box for box, _ in tiles]
@@ -0,0 +1,184 @@
+import re
+
+# A number with optional thousands separators and decimal part: 85, 3.6, 85,50, 1,234.50, 1.234,50
+_number_pattern = re.compile(r"-?\d+(?:[.,]\d+)*")
+
+_range_pattern = re.compile(
+    r"(?P<low>\d+(?:[.,]\d+)*)\s*(?:-|–|—|to)\s*(?P<high>\d+(?:[.,]\d+)*)", re.IGNORECASE
+)
+_size_pattern = re.compile(
+    r"\d+(?:[.,]\d+)*(?:\s*(?![x×])[a-z]+)?(?:\s*[x×*]\s*\d+(?:[.,]\d+)*(?:\s*(?![x×])[a-z]+)?)+", re.IGNORECASE
+)
+_unit_pattern = re.compile(r"(€|[a-z²³]+(?:\s?[23²³])?|%)", re.IGNORECASE)
+
+# Unit spellings in model output -> (canonical unit, factor to the canonical unit)
+UNIT_ALIASES = {
+    "mm": ("mm", 1.0), "millimeter": ("mm", 1.0), "millimeters": ("mm", 1.0), "millimetre": ("mm", 1.0),
+    "cm": ("mm", 10.0), "m": ("mm", 1000.0), "meter": ("mm", 1000.0), "meters": ("mm", 1000.0),
+    "metre": ("mm", 1000.0), "metres": ("mm", 1000.0),
+    "sqm": ("sqm", 1.0), "m2": ("sqm", 1.0), "m²": ("sqm", 1.0), "sq": ("sqm", 1.0),
+    "lm": ("lm", 1.0), "rm": ("lm", 1.0),
+    "pcs": ("pcs", 1.0), "pc": ("pcs", 1.0), "piece": ("pcs", 1.0), "pieces": ("pcs", 1.0),
+    "unit": ("pcs", 1.0), "units": ("pcs", 1.0), "sets": ("pcs", 1.0), "set": ("pcs", 1.0),
+    "h": ("h", 1.0), "hr": ("h", 1.0), "hrs": ("h", 1.0), "hour": ("h", 1.0), "hours": ("h", 1.0),
+    "day": ("weeks", 1 / 7), "days": ("weeks", 1 / 7),
+    "week": ("weeks", 1.0), "weeks": ("weeks", 1.0), "wk": ("weeks", 1.0), "wks": ("weeks", 1.0),
+    "month": ("weeks", 52 / 12), "months": ("weeks", 52 / 12),
+    "kg": ("kg", 1.0), "l": ("l", 1.0), "%": ("%", 1.0),
+    "€": ("EUR", 1.0), "eur": ("EUR", 1.0), "euro": ("EUR", 1.0), "euros": ("EUR", 1.0)
+}
+
+def _thousands_group(text):
+    """Whether 'a,bcd' reads as thousands: a is one to three digits not starting with 0"""
+    whole, _, fraction = text.partition(",")
+    return len(fraction) == 3 and 1 <= len(whole) <= 3 and not whole.startswith("0")
+
+def _decimal(text):
+    """Float from a matched number, treating a separator followed by exactly three digits as thousands.
+
+    '1,234.50' and '1.234,50' give 1234.5, '85,50' gives 85.5 and '1,234' gives 1234. A lone
+    comma is only a thousands separator after one to three digits not starting with 0, so
+    '0,125' gives 0.125 and '1234,567' gives 1234.567.
+    """
+    negative = text.startswith("-")
+    text = text.lstrip("-")
+    separators = [c for c in text if c in ".,"]
+    if not separators:
+        number = float(text)
+    elif len(set(separators)) == 2:
+        # The last separator is the decimal point
+        decimal = text[max(text.rfind("."), text.rfind(","))]
+        thousands = "," if decimal == "." else "."
+        number = float(text.replace(thousands, "").replace(decimal, "."))
+    elif len(separators) > 1:
+        number = float(text.replace(separators[0], ""))
+    elif separators[0] == "," and _thousands_group(text):
+        number = float(text.replace(",", ""))
+    else:
+        number = float(text.replace(",", "."))
+    return -number if negative else number
+
+def to_number(value, default=None):
+    """Pull the first number out of a model-formatted value such as '85.00' or '3.6 sqm'"""
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return default
+    match = _number_pattern.search(value.replace(" ", ""))
+    if not match:
+        return default
+    return _decimal(match.group())
+
+def to_numbers(values):
+    """Vectorized to_number over a list or pandas Series; NaN where there is no number"""
+    import pandas as pd
+
+    text = pd.Series(values, dtype="object").astype("string").str.replace(" ", "", regex=False)
+    numbers = text.str.extract(f"({_number_pattern.pattern})", expand=False)
+    # Each distinct number string is converted once
+    distinct = {number: _decimal(number) for number in numbers.dropna().unique()}
+    return numbers.map(distinct).astype(float)
+
+def canonical_unit(text):
+    """(canonical unit, factor) for a unit spelling, or (text, 1.0) when it is not known"""
+    key = (text or "").strip().lower().replace(" ", "").rstrip(".")
+    return UNIT_ALIASES.get(key, (key, 1.0))
+
+def parse_measure(value):
+    """Parse a model-formatted number with its unit.
+
+    Returns {"value", "unit", "low", "high", "values"}: lengths are converted to mm,
+    'sqm'/'m2' become sqm, 'pieces'/'pcs' pcs, hours h, days and months weeks, and
+    euro amounts EUR. A range ('3-4 weeks') gives its low and high with the midpoint
+    as value, and a size ('40x40mm', '1200 x 800 x 750 mm') gives every value with
+    the first as value. Unparseable values give value None.
+    """
+    empty = {"value": None, "unit": "", "low": None, "high": None, "values": []}
+    if isinstance(value, bool) or value is None:
+        return empty
+    if isinstance(value, (int, float)):
+        number = float(value)
+        return {"value": number, "unit": "", "low": number, "high": number, "values": [number]}
+    text = str(value).strip()
+
+    currency = "€" in text or re.search(r"\beur(?:o|os)?\b", text, re.IGNORECASE) is not None
+    size = _size_pattern.search(text)
+    if size:
+        numbers = [_decimal(n) for n in _number_pattern.findall(size.group())]
+        unit_text = re.sub(r"[\d.,\s x×*]", " ", size.group(), flags=re.IGNORECASE).split()
+        unit, factor = canonical_unit(unit_text[-1] if unit_text else _unit_after(text, size.end()))
+        values = [n * factor for n in numbers]
+        return {"value": values[0], "unit": unit, "low": min(values), "high": max(values), "values": values}
+
+    span = _range_pattern.search(text)
+    if span:
+        low, high = _decimal(span.group("low")), _decimal(span.group("high"))
+        end = span.end()
+    else:
+        match = _number_pattern.search(text)
+        if not match:
+            return empty
+        # Thousands written with spaces ('1 234,50') are joined before parsing
+        joined = re.match(r"-?\d{1,3}(?: \d{3})+(?:[.,]\d+)?", text[match.start():])
+        number_text = joined.group().replace(" ", "") if joined else match.group()
+        low = high = _decimal(number_text)
+        end = match.start() + len(joined.group() if joined else number_text)
+
+    unit, factor = ("EUR", 1.0) if currency else canonical_unit(_unit_after(text, end))
+    low, high = low * factor, high * factor
+    return {"value": (low + high) / 2, "unit": unit, "low": low, "high": high, "values": [low, high] if span else [low]}
+
+def _unit_after(text, position):
+    match = _unit_pattern.match(text[position:].lstrip())
+    return match.group() if match else ""
+
+def to_mm(value, default=None):
+    """A length in mm from '3000', '3 m', '120cm' or 3000; unitless values are taken as mm"""
+    measure = parse_measure(value)
+    if measure["value"] is None or measure["unit"] not in ("mm", ""):
+        return default
+    return measure["value"]
+
+def parse_measures(values):
+    """parse_measure over a list or pandas Series as a DataFrame with value, unit, low and high columns"""
+    import pandas as pd
+
+    series = pd.Series(values, dtype="object")
+    # Model output repeats a small set of strings, so each distinct value is parsed once
+    distinct = {}
+    for value in series.dropna().unique():
+        distinct[value] = parse_measure(value)
+    rows = [distinct.get(value) if value is not None else None for value in series]
+    empty = parse_measure(None)
+    frame = pd.DataFrame([row or empty for row in rows], index=series.index)
+    return frame[["value", "unit", "low", "high"]].astype({"value": float, "low": float, "high": float})
+
+def format_money(value, currency="€"):
+    """'€1,234.50' for a number or model-formatted amount; the original text when it has no number"""
+    number = to_number(value)
+    if number is None:
+        return "N/A" if value in (None, "") else str(value)
+    return f"{currency}{number:,.2f}"
+
+def replace_number(value, number, fmt="{:.2f}"):
+    """Swap the first number in a string such as '3.6 sqm' for a new value, keeping the unit"""
+    text = str(value)
+    if not _number_pattern.search(text):
+        return fmt.format(number)
+    return _number_pattern.sub(fmt.format(number), text, count=1)
+
+def unit_of(value):
+    """The text left after removing the first number, e.g. 'sqm' from '3.6 sqm'"""
+    if not isinstance(value, str):
+        return ""
+    return _number_pattern.sub("", value, count=1).strip()
+
+def units_of(values):
+    """Vectorized unit_of over a list or pandas Series"""
+    import pandas as pd
+
+    series = pd.Series(values, dtype="object")
+    text = series.where(series.map(lambda value: isinstance(value, str)), "").astype("string")
+    return text.str.replace(_number_pattern, "", n=1, regex=True).str.strip().fillna("").astype(object)
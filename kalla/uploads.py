@@ -0,0 +1,122 @@
+"""
+Content-addressed store for uploaded files.
+
+Streamlit hands each upload over as an in-memory UploadedFile. store_upload copies
+it to disk once, in chunks, under its SHA-256 digest, and returns a small
+StoredUpload handle. Pages keep the handles in session state instead of the
+uploads, and the same file uploaded twice, or by several users, is stored once.
+Handles are path-like: PyMuPDF and Pillow open the file from disk and read pages as
+needed, and PyPDF2 reads it through a memory map (see kalla.pdf), so a large tender
+package is not copied into memory again for every rerun or extraction.
+"""
+
+import os
+import re
+import mmap
+import time
+import hashlib
+import tempfile
+
+UPLOAD_STORE_DIR = os.getenv("KALLA_UPLOAD_STORE_DIR", os.path.join(tempfile.gettempdir(), "kalla_upload_store"))
+
+# Stored files not used for this long are removed when a new upload is stored
+UPLOAD_TTL_HOURS = float(os.getenv("KALLA_UPLOAD_TTL_HOURS", "24"))
+
+CHUNK_SIZE = 1024 * 1024
+
+class StoredUpload:
+    """Handle to a stored upload with the name, type and size of the original"""
+
+    def __init__(self, path, name, type, digest, size):
+        self.path = path
+        self.name = name
+        self.type = type
+        self.digest = digest
+        self.size = size
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return f"StoredUpload({self.name!r}, {self.digest[:12]}, {self.size} bytes)"
+
+    def mmap(self):
+        """Read-only memory map of the stored file, for use in a with block"""
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def touch(self):
+        """Mark the file as in use so it is not pruned"""
+        if os.path.exists(self.path):
+            os.utime(self.path)
+
+def _suffix(name):
+    suffix = os.path.splitext(name or "")[1].lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,8}", suffix) else ""
+
+def prune_uploads(directory=UPLOAD_STORE_DIR, max_age_hours=UPLOAD_TTL_HOURS):
+    """Remove stored files not used for max_age_hours; returns how many were removed"""
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(directory) if os.path.isdir(directory) else []:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            # Pruned concurrently by another session
+            continue
+    return removed
+
+def store_upload(upload, directory=UPLOAD_STORE_DIR):
+    """Copy a file-like upload (with name and type) to the store in chunks and return its handle"""
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    upload.seek(0)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: upload.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        path = os.path.join(directory, digest.hexdigest() + _suffix(getattr(upload, "name", "")))
+        if os.path.exists(path):
+            os.unlink(temp_path)
+            os.utime(path)
+        else:
+            os.replace(temp_path, path)
+            prune_uploads(directory)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    finally:
+        upload.seek(0)
+    return StoredUpload(path, getattr(upload, "name", os.path.basename(path)), getattr(upload, "type", None),
+                        digest.hexdigest(), size)
+
+def upload_id(upload):
+    """Identity of a Streamlit upload across reruns"""
+    return getattr(upload, "file_id", None) or (getattr(upload, "name", None), getattr(upload, "size", None), id(upload))
+
+def store_uploads(uploads, stored, directory=UPLOAD_STORE_DIR):
+    """Handles for a list of uploads; stored maps upload_id to handles from earlier reruns and is updated.
+
+    Uploads that are gone are dropped from stored, so only current handles stay in session state.
+    """
+    handles = []
+    current = {}
+    for upload in uploads:
+        key = upload_id(upload)
+        handle = stored.get(key)
+        if handle is None or not os.path.exists(handle.path):
+            handle = store_upload(upload, directory)
+        else:
+            handle.touch()
+        current[key] = handle
+        handles.append(handle)
+    stored.clear()
+    stored.update(current)
+    return handles
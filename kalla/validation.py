@@ -0,0 +1,159 @@
+"""
+Consistency checks for model cost estimates.
+
+The estimate JSON carries the model's own arithmetic: line totals, overhead and
+margin amounts, the total cost and the price per piece. reconcile_estimate
+recomputes all of them locally from the returned line items and corrects any
+mismatch, recording what changed under "consistency". Only an estimate whose
+structure is broken (a response that is not JSON, no usable cost lines, or an
+overhead or margin percentage that cannot be read) is sent back to the model, so
+an arithmetic slip never costs a full regeneration round trip.
+"""
+
+import os
+import json
+
+from kalla.pricing import recompute_totals
+from kalla.units import to_number
+
+# Relative difference tolerated between a stated and a recomputed amount (rounding)
+TOTAL_TOLERANCE = float(os.getenv("KALLA_TOTAL_TOLERANCE", "0.005"))
+
+# Model calls allowed to replace a structurally broken estimate
+MAX_REGENERATIONS = int(os.getenv("KALLA_MAX_REGENERATIONS", "1"))
+
+# (section, quantity field, rate field) for the priced line sections
+LINE_SECTIONS = [("material_costs", "quantity", "unit_cost"), ("labor_costs", "hours", "hourly_rate")]
+
+def _mismatch(found, expected):
+    if expected is None:
+        return False
+    if found is None:
+        return True
+    return abs(found - expected) > max(0.01, TOTAL_TOLERANCE * abs(expected))
+
+def _line_total(line, quantity_field, rate_field):
+    quantity = to_number(line.get(quantity_field))
+    rate = to_number(line.get(rate_field))
+    if quantity is None or rate is None:
+        return None
+    return round(quantity * rate, 2)
+
+def structure_issues(estimate, priced=True):
+    """Problems a local recomputation cannot fix: missing sections, lines without a usable total,
+    or overhead and margin percentages that cannot be read.
+
+    With priced=False (a takeoff priced locally afterwards) a line only needs a quantity or hours.
+    """
+    if not isinstance(estimate, dict):
+        return ["estimate is not a JSON object"]
+    issues = []
+    line_count = 0
+    for section, quantity_field, rate_field in LINE_SECTIONS:
+        lines = estimate.get(section)
+        if lines is None:
+            continue
+        if not isinstance(lines, list):
+            issues.append(f"{section} is not a list")
+            continue
+        for i, line in enumerate(lines):
+            if not isinstance(line, dict):
+                issues.append(f"{section}[{i}] is not an object")
+            elif not priced and to_number(line.get(quantity_field)) is None:
+                issues.append(f"{section}[{i}] has no usable {quantity_field}")
+            elif priced and to_number(line.get("total_cost")) is None and _line_total(line, quantity_field, rate_field) is None:
+                issues.append(f"{section}[{i}] has no usable total_cost")
+            else:
+                line_count += 1
+    for section in ("overhead_costs", "profit_margin"):
+        block = estimate.get(section)
+        if isinstance(block, dict) and to_number(block.get("percentage")) is None:
+            issues.append(f"{section} has no usable percentage")
+    if not line_count and not issues:
+        issues.append("estimate has no cost lines")
+    return issues
+
+def arithmetic_issues(estimate, pieces=1):
+    """Stated amounts that differ from a local recomputation, as {field, found, expected}.
+
+    Line totals are checked against quantity x rate, then overhead and margin against
+    their percentages and the total and price per piece against the line sums, using
+    the same order as pricing.recompute_totals.
+    """
+    issues = []
+
+    def check(field, found, expected):
+        if _mismatch(found, expected):
+            issues.append({"field": field, "found": found, "expected": round(expected, 2)})
+
+    subtotal = 0.0
+    for section, quantity_field, rate_field in LINE_SECTIONS:
+        for i, line in enumerate(estimate.get(section) or []):
+            stated = to_number(line.get("total_cost"))
+            expected = _line_total(line, quantity_field, rate_field)
+            check(f"{section}[{i}].total_cost", stated, expected)
+            subtotal += expected if expected is not None else (stated or 0.0)
+
+    for section in ("overhead_costs", "profit_margin"):
+        block = estimate.get(section)
+        if isinstance(block, dict):
+            percentage = to_number(block.get("percentage"))
+            if percentage is None:
+                subtotal += to_number(block.get("amount"), 0.0) or 0.0
+                continue
+            amount = subtotal * percentage / 100
+            check(f"{section}.amount", to_number(block.get("amount")), amount)
+            subtotal += amount
+
+    check("total_cost", to_number(estimate.get("total_cost")), subtotal)
+    check("price_per_unit", to_number(estimate.get("price_per_unit")), subtotal / (pieces or 1))
+    return issues
+
+def reconcile_estimate(estimate, pieces=1):
+    """Copy of estimate with every line total and total recomputed locally.
+
+    Corrections are listed under estimate["consistency"]["corrections"]; lines whose
+    quantity or rate cannot be read keep their stated total.
+    """
+    corrections = arithmetic_issues(estimate, pieces)
+    reconciled = json.loads(json.dumps(estimate, default=str))
+    for section, quantity_field, rate_field in LINE_SECTIONS:
+        for line in reconciled.get(section) or []:
+            expected = _line_total(line, quantity_field, rate_field)
+            if _mismatch(to_number(line.get("total_cost")), expected):
+                line["total_cost"] = f"{expected:.2f}"
+    recompute_totals(reconciled, pieces=pieces)
+
+    consistency = dict(reconciled.get("consistency") or {})
+    consistency["corrections"] = corrections
+    reconciled["consistency"] = consistency
+    return reconciled
+
+def _generated(generate, priced):
+    """(estimate, structure issues) of one generate() call; a response that is not JSON is an issue"""
+    try:
+        estimate = generate()
+    except json.JSONDecodeError as e:
+        return None, [f"response is not valid JSON ({e})"]
+    return estimate, structure_issues(estimate, priced)
+
+def checked_estimate(generate, pieces=1, priced=True, max_regenerations=MAX_REGENERATIONS):
+    """Call generate() for an estimate, regenerating only while its structure is broken, then reconcile it.
+
+    An estimate that is still broken after max_regenerations extra calls is returned
+    unreconciled with its problems under estimate["consistency"]["structure_issues"];
+    a response that was not a JSON object at all becomes an empty estimate.
+    """
+    estimate, issues = _generated(generate, priced)
+    regenerations = 0
+    while issues and regenerations < max_regenerations:
+        estimate, issues = _generated(generate, priced)
+        regenerations += 1
+
+    if issues:
+        consistency = {"structure_issues": issues, "regenerations": regenerations}
+        return dict(estimate, consistency=consistency) if isinstance(estimate, dict) else {"consistency": consistency}
+
+    estimate = reconcile_estimate(estimate, pieces)
+    estimate["consistency"]["regenerations"] = regenerations
+    return estimate
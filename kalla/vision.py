@@ -0,0 +1,283 @@
+import os
+import re
+import json
+import base64
+import threading
+from io import BytesIO
+from functools import partial
+
+from kalla import profiling
+from kalla.cache import MemoryCache, cache_key, image_digest
+from kalla.prompts import load_prompt, analysis_prompt, combined_analysis_prompt, combine_sections, SECTION_TYPES
+from kalla.providers import openai_client, anthropic_client, vision_model, ANTHROPIC_MODEL
+
+# Format and quality drawings are sent in (JPEG, PNG or WEBP; quality applies to JPEG and WEBP)
+IMAGE_FORMAT = os.getenv("KALLA_IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("KALLA_IMAGE_QUALITY", "75"))
+
+MEDIA_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# Encoded payloads kept in memory, most recently used first
+ENCODED_IMAGES = int(os.getenv("KALLA_ENCODED_IMAGES", "32"))
+
+_encode_lock = threading.Lock()
+_payloads = MemoryCache(max_entries=ENCODED_IMAGES)
+
+def encode_image(image, image_format=None, quality=None):
+    """(media type, base64 data) of an image in IMAGE_FORMAT at IMAGE_QUALITY.
+
+    Payloads are memoized by the image's pixels (image_digest), so every provider,
+    retry, hedge, model escalation and analysis type sent the same page reuses one
+    encoding, and so does the same page rendered again on a later rerun. Hashing the
+    pixels is much cheaper than encoding them; an image edited in place has new pixels
+    and is encoded again.
+    """
+    image_format = (image_format or IMAGE_FORMAT).upper()
+    if image_format not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported image format {image_format}; use JPEG, PNG or WEBP")
+    quality = quality or IMAGE_QUALITY
+    key = cache_key(image_digest(image), image_format, quality)
+    with _encode_lock:
+        payload = _payloads.get(key)
+    if payload is not None:
+        return payload
+
+    with profiling.stage("encode.base64", pixels=image.width * image.height):
+        buffered = BytesIO()
+        options = {"optimize": True} if image_format == "PNG" else {"quality": quality, "optimize": True}
+        (image if image.mode == "RGB" else image.convert("RGB")).save(buffered, format=image_format, **options)
+        payload = (MEDIA_TYPES[image_format], base64.b64encode(buffered.getvalue()).decode())
+
+    # Concurrent first calls may both encode; the payloads are identical
+    with _encode_lock:
+        _payloads.set(key, payload)
+    return payload
+
+# Function to encode image to base64
+def encode_image_to_base64(image):
+    return encode_image(image)[1]
+
+# Function to analyze drawing with OpenAI Vision
+def analyze_drawing_with_openai(image, analysis_type, api_key=None, note=None, model=None):
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return "Error: OpenAI API key not available. Please check your .env file."
+
+    client = openai_client(api_key)
+
+    # For image analysis, we need a vision-capable model
+    model = model or vision_model()
+
+    # Encode image to base64
+    media_type, base64_image = encode_image(image)
+
+    system_prompt = load_prompt("drawing_analysis")
+    user_prompt = analysis_prompt(analysis_type)
+    # Context for the image, e.g. which part of a larger sheet a crop shows
+    if note:
+        user_prompt = f"{note}\n\n{user_prompt}"
+
+    with profiling.stage("model.openai", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": user_prompt
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{media_type};base64,{base64_image}"
+                            }
+                        }
+                    ]
+                }
+            ],
+            max_tokens=1000
+        )
+
+    return response.choices[0].message.content
+
+# Function to analyze drawing with Anthropic Claude (if available)
+def analyze_drawing_with_anthropic(image, analysis_type, api_key=None, note=None, model=None):
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        return "Error: Anthropic API key not available. Please check your .env file."
+
+    try:
+        client = anthropic_client(api_key)
+
+        # Encode image to base64
+        media_type, base64_image = encode_image(image)
+
+        system_prompt = load_prompt("drawing_analysis")
+        user_prompt = analysis_prompt(analysis_type)
+        if note:
+            user_prompt = f"{note}\n\n{user_prompt}"
+
+        with profiling.stage("model.anthropic", model=model or ANTHROPIC_MODEL):
+            message = client.messages.create(
+                model=model or ANTHROPIC_MODEL,
+                max_tokens=1000,
+                system=system_prompt,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": user_prompt
+                            },
+                            {
+                                "type": "image",
+                                "source": {
+                                    "type": "base64",
+                                    "media_type": media_type,
+                                    "data": base64_image
+                                }
+                            }
+                        ]
+                    }
+                ]
+            )
+
+        return message.content[0].text
+
+    except ImportError:
+        return "Anthropic Claude not available. Please install anthropic package."
+    except Exception as e:
+        return f"Error analyzing with Anthropic: {str(e)}"
+
+def _section_text(value):
+    if isinstance(value, dict):
+        return "\n".join(f"{key}: {_section_text(item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return "\n".join(f"- {_section_text(item)}" for item in value)
+    return str(value or "")
+
+def parse_sections(text):
+    """Section answers from a combined analysis response, plus the assembled comprehensive text.
+
+    The JSON object may be wrapped in prose or a code fence; an unparseable response is
+    returned as an error for every section.
+    """
+    match = re.search(r"\{.*\}", text or "", re.S)
+    try:
+        data = json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        return {t: "Error: combined analysis response was not valid JSON" for t in SECTION_TYPES + ["comprehensive"]}
+
+    sections = {t: _section_text(data.get(t)) for t in SECTION_TYPES}
+    sections["comprehensive"] = combine_sections(sections)
+    return sections
+
+# Function to answer every analysis type for a drawing in one OpenAI Vision call
+def analyze_drawing_sections_with_openai(image, api_key=None):
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        error = "Error: OpenAI API key not available. Please check your .env file."
+        return {t: error for t in SECTION_TYPES + ["comprehensive"]}
+
+    client = openai_client(api_key)
+    model = vision_model()
+    media_type, base64_image = encode_image(image)
+
+    with profiling.stage("model.openai", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": load_prompt("drawing_analysis")},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": combined_analysis_prompt()},
+                        {"type": "image_url", "image_url": {"url": f"data:{media_type};base64,{base64_image}"}}
+                    ]
+                }
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=1000 * len(SECTION_TYPES)
+        )
+
+    return parse_sections(response.choices[0].message.content)
+
+# Function to answer every analysis type for a drawing in one Anthropic Claude call
+def analyze_drawing_sections_with_anthropic(image, api_key=None):
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        error = "Error: Anthropic API key not available. Please check your .env file."
+        return {t: error for t in SECTION_TYPES + ["comprehensive"]}
+
+    try:
+        client = anthropic_client(api_key)
+        media_type, base64_image = encode_image(image)
+
+        with profiling.stage("model.anthropic", model=ANTHROPIC_MODEL):
+            message = client.messages.create(
+                model=ANTHROPIC_MODEL,
+                max_tokens=1000 * len(SECTION_TYPES),
+                system=load_prompt("drawing_analysis"),
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": combined_analysis_prompt()},
+                            {
+                                "type": "image",
+                                "source": {"type": "base64", "media_type": media_type, "data": base64_image}
+                            }
+                        ]
+                    }
+                ]
+            )
+
+        return parse_sections(message.content[0].text)
+
+    except Exception as e:
+        return {t: f"Error analyzing with Anthropic: {str(e)}" for t in SECTION_TYPES + ["comprehensive"]}
+
+ALTERNATE_PROVIDER = {"openai": "anthropic", "anthropic": "openai"}
+API_KEY_VARIABLES = {"openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+def provider_analyzer(provider, api_key=None, budget=None):
+    """Vision call for a provider with its API key bound, charged to budget when given and
+    routed between models when routing is enabled"""
+    from kalla import routing
+
+    analyze = analyze_drawing_with_anthropic if provider == "anthropic" else analyze_drawing_with_openai
+    analyze = partial(analyze, api_key=api_key)
+    if budget is not None:
+        analyze = budget.analyzer(analyze, provider)
+    if routing.routing_enabled():
+        analyze = routing.vision_analyzer(analyze, provider)
+    return analyze
+
+def drawing_analyzer(provider, api_key=None, hedge=False, alternate_api_key=None, local_ocr=False, budget=None):
+    """Vision callable (image, analysis_type, note=None) for the drawing pages, CLI and API.
+
+    hedge sends slow or failing calls to the other provider as well when its key is
+    available (see kalla.hedging); local_ocr adds the Tesseract pre-pass (see kalla.ocr);
+    budget charges every model call to a kalla.budget.Budget and degrades them near its limits.
+    """
+    from kalla import hedging, ocr
+
+    analyze = provider_analyzer(provider, api_key, budget)
+    alternate = ALTERNATE_PROVIDER[provider]
+    if hedge and (alternate_api_key or os.getenv(API_KEY_VARIABLES[alternate])):
+        analyze = hedging.hedged_analyzer([
+            (provider, analyze),
+            (alternate, provider_analyzer(alternate, alternate_api_key, budget))
+        ])
+    if local_ocr:
+        analyze = ocr.ocr_analyzer(analyze)
+    return analyze
@@ -1,15 +1,20 @@
 import streamlit as st
-import os
-import tempfile
 import pandas as pd
-import PyPDF2
-import openai
-from openai import OpenAI
-import json
-import re
-from io import StringIO
-from PIL import Image
-from utils import load_api_keys
+from functools import partial
+from utils import load_api_keys, start_profile, finish_profile
+from kalla.pdf import extract_pages_from_pdf
+from kalla.extraction import extract_specifications_chunked, extract_items_chunked
+from kalla.pricing import generate_cost_estimate, price_items, DEFAULT_OVERHEAD_PERCENTAGE, DEFAULT_MARGIN_PERCENTAGE
+from kalla.similarity import QuoteIndex, QUOTE_HISTORY_PATH
+from kalla.pipeline import Pipeline, add_estimate_nodes
+from kalla.nesting import nest_materials, parts_from_items
+from kalla.export import available_formats, export_file, EXPORT_MIME
+from kalla.tables import json_to_df, estimate_tables, memoized, table_memo
+from kalla.units import format_money, to_number
+from kalla.uploads import store_uploads
+from kalla.shared import shared_cache, shared_store
+from kalla.providers import text_model
+from kalla.budget import Budget, BUDGET_TOKENS, BUDGET_EUR, ESTIMATE_RESERVE
 
 st.set_page_config(
     page_title="RFQ Analysis",
@@ -36,192 +41,43 @@ if 'saved_quotes' not in st.session_state:
     st.session_state.saved_quotes = []
 if 'use_demo_data' not in st.session_state:
     st.session_state.use_demo_data = False
+if 'quote_index' not in st.session_state:
+    st.session_state.quote_index = QuoteIndex(QUOTE_HISTORY_PATH, store=shared_store())
+else:
+    # Quotes saved on other replicas since the last rerun
+    st.session_state.quote_index.refresh()
+if 'estimate_source' not in st.session_state:
+    st.session_state.estimate_source = None
+if 'estimate_mode' not in st.session_state:
+    st.session_state.estimate_mode = None
+if 'extracted_items' not in st.session_state:
+    st.session_state.extracted_items = None
+if 'pipeline_memo' not in st.session_state:
+    # Shared across sessions and replicas when KALLA_SHARED_STORE is set
+    st.session_state.pipeline_memo = shared_cache("pipeline")
+if 'upload_handles' not in st.session_state:
+    st.session_state.upload_handles = {}
+if 'table_memo' not in st.session_state:
+    # Display tables by content, so reruns don't rebuild DataFrames for an unchanged estimate
+    st.session_state.table_memo = table_memo()
 
-# Function to extract text from PDF
-def extract_text_from_pdf(pdf_file):
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        temp_file.write(pdf_file.getvalue())
-        temp_path = temp_file.name
-    
-    text = ""
-    with open(temp_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-    
-    os.unlink(temp_path)
-    return text
-
-# Function to extract text from PDF file path
-def extract_text_from_pdf_path(file_path):
-    text = ""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-    
-    return text
+# Memoized pipeline nodes are rebuilt each rerun; unchanged inputs are served from the memo
+pipeline = Pipeline(st.session_state.pipeline_memo)
 
-# Function to extract data using OpenAI
-def extract_specifications_with_openai(text, document_type):
-    client = OpenAI(api_key=st.session_state.openai_api_key)
-    
-    # Get model from environment or use default
-    model = os.getenv("OPENAI_MODEL", "gpt-4.1")
-    
-    # Load the system prompt
-    with open("prompts/rfq_analysis.md", "r") as f:
-        system_prompt = f.read()
-    
-    user_prompt = f"""
-    Extract all relevant furniture manufacturing specifications from this {document_type} document. 
-    The document text is provided below:
-    
-    {text}
-    
-    Return the extracted information as a JSON object with the following structure:
-    {{
-        "project_name": "Project name or identifier",
-        "furniture_type": "Type of furniture (e.g., table, chair, cabinet)",
-        "dimensions": {{
-            "length": "Length in mm",
-            "width": "Width in mm", 
-            "height": "Height in mm"
-        }},
-        "materials": [
-            {{
-                "material_type": "Type of material",
-                "specifications": "Material specifications",
-                "quantity": "Required quantity"
-            }}
-        ],
-        "construction_methods": [
-            "List of construction methods required"
-        ],
-        "finish_requirements": "Finish specifications",
-        "quantity": "Number of pieces to manufacture",
-        "delivery_requirements": "Delivery timeline and requirements",
-        "special_features": [
-            "List of special features or customizations"
-        ],
-        "quality_standards": "Quality standards and certifications",
-        "additional_notes": "Any additional requirements or notes"
-    }}
-    """
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    return json.loads(response.choices[0].message.content)
+# Function to register a spec extraction node for an uploaded PDF; the upload is written to the upload
+# store once and read from disk, so only its handle is kept across reruns. The model call is charged to
+# the RFQ budget when it runs, not when it is served from the memo
+def add_extraction_node(name, uploaded_file, document_type, extract=extract_specifications_chunked):
+    stored = store_uploads([uploaded_file], st.session_state.upload_handles.setdefault(name, {}))[0]
 
-# Function to generate cost estimate
-def generate_cost_estimate(spec_data, material_db, drawing_analyses=None):
-    client = OpenAI(api_key=st.session_state.openai_api_key)
-    
-    # Get model from environment or use default
-    model = os.getenv("OPENAI_MODEL", "gpt-4.1")
-    
-    # Load the system prompt
-    with open("prompts/rfq_analysis.md", "r") as f:
-        system_prompt = f.read()
-    
-    # Prepare drawing analyses text if available
-    drawing_analyses_text = ""
-    if drawing_analyses and len(drawing_analyses) > 0:
-        drawing_analyses_text = "DRAWING ANALYSES:\n"
-        for i, analysis in enumerate(drawing_analyses):
-            drawing_analyses_text += f"\nDrawing {i+1}: {analysis['drawing_name']}\n"
-            drawing_analyses_text += f"Analysis: {analysis['analysis_result']}\n"
-            drawing_analyses_text += "-" * 50 + "\n"
-    
-    user_prompt = f"""
-    Generate a detailed cost estimate for the following furniture manufacturing project:
-    
-    PROJECT SPECIFICATIONS:
-    {json.dumps(spec_data, indent=2)}
-    
-    MATERIAL DATABASE:
-    {json.dumps(material_db, indent=2)}
-    
-    {drawing_analyses_text}
-    
-    Return the cost estimate as a JSON object with the following structure:
-    {{
-        "project_summary": "Brief overview of the project",
-        "material_costs": [
-            {{
-                "item": "Material name",
-                "specification": "Material specification",
-                "quantity": "Required quantity",
-                "unit_cost": "Cost per unit",
-                "total_cost": "Total cost for this material"
-            }}
-        ],
-        "labor_costs": [
-            {{
-                "operation": "Manufacturing operation",
-                "hours": "Estimated hours",
-                "hourly_rate": "Hourly rate",
-                "total_cost": "Total labor cost"
-            }}
-        ],
-        "overhead_costs": {{
-            "percentage": "Overhead percentage",
-            "amount": "Overhead amount"
-        }},
-        "profit_margin": {{
-            "percentage": "Profit margin percentage",
-            "amount": "Profit amount"
-        }},
-        "total_cost": "Total project cost",
-        "price_per_unit": "Price per furniture piece",
-        "delivery_timeline": "Estimated delivery timeline",
-        "notes": "Additional notes and recommendations"
-    }}
-    """
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    return json.loads(response.choices[0].message.content)
+    def run_extraction():
+        pages = extract_pages_from_pdf(stored)
+        extracted = extract(pages, document_type, api_key=st.session_state.openai_api_key)
+        if budget is not None:
+            budget.charge_text(text_model(), pages, extracted)
+        return extracted
 
-# Function to convert JSON to DataFrame
-def json_to_df(json_data):
-    """Convert JSON data to a pandas DataFrame for display"""
-    # Flatten the JSON if it's nested
-    flat_data = {}
-    
-    def flatten(data, prefix=""):
-        if isinstance(data, dict):
-            for key, value in data.items():
-                new_key = f"{prefix}{key}" if prefix else key
-                if isinstance(value, (dict, list)) and not isinstance(value, str):
-                    flatten(value, f"{new_key}.")
-                else:
-                    flat_data[new_key] = value
-        elif isinstance(data, list) and not isinstance(data, str):
-            for i, item in enumerate(data):
-                flatten(item, f"{prefix}[{i}].")
-    
-    flatten(json_data)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(flat_data.items(), columns=["Field", "Value"])
-    return df
+    pipeline.add(name, run_extraction, fingerprint=[stored.digest, document_type, extract.__name__])
 
 # API Key status
 with st.sidebar:
@@ -239,6 +95,21 @@ with st.sidebar:
     use_demo = st.checkbox("Use demo data for testing", value=st.session_state.use_demo_data)
     st.session_state.use_demo_data = use_demo
 
+# Token and spend limits for this RFQ's model calls (see kalla.budget), kept across reruns and started
+# again when a limit changes. There is no wall-time limit here, as the session mostly waits on the user
+with st.sidebar:
+    st.header("RFQ Budget")
+    budget_tokens = st.number_input("Max tokens", min_value=0, value=BUDGET_TOKENS, step=10000,
+                                    key="rfq_budget_tokens")
+    budget_eur = st.number_input("Max spend (EUR)", min_value=0.0, value=BUDGET_EUR, step=0.5, key="rfq_budget_eur")
+if st.session_state.get('budget_limits') != (budget_tokens, budget_eur):
+    st.session_state.budget_limits = (budget_tokens, budget_eur)
+    st.session_state.budget = Budget(budget_tokens, budget_eur) if budget_tokens or budget_eur else None
+budget = st.session_state.budget
+
+# Opt-in timing of this run's stages, shown in the sidebar (see kalla.profiling)
+profile = start_profile("rfq")
+
 # Main content
 if not api_keys_loaded['openai_api_key']:
     st.error("❌ OpenAI API key not found in .env file. Please add your OPENAI_API_KEY to the .env file to continue.")
@@ -281,6 +152,7 @@ demo_material_db = {
             "grade": "A",
             "thickness": "25mm",
             "price_per_sqm": "85.00",
+            "sheet_size": "3000x1250",
             "supplier": "TimberCo"
         },
         {
@@ -300,6 +172,13 @@ demo_material_db = {
 # File upload section
 st.header("Upload Project Documents")
 
+extraction_mode = st.radio(
+    "Extraction mode",
+    ["Single item", "Item list (multi-item RFQ)"],
+    horizontal=True,
+    help="Item list mode extracts every furniture line (cabinets, worktops, panels...) and prices them all in one pass"
+)
+
 col1, col2 = st.columns(2)
 
 with col1:
@@ -310,11 +189,21 @@ with col1:
         key="spec_upload"
     )
     
-    if spec_file:
+    if spec_file and extraction_mode.startswith("Item list"):
+        add_extraction_node("items_extraction", spec_file, "specification", extract=extract_items_chunked)
+        with st.spinner("Extracting item list..."):
+            st.session_state.extracted_items = pipeline.get("items_extraction")
+        st.success(f"Extracted {len(st.session_state.extracted_items.get('items') or [])} items!")
+    elif spec_file:
+        add_extraction_node("spec_extraction", spec_file, "specification")
         with st.spinner("Extracting specifications..."):
-            spec_text = extract_text_from_pdf(spec_file)
-            st.session_state.extracted_spec_data = extract_specifications_with_openai(spec_text, "specification")
+            st.session_state.extracted_spec_data = pipeline.get("spec_extraction")
         st.success("Specifications extracted successfully!")
+        with st.expander("Extracted Specifications"):
+            st.dataframe(
+                json_to_df(st.session_state.table_memo, st.session_state.extracted_spec_data),
+                use_container_width=True
+            )
 
 with col2:
     st.subheader("Technical Drawings")
@@ -325,10 +214,15 @@ with col2:
     )
     
     if drawing_file:
-        with st.spinner("Analyzing drawings..."):
-            drawing_text = extract_text_from_pdf(drawing_file)
-            st.session_state.extracted_drawing_data = extract_specifications_with_openai(drawing_text, "drawing")
-        st.success("Drawings analyzed successfully!")
+        add_extraction_node("drawing_extraction", drawing_file, "drawing")
+        # Like drawing pages, a new drawing analysis is not started once only the estimate's reserve is left
+        extracted = pipeline.memo.get(pipeline.key("drawing_extraction")) is not None
+        if budget is not None and not extracted and budget.exhausted(ESTIMATE_RESERVE):
+            st.warning(f"Drawings not analyzed: {budget.reason()}")
+        else:
+            with st.spinner("Analyzing drawings..."):
+                st.session_state.extracted_drawing_data = pipeline.get("drawing_extraction")
+            st.success("Drawings analyzed successfully!")
 
 # Material database section
 st.header("Material Database")
@@ -339,50 +233,183 @@ if st.button("Load Material Database") or st.session_state.material_database:
     
     if st.session_state.material_database:
         st.subheader("Available Materials")
-        materials_df = pd.DataFrame(st.session_state.material_db['materials'])
+        materials_df = memoized(
+            st.session_state.table_memo, "materials", pd.DataFrame, st.session_state.material_database['materials']
+        )
         st.dataframe(materials_df, use_container_width=True)
         
+        # Labor rates are applied locally, so edits reprice the estimate without a model call
         st.subheader("Labor Rates")
-        labor_df = pd.DataFrame([st.session_state.material_db['labor_rates']])
-        st.dataframe(labor_df, use_container_width=True)
+        labor_df = st.data_editor(
+            pd.DataFrame([st.session_state.material_database['labor_rates']]),
+            use_container_width=True,
+            key="labor_rates_editor"
+        )
+        # A cleared cell or text that is not a number keeps the previous rate
+        previous_rates = st.session_state.material_database['labor_rates']
+        edited_rates = {}
+        for operation, rate in labor_df.iloc[0].items():
+            number = to_number(rate)
+            edited_rates[operation] = previous_rates.get(operation) if number is None or pd.isna(number) else number
+        st.session_state.material_database['labor_rates'] = edited_rates
+
+# Multi-item quote, priced locally from the material database
+if extraction_mode.startswith("Item list") and st.session_state.extracted_items:
+    st.header("Item List Quote")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        overhead_percentage = st.number_input("Overhead %", min_value=0.0, value=DEFAULT_OVERHEAD_PERCENTAGE)
+    with col2:
+        margin_percentage = st.number_input("Profit margin %", min_value=0.0, value=DEFAULT_MARGIN_PERCENTAGE)
+    
+    priced = memoized(
+        st.session_state.table_memo, "price_items", price_items,
+        st.session_state.extracted_items.get('items'),
+        st.session_state.material_database or demo_material_db,
+        overhead_percentage,
+        margin_percentage
+    )
+    totals = priced['totals']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Items", totals['item_count'])
+    col2.metric("Pieces", f"{totals['piece_count']:g}")
+    col3.metric("Direct Cost", f"€{totals['material_cost'] + totals['labor_cost']:,.2f}")
+    col4.metric("Total Cost", f"€{totals['total_cost']:,.2f}")
+    
+    if totals['unpriced_material_lines'] or totals['unpriced_operation_lines']:
+        st.warning(
+            f"{totals['unpriced_material_lines']} material line(s) and {totals['unpriced_operation_lines']} "
+            "operation line(s) have no price in the material database and are excluded from the totals."
+        )
+    
+    st.subheader("Per-Item Totals")
+    st.dataframe(priced['items'], use_container_width=True)
+    
+    # Sheet counts for materials with a sheet size in the database
+    nesting = memoized(
+        st.session_state.table_memo, "item_nesting",
+        lambda items, material_db: nest_materials(parts_from_items(items), material_db),
+        st.session_state.extracted_items.get('items'),
+        st.session_state.material_database or demo_material_db
+    )
+    if nesting:
+        st.subheader("Sheet Nesting")
+        st.dataframe(pd.DataFrame([
+            {"material": name, "sheets": packed['sheets'], "sheet_area_sqm": packed['sheet_area_sqm'],
+             "parts_area_sqm": packed['parts_area_sqm'], "yield": f"{packed['yield']:.0%}",
+             "unplaced_parts": len(packed['unplaced'])}
+            for name, packed in nesting.items()
+        ]), use_container_width=True)
+    
+    with st.expander("Material Lines"):
+        st.dataframe(priced['materials'], use_container_width=True)
+    with st.expander("Operation Lines"):
+        st.dataframe(priced['operations'], use_container_width=True)
 
 # Generate cost estimate
-if st.button("Generate Cost Estimate") or st.session_state.cost_estimate:
-    if not st.session_state.cost_estimate:
-        # Use demo data if no real data is available
-        spec_data = st.session_state.extracted_spec_data or demo_spec_data
-        material_db = st.session_state.material_database or demo_material_db
-        
+if st.button("Generate Cost Estimate"):
+    # Offer a scaled estimate from a similar past quote before calling the model
+    spec_data = st.session_state.extracted_spec_data or demo_spec_data
+    suggestion = st.session_state.quote_index.suggest_estimate(spec_data)
+    st.session_state.estimate_source = suggestion
+    st.session_state.estimate_mode = "similar" if suggestion else "model"
+
+if st.session_state.estimate_mode:
+    # Use demo data if no real data is available
+    spec_data = st.session_state.extracted_spec_data or demo_spec_data
+    material_db = st.session_state.material_database or demo_material_db
+    
+    if st.session_state.estimate_mode == "similar":
+        st.session_state.cost_estimate = st.session_state.estimate_source['cost_estimate']
+    else:
+        # Takeoff, material matching and pricing are separate memoized nodes, so only
+        # stages downstream of a changed input are recomputed on this rerun
+        reference = st.session_state.estimate_source['cost_estimate'] if st.session_state.estimate_source else None
+        pipeline.add("spec", lambda: spec_data, fingerprint=spec_data)
+        drawing_nodes = []
+        for i, result in enumerate(st.session_state.get('analysis_results') or []):
+            if result.get('skipped'):
+                # Blank and cover pages carry nothing to price
+                continue
+            analysis = {key: value for key, value in result.items() if key != 'image'}
+            pipeline.add(f"drawing:{i}", lambda analysis=analysis: analysis, fingerprint=analysis)
+            drawing_nodes.append(f"drawing:{i}")
+
+        # The takeoff always runs, as on the command line; the budget keeps ESTIMATE_RESERVE free for it
+        def generate_takeoff(spec, db, drawings):
+            takeoff = generate_cost_estimate(
+                spec, db, drawings, reference_estimate=reference, api_key=st.session_state.openai_api_key
+            )
+            if budget is not None:
+                budget.charge_text(text_model(), [spec, db, drawings], takeoff)
+            return takeoff
+
+        add_estimate_nodes(pipeline, "spec", drawing_nodes, material_db, generate=generate_takeoff,
+                           takeoff_fingerprint=reference)
         with st.spinner("Generating cost estimate..."):
-            st.session_state.cost_estimate = generate_cost_estimate(spec_data, material_db)
+            st.session_state.cost_estimate = pipeline.get("pricing")
+        if budget is not None:
+            usage = budget.report()
+            st.caption(f"RFQ budget used: {usage['tokens']:,} tokens (estimated), EUR {usage['cost_eur']:.2f}")
     
     if st.session_state.cost_estimate:
         st.header("Cost Estimate Results")
         
+        if st.session_state.estimate_mode == "model":
+            recomputed = [name for name in pipeline.computed if name in ("nesting", "takeoff", "material_matching", "pricing")]
+            st.caption(f"Recomputed: {', '.join(recomputed)}" if recomputed else "All estimate stages served from cache")
+            
+            for name, packed in pipeline.get("nesting").items():
+                st.caption(
+                    f"{name}: {packed['sheets']} sheet(s) of {packed['sheet_size'][0]:g} x {packed['sheet_size'][1]:g} mm, "
+                    f"yield {packed['yield']:.0%}"
+                )
+        
+        # Show where a scaled estimate came from and allow refining it with the model
+        if st.session_state.estimate_mode == "similar":
+            source = st.session_state.estimate_source
+            source_specs = source['source_quote'].get('specifications') or {}
+            st.info(
+                f"Scaled from a similar past quote ({source_specs.get('project_name', 'unnamed project')}, "
+                f"similarity {source['similarity']:.0%}). Refine with AI for a full estimate."
+            )
+            if st.button("Refine with AI"):
+                st.session_state.estimate_mode = "model"
+                st.rerun()
+        
         # Display project summary
         st.subheader("Project Summary")
         st.info(st.session_state.cost_estimate.get('project_summary', 'No summary available'))
         
+        consistency = st.session_state.cost_estimate.get('consistency') or {}
+        if consistency.get('structure_issues'):
+            st.warning("The estimate is incomplete: " + "; ".join(consistency['structure_issues']))
+        elif consistency.get('corrections'):
+            corrected = ", ".join(c['field'] for c in consistency['corrections'])
+            st.caption(f"Totals recomputed from the line items; corrected: {corrected}")
+        
+        cost_tables = estimate_tables(st.session_state.table_memo, st.session_state.cost_estimate)
+        
         # Display material costs
         st.subheader("Material Costs")
         if 'material_costs' in st.session_state.cost_estimate:
-            material_costs_df = pd.DataFrame(st.session_state.cost_estimate['material_costs'])
-            st.dataframe(material_costs_df, use_container_width=True)
+            st.dataframe(cost_tables['material_costs'], use_container_width=True)
         
         # Display labor costs
         st.subheader("Labor Costs")
         if 'labor_costs' in st.session_state.cost_estimate:
-            labor_costs_df = pd.DataFrame(st.session_state.cost_estimate['labor_costs'])
-            st.dataframe(labor_costs_df, use_container_width=True)
+            st.dataframe(cost_tables['labor_costs'], use_container_width=True)
         
         # Display total costs
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Total Cost", f"€{st.session_state.cost_estimate.get('total_cost', 'N/A')}")
+            st.metric("Total Cost", format_money(st.session_state.cost_estimate.get('total_cost')))
         
         with col2:
-            st.metric("Price per Unit", f"€{st.session_state.cost_estimate.get('price_per_unit', 'N/A')}")
+            st.metric("Price per Unit", format_money(st.session_state.cost_estimate.get('price_per_unit')))
         
         with col3:
             st.metric("Delivery Timeline", st.session_state.cost_estimate.get('delivery_timeline', 'N/A'))
@@ -400,12 +427,43 @@ if st.button("Generate Cost Estimate") or st.session_state.cost_estimate:
                 "cost_estimate": st.session_state.cost_estimate
             }
             st.session_state.saved_quotes.append(quote_data)
+            st.session_state.quote_index.add(
+                st.session_state.extracted_spec_data or demo_spec_data,
+                st.session_state.cost_estimate,
+                timestamp=quote_data['timestamp']
+            )
             st.success("Quote saved successfully!")
 
+# Bulk export of the quote history and this session's drawing analyses
+if len(st.session_state.quote_index):
+    st.header("Export Quotes")
+    st.markdown(
+        f"Export all {len(st.session_state.quote_index)} saved quotes (totals, cost lines and specification "
+        "fields) and the current drawing analyses for BI or ERP import"
+    )
+    export_format = st.selectbox("Export format", available_formats(), key="quote_export_format")
+    # The export is only written when the button is clicked, to a spooled file that is streamed
+    # from disk, not on every rerun
+    st.download_button(
+        label=f"Export quote history ({export_format.upper()})",
+        data=partial(
+            export_file,
+            export_format,
+            quotes=list(st.session_state.quote_index.quotes),
+            drawing_analyses=list(st.session_state.get('analysis_results') or []),
+            table="quotes"
+        ),
+        file_name=f"quotes.{export_format}",
+        mime=EXPORT_MIME[export_format]
+    )
+
 # Display saved quotes
 if st.session_state.saved_quotes:
     st.header("Saved Quotes")
     
     for i, quote in enumerate(st.session_state.saved_quotes):
         with st.expander(f"Quote {i+1} - {quote['timestamp'].strftime('%Y-%m-%d %H:%M')}"):
-            st.json(quote) 
\ No newline at end of file
+            st.json(quote) 
+
+# Profile of this run
+finish_profile(profile)
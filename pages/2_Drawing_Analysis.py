@@ -1,17 +1,24 @@
 import streamlit as st
-import os
-import tempfile
-import pandas as pd
-import openai
-from openai import OpenAI
-import json
 import re
+from functools import partial
 from PIL import Image
-import base64
-from io import BytesIO
-from utils import load_api_keys
-import PyPDF2
-import fitz  # PyMuPDF for better PDF handling
+from utils import load_api_keys, start_profile, finish_profile
+from kalla import pdf, profiling
+from kalla.vision import (
+    drawing_analyzer, analyze_drawing_sections_with_openai, analyze_drawing_sections_with_anthropic
+)
+from kalla.cache import image_digest, cache_key
+from kalla.prompts import ANALYSIS_TYPES
+from kalla.tiling import analyze_with_tiles
+from kalla.ocr import ocr_available
+from kalla.screening import classify_content, screen_pdf_pages, skipped_result
+from kalla.export import available_formats, export_file, EXPORT_MIME
+from kalla.providers import vision_model
+from kalla.prefetch import Prefetcher, PREFETCH_ON_UPLOAD
+from kalla.uploads import store_uploads
+from kalla.shared import shared_cache
+from kalla.routing import models
+from kalla.budget import Budget, page_priority, priority_order, skipped_screening, BUDGET_TOKENS, BUDGET_EUR, BUDGET_SECONDS
 
 st.set_page_config(
     page_title="Drawing Analysis",
@@ -32,154 +39,80 @@ if 'analysis_results' not in st.session_state:
     st.session_state.analysis_results = []
 if 'use_demo_data' not in st.session_state:
     st.session_state.use_demo_data = False
+if 'upload_handles' not in st.session_state:
+    # Stored upload handles by upload id, so files are written to the upload store once
+    st.session_state.upload_handles = {}
+if 'section_cache' not in st.session_state:
+    # Combined analyses by (image digest, model), so any analysis type can be shown without another call;
+    # shared across sessions and replicas when KALLA_SHARED_STORE is set
+    st.session_state.section_cache = shared_cache("sections")
 
-# Function to convert PDF to images
+# Function to convert PDF to images, reporting conversion errors in the page
 def pdf_to_images(pdf_file, dpi=150):
-    """Convert PDF pages to PIL Images"""
     try:
-        # Read PDF file
-        pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        images = []
-        
-        for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-            # Render page to image
-            mat = fitz.Matrix(dpi/72, dpi/72)  # 72 is the default DPI
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            img = Image.open(BytesIO(img_data))
-            images.append(img)
-        
-        pdf_document.close()
-        pdf_file.seek(0)  # Reset file pointer
-        return images
-        
+        return pdf.pdf_to_images(pdf_file, dpi=dpi)
     except Exception as e:
         st.error(f"Error converting PDF: {str(e)}")
         return []
 
-# Function to encode image to base64
-def encode_image_to_base64(image):
-    buffered = BytesIO()
-    image.save(buffered, format="JPEG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return img_str
-
-# Function to analyze drawing with OpenAI Vision
-def analyze_drawing_with_openai(image, analysis_type):
-    if 'openai_api_key' not in st.session_state or not st.session_state.openai_api_key:
-        return "Error: OpenAI API key not available. Please check your .env file."
-    
-    client = OpenAI(api_key=st.session_state.openai_api_key)
-    
-    # Get model from environment or use default for vision tasks
-    # For image analysis, we need a vision-capable model
-    model = os.getenv("OPENAI_MODEL", "gpt-4o")
-    
-    # Encode image to base64
-    base64_image = encode_image_to_base64(image)
-    
-    # Load the system prompt
-    with open("prompts/drawing_analysis.md", "r") as f:
-        system_prompt = f.read()
-    
-    analysis_prompts = {
-        "dimensions": "Analyze this drawing to extract all dimensions, measurements, and size specifications. Identify length, width, height, thickness, and any other critical measurements.",
-        "materials": "Analyze this drawing to identify material requirements, specifications, and types. Look for wood types, hardware, finishes, and any special materials needed.",
-        "construction": "Analyze this drawing to identify construction methods, joinery techniques, and assembly requirements. Look for joints, fasteners, and construction details.",
-        "complexity": "Analyze this drawing to assess manufacturing complexity, difficulty level, and potential challenges. Consider precision requirements, special tools needed, and skill level required.",
-        "comprehensive": "Provide a comprehensive analysis of this technical drawing including dimensions, materials, construction methods, complexity assessment, and manufacturing recommendations."
+# Function to answer every analysis type for an image in one call, reusing cached sections; new calls
+# are charged to the budget when one is set
+def analyze_sections(provider, api_key, image, model_used, budget=None):
+    key = cache_key(image_digest(image), model_used)
+    sections = st.session_state.section_cache.get(key)
+    if sections is None:
+        if provider == "openai":
+            sections = analyze_drawing_sections_with_openai(image, api_key=api_key)
+        else:
+            sections = analyze_drawing_sections_with_anthropic(image, api_key=api_key)
+        if budget is not None:
+            budget.charge_image(models("vision", provider)[1], image, sections)
+        if not any(text.startswith("Error") for text in sections.values()):
+            st.session_state.section_cache.set(key, sections)
+    return sections
+
+# Function to analyze one image with explicit keys and return (result, tiles); reads no session state, so
+# prefetch workers can run it too
+def run_analysis(provider, api_key, alternate_api_key, image, analysis_type, tile, ocr=False, hedge=False,
+                 pdf_file=None, page_number=None, budget=None):
+    analyze = drawing_analyzer(provider, api_key=api_key, hedge=hedge, alternate_api_key=alternate_api_key,
+                               local_ocr=ocr, budget=budget)
+    if not tile:
+        return analyze(image, analysis_type), []
+    return analyze_with_tiles(image, analysis_type, analyze, pdf_file=pdf_file, page_number=page_number)
+
+# Function to create the session's prefetcher, which analyzes uploads in the background with the
+# options selected so far; API keys are captured here because workers cannot read session state
+def create_prefetcher():
+    api_keys = {
+        "openai": st.session_state.get("openai_api_key"),
+        "anthropic": st.session_state.get("anthropic_api_key")
     }
-    
-    user_prompt = analysis_prompts.get(analysis_type, analysis_prompts["comprehensive"])
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": system_prompt
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
-        max_tokens=1000
-    )
-    
-    return response.choices[0].message.content
 
-# Function to analyze drawing with Anthropic Claude (if available)
-def analyze_drawing_with_anthropic(image, analysis_type):
-    if 'anthropic_api_key' not in st.session_state or not st.session_state.anthropic_api_key:
-        return "Error: Anthropic API key not available. Please check your .env file."
-    
-    try:
-        import anthropic
-        client = anthropic.Anthropic(api_key=st.session_state.anthropic_api_key)
-        
-        # Encode image to base64
-        base64_image = encode_image_to_base64(image)
-        
-        # Load the system prompt
-        with open("prompts/drawing_analysis.md", "r") as f:
-            system_prompt = f.read()
-        
-        analysis_prompts = {
-            "dimensions": "Analyze this drawing to extract all dimensions, measurements, and size specifications. Identify length, width, height, thickness, and any other critical measurements.",
-            "materials": "Analyze this drawing to identify material requirements, specifications, and types. Look for wood types, hardware, finishes, and any special materials needed.",
-            "construction": "Analyze this drawing to identify construction methods, joinery techniques, and assembly requirements. Look for joints, fasteners, and construction details.",
-            "complexity": "Analyze this drawing to assess manufacturing complexity, difficulty level, and potential challenges. Consider precision requirements, special tools needed, and skill level required.",
-            "comprehensive": "Provide a comprehensive analysis of this technical drawing including dimensions, materials, construction methods, complexity assessment, and manufacturing recommendations."
-        }
-        
-        user_prompt = analysis_prompts.get(analysis_type, analysis_prompts["comprehensive"])
-        
-        message = client.messages.create(
-            model="claude-3-sonnet-20240229",
-            max_tokens=1000,
-            system=system_prompt,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": user_prompt
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": base64_image
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
-        
-        return message.content[0].text
-        
-    except ImportError:
-        return "Anthropic Claude not available. Please install anthropic package."
-    except Exception as e:
-        return f"Error analyzing with Anthropic: {str(e)}"
+    def analyze(image, pdf_file, page_number, options):
+        provider, analysis_type, tile, ocr, hedge = options
+        alternate = "openai" if provider == "anthropic" else "anthropic"
+        return run_analysis(provider, api_keys[provider], api_keys[alternate], image, analysis_type, tile,
+                            ocr=ocr, hedge=hedge, pdf_file=pdf_file, page_number=page_number)
+
+    return Prefetcher(analyze)
+
+# Function to analyze one image and return (result, tiles, sections). Large-format sheets are split into
+# high-DPI regions when tile is set, text is read with local OCR first when ocr is set, slow or failing
+# calls also go to the other provider when hedge is set, and combined answers all analysis types in one
+# call per image instead. Model calls are charged to budget (a kalla.budget.Budget) when one is set
+def analyze_image(provider, api_key, model_used, image, analysis_type, tile, ocr=False, combined=False,
+                  hedge=False, pdf_file=None, page_number=None, budget=None):
+    with profiling.stage("page.analyze", page=page_number + 1 if page_number is not None else None):
+        if combined:
+            sections = analyze_sections(provider, api_key, image, model_used, budget=budget)
+            return sections[analysis_type], [], sections
+
+        alternate_api_key = st.session_state.get(f"{'openai' if provider == 'anthropic' else 'anthropic'}_api_key")
+        analysis_result, tiles = run_analysis(provider, api_key, alternate_api_key, image, analysis_type, tile,
+                                              ocr=ocr, hedge=hedge, pdf_file=pdf_file, page_number=page_number,
+                                              budget=budget)
+    return analysis_result, tiles, None
 
 # API Key status
 with st.sidebar:
@@ -202,11 +135,17 @@ with st.sidebar:
     use_demo = st.checkbox("Use demo data for testing", value=st.session_state.use_demo_data)
     st.session_state.use_demo_data = use_demo
 
+# Opt-in timing of this run's stages, shown in the sidebar (see kalla.profiling)
+profile = start_profile("drawings")
+
 # Main content
 if not api_keys_loaded['openai_api_key']:
     st.error("❌ OpenAI API key not found in .env file. Please add your OPENAI_API_KEY to the .env file to continue.")
     st.stop()
 
+if 'prefetcher' not in st.session_state:
+    st.session_state.prefetcher = create_prefetcher()
+
 # File upload section
 st.header("Upload Technical Drawings")
 
@@ -218,7 +157,8 @@ uploaded_files = st.file_uploader(
 )
 
 if uploaded_files:
-    st.session_state.uploaded_files = uploaded_files
+    # Only handles to the stored files are kept across reruns, not the uploaded bytes
+    st.session_state.uploaded_files = store_uploads(uploaded_files, st.session_state.upload_handles)
     
     # Count file types
     pdf_count = sum(1 for f in uploaded_files if f.type == "application/pdf")
@@ -244,13 +184,13 @@ if st.session_state.uploaded_files:
     with col1:
         analysis_type = st.selectbox(
             "Analysis Type",
-            ["comprehensive", "dimensions", "materials", "construction", "complexity"],
+            ANALYSIS_TYPES,
             help="Select the type of analysis to perform on the drawings"
         )
     
     with col2:
         # Get the current model from environment
-        current_model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        current_model = vision_model()
         model_display_name = f"OpenAI {current_model}"
         
         model_choice = st.selectbox(
@@ -258,83 +198,226 @@ if st.session_state.uploaded_files:
             [model_display_name, "Anthropic Claude"],
             help="Select which AI model to use for analysis"
         )
+
+    tile_large_drawings = st.checkbox(
+        "Tile large-format drawings",
+        value=True,
+        help="For A1/A0 sheets and very large images, detect dense regions (title block, dimension "
+             "clusters, detail callouts) and analyze them as separate high-resolution crops"
+    )
+
+    use_local_ocr = st.checkbox(
+        "Local OCR pre-pass",
+        value=ocr_available(),
+        disabled=not ocr_available(),
+        help="Read dimensions and labels locally with Tesseract and send them with a smaller image; "
+             "dimension questions are answered without a model call when OCR finds enough values. "
+             "Requires pytesseract and the Tesseract binary."
+    )
+
+    both_providers = api_keys_loaded['openai_api_key'] and api_keys_loaded['anthropic_api_key']
+    hedge_requests = st.checkbox(
+        "Fall back to the other provider",
+        value=both_providers,
+        disabled=not both_providers,
+        help="If a call is slower than the provider's recent 95th percentile or fails with a server error, "
+             "send it to the other provider too and use whichever answers first. Needs both API keys."
+    )
+
+    combined_analysis = st.checkbox(
+        "Combined analysis (all types in one call)",
+        value=False,
+        help="Send each image once and get dimensions, materials, construction and complexity together; "
+             "switching the analysis type afterwards is served from the stored sections without another "
+             "call. Images are sent whole, without tiling or OCR."
+    )
+
+    skip_blank_pages = st.checkbox(
+        "Skip blank and cover pages",
+        value=True,
+        help="Check each page locally for ink and drawing geometry first; blank pages, cover sheets "
+             "and text-only pages are listed as skipped instead of being sent to the model"
+    )
+
+    prefetch_on_upload = st.checkbox(
+        "Start analysis on upload",
+        value=PREFETCH_ON_UPLOAD,
+        help="Render, screen and analyze uploads in the background with the options above while you "
+             "review them, so results are ready when you click Analyze. Changing an option restarts "
+             "the background analysis; unticking it cancels queued work."
+    )
+
+    with st.expander("RFQ budget"):
+        st.caption("Limits for one click of Analyze Drawings (0 = no limit). Pages are analyzed most "
+                   "informative first; near a limit images are downscaled, the smaller model is used and "
+                   "low-value pages are skipped, and at the limit the remaining pages are skipped.")
+        budget_tokens = st.number_input("Max tokens", min_value=0, value=BUDGET_TOKENS, step=10000)
+        budget_eur = st.number_input("Max spend (EUR)", min_value=0.0, value=BUDGET_EUR, step=0.5)
+        budget_seconds = st.number_input("Max wall time (seconds)", min_value=0.0, value=BUDGET_SECONDS, step=30.0)
+    budget_set = any((budget_tokens, budget_eur, budget_seconds))
+
+    # Background work is keyed by file content and options, so a click with the same options reuses it.
+    # Under a budget only rendering and screening run ahead, so every model call is charged to the click
+    prefetcher = st.session_state.prefetcher
+    use_openai = model_choice.startswith("OpenAI")
+    prefetch_options = None
+    if not combined_analysis and not budget_set and (use_openai or api_keys_loaded['anthropic_api_key']):
+        prefetch_options = ("openai" if use_openai else "anthropic", analysis_type, tile_large_drawings,
+                            use_local_ocr, hedge_requests)
+    prefetch_digests = {}
+    if prefetch_on_upload:
+        for file_obj in st.session_state.uploaded_files:
+            prefetch_digests[file_obj.digest] = prefetcher.start(
+                file_obj, file_obj.type == "application/pdf", prefetch_options, screen=skip_blank_pages
+            )
+        prefetcher.retain(set(prefetch_digests.values()))
+    else:
+        prefetcher.cancel()
     
     # Analysis button
     if st.button("Analyze Drawings"):
         st.session_state.analysis_results = []
+        budget = Budget(budget_tokens, budget_eur, budget_seconds) if budget_set else None
         
+        # Pages of every file, rendered and screened first so that under a budget they can be ranked
+        # across the whole RFQ rather than within each file
+        units = []
         for i, file_obj in enumerate(st.session_state.uploaded_files):
-            with st.spinner(f"Analyzing drawing {i+1}..."):
+            with st.spinner(f"Preparing drawing {i+1}..."):
+                digest = prefetch_digests.get(file_obj.digest)
+                prepared = prefetcher.prepared(digest) if digest else None
+
                 # Determine if the file is a PDF or an image
                 if file_obj.type == "application/pdf":
-                    images = pdf_to_images(file_obj)
+                    images = prepared['images'] if prepared else pdf_to_images(file_obj)
                     if not images:
                         st.error(f"Could not convert PDF {file_obj.name} to images.")
                         continue
-                    
-                    # Analyze each page of the PDF
+
+                    if prepared:
+                        screenings = prepared['screenings']
+                    else:
+                        screenings = screen_pdf_pages(file_obj, images) if skip_blank_pages else [None] * len(images)
+
                     for j, image in enumerate(images):
-                        with st.spinner(f"Analyzing PDF page {j+1} of {len(images)}..."):
-                            # Perform analysis based on model choice
-                            if model_choice.startswith("OpenAI"):
-                                analysis_result = analyze_drawing_with_openai(image, analysis_type)
-                                model_used = model_choice
-                            else:
-                                if api_keys_loaded['anthropic_api_key']:
-                                    analysis_result = analyze_drawing_with_anthropic(image, analysis_type)
-                                    model_used = "Anthropic Claude"
-                                else:
-                                    st.error("Anthropic API key required for Claude analysis. Please add ANTHROPIC_API_KEY to your .env file.")
-                                    continue
-                            
-                            # Store results
-                            result = {
-                                "drawing_name": f"{file_obj.name} (Page {j+1})",
-                                "analysis_type": analysis_type,
-                                "model_used": model_used,
-                                "analysis_result": analysis_result,
-                                "image": image,
-                                "file_type": "pdf",
-                                "page_number": j + 1,
-                                "total_pages": len(images)
-                            }
-                            
-                            st.session_state.analysis_results.append(result)
+                        units.append({
+                            "name": f"{file_obj.name} (Page {j+1})", "image": image, "screening": screenings[j],
+                            "digest": digest, "index": j, "pdf_file": file_obj,
+                            "fields": {"file_type": "pdf", "page_number": j + 1, "total_pages": len(images)}
+                        })
                 else: # Assume it's an image
-                    # Open and process image
-                    image = Image.open(file_obj)
-                    
-                    # Perform analysis based on model choice
-                    if model_choice.startswith("OpenAI"):
-                        analysis_result = analyze_drawing_with_openai(image, analysis_type)
-                        model_used = model_choice
+                    image = prepared['images'][0] if prepared else Image.open(file_obj)
+                    if prepared:
+                        screening = prepared['screenings'][0]
+                    else:
+                        screening = classify_content(image) if skip_blank_pages else None
+                    units.append({
+                        "name": file_obj.name, "image": image, "screening": screening,
+                        "digest": digest, "index": 0, "pdf_file": None, "fields": {"file_type": "image"}
+                    })
+
+        # Most informative pages first under a budget
+        order = range(len(units))
+        if budget is not None:
+            priorities = [page_priority(unit['image'], unit['screening']) for unit in units]
+            order = priority_order(priorities)
+
+        results = {}
+        for k in order:
+            unit = units[k]
+            image, screening = unit['image'], unit['screening']
+            if screening and screening['content'] != 'drawing':
+                results[k] = skipped_result(unit['name'], screening, analysis_type=analysis_type,
+                                            image=image, **unit['fields'])
+                continue
+
+            reason = budget.skip_reason(priorities[k]) if budget is not None else None
+            if reason:
+                results[k] = skipped_result(unit['name'], skipped_screening(reason, priorities[k]),
+                                            analysis_type=analysis_type, image=image, **unit['fields'])
+                continue
+
+            with st.spinner(f"Analyzing {unit['name']}..."):
+                digest = unit['digest']
+                prefetched = prefetcher.analysis(digest, unit['index'], prefetch_options) if digest else None
+                page_number = unit['index'] if unit['pdf_file'] is not None else None
+
+                # Perform analysis based on model choice
+                if prefetched:
+                    model_used = model_choice if use_openai else "Anthropic Claude"
+                    analysis_result, tiles = prefetched
+                    sections = None
+                elif model_choice.startswith("OpenAI"):
+                    model_used = model_choice
+                    analysis_result, tiles, sections = analyze_image(
+                        "openai", st.session_state.openai_api_key, model_used,
+                        image, analysis_type, tile_large_drawings, ocr=use_local_ocr,
+                        combined=combined_analysis, hedge=hedge_requests,
+                        pdf_file=unit['pdf_file'], page_number=page_number, budget=budget
+                    )
+                else:
+                    if api_keys_loaded['anthropic_api_key']:
+                        model_used = "Anthropic Claude"
+                        analysis_result, tiles, sections = analyze_image(
+                            "anthropic", st.session_state.anthropic_api_key, model_used,
+                            image, analysis_type, tile_large_drawings, ocr=use_local_ocr,
+                            combined=combined_analysis, hedge=hedge_requests,
+                            pdf_file=unit['pdf_file'], page_number=page_number, budget=budget
+                        )
                     else:
-                        if api_keys_loaded['anthropic_api_key']:
-                            analysis_result = analyze_drawing_with_anthropic(image, analysis_type)
-                            model_used = "Anthropic Claude"
-                        else:
-                            st.error("Anthropic API key required for Claude analysis. Please add ANTHROPIC_API_KEY to your .env file.")
-                            continue
-                    
-                    # Store results
-                    result = {
-                        "drawing_name": file_obj.name,
-                        "analysis_type": analysis_type,
-                        "model_used": model_used,
-                        "analysis_result": analysis_result,
-                        "image": image,
-                        "file_type": "image"
-                    }
-                    
-                    st.session_state.analysis_results.append(result)
+                        st.error("Anthropic API key required for Claude analysis. Please add ANTHROPIC_API_KEY to your .env file.")
+                        continue
+
+                # Store results
+                results[k] = {
+                    "drawing_name": unit['name'],
+                    "analysis_type": analysis_type,
+                    "model_used": model_used,
+                    "analysis_result": analysis_result,
+                    "image": image,
+                    **unit['fields'],
+                    "tiles": tiles,
+                    "sections": sections
+                }
+
+        # Results are listed in file and page order whatever order they were analyzed in
+        st.session_state.analysis_results = [results[k] for k in range(len(units)) if k in results]
         
         st.success("Analysis completed!")
+        if budget is not None:
+            usage = budget.report()
+            st.caption(f"Budget used: {usage['tokens']:,} tokens (estimated), EUR {usage['cost_eur']:.2f}, "
+                       f"{usage['seconds']}s; {usage['degraded_calls']} degraded call(s), "
+                       f"{usage['skipped_pages']} page(s) skipped")
 
 # Display results
 if st.session_state.analysis_results:
     st.header("Analysis Results")
+
+    skipped = [result for result in st.session_state.analysis_results if result.get('skipped')]
+    if skipped:
+        st.info(
+            f"**Skipped {len(skipped)} page(s) without drawing content or over the RFQ budget:**\n\n" +
+            "\n".join(f"- {result['drawing_name']}: {result['analysis_result'][len('Skipped: '):]}"
+                      for result in skipped)
+        )
+    
+    # Bulk export of every result as a table, written to a spooled file only when the button is clicked
+    export_col1, export_col2 = st.columns([1, 3])
+    with export_col1:
+        export_format = st.selectbox("Export format", available_formats(), key="drawing_export_format")
+    with export_col2:
+        st.download_button(
+            label=f"Export all results ({export_format.upper()})",
+            data=partial(export_file, export_format, drawing_analyses=list(st.session_state.analysis_results)),
+            file_name=f"drawing_analyses.{export_format}",
+            mime=EXPORT_MIME[export_format]
+        )
     
     for i, result in enumerate(st.session_state.analysis_results):
+        if result.get('skipped'):
+            continue
+
         # Create appropriate title for the expander
         if result.get('file_type') == 'pdf':
             title = f"PDF Page {result.get('page_number', '?')}: {result['drawing_name']}"
@@ -342,6 +425,17 @@ if st.session_state.analysis_results:
             title = f"Image: {result['drawing_name']}"
         
         with st.expander(title):
+            if result.get('sections'):
+                # Every section came from the same combined call, so switching is local
+                shown_type = st.selectbox(
+                    "Section",
+                    ANALYSIS_TYPES,
+                    index=ANALYSIS_TYPES.index(result['analysis_type']),
+                    key=f"section_{i}"
+                )
+                result['analysis_type'] = shown_type
+                result['analysis_result'] = result['sections'][shown_type]
+
             col1, col2 = st.columns([1, 2])
             
             with col1:
@@ -353,6 +447,9 @@ if st.session_state.analysis_results:
                 # Show additional info for PDFs
                 if result.get('file_type') == 'pdf':
                     st.info(f"**Page:** {result.get('page_number', '?')} of {result.get('total_pages', '?')}")
+
+                if result.get('tiles'):
+                    st.info(f"**Detail regions analyzed:** {len(result['tiles'])}")
             
             with col2:
                 st.subheader("Analysis Results")
@@ -450,6 +547,8 @@ st.markdown("""
 4. **Analyze**: Click the analyze button to process your drawings
    - For PDF files, each page will be analyzed separately
    - For image files, each image will be analyzed individually
+   - With **Tile large-format drawings**, A1/A0 sheets are also analyzed region by region at high resolution
+   - With **Start analysis on upload**, analysis begins in the background as soon as files are uploaded, so results are usually ready when you click
 5. **Review Results**: Examine the detailed analysis and download reports
 
 **PDF Support**: 
@@ -458,4 +557,7 @@ st.markdown("""
 - Results are organized by page number for easy reference
 
 This tool helps furniture manufacturers quickly extract specifications from technical drawings for cost estimation and manufacturing planning.
-""") 
\ No newline at end of file
+""") 
+
+# Profile of this run
+finish_profile(profile)
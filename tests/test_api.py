@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the headless HTTP API
+"""
+
+import io
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from starlette.testclient import TestClient
+    from kalla import api
+except ImportError:
+    api = None
+
+from PIL import Image
+
+@unittest.skipIf(api is None, "starlette/httpx not installed")
+class TestApi(unittest.TestCase):
+    """Test cases for the API endpoints with model calls patched out"""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+
+    def test_estimate_waits_for_result(self):
+        estimate = {
+            "material_costs": [{"item": "Oak", "quantity": "2", "unit_cost": "50.00", "total_cost": "100.00"}],
+            "total_cost": "120.00"
+        }
+        with patch("kalla.pricing.generate_cost_estimate", return_value=estimate) as mocked:
+            response = self.client.post("/estimates?wait=true", json={"spec_data": {"quantity": "2"}})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "completed")
+        result = response.json()["result"]
+        # The model's total is reconciled with its line items
+        self.assertEqual(result["total_cost"], "100.00")
+        self.assertEqual(result["price_per_unit"], "50.00")
+        self.assertEqual(result["consistency"]["corrections"][0]["field"], "total_cost")
+        mocked.assert_called_once_with({"quantity": "2"}, {}, None)
+
+    def test_estimate_requires_spec_data(self):
+        response = self.client.post("/estimates", json={})
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_json_bodies_are_rejected(self):
+        requests = [
+            ("/estimates", {"content": b"{not json"}),
+            ("/estimates", {"json": ["spec_data"]}),
+            ("/estimates", {"json": {"spec_data": "a table"}}),
+            ("/specifications", {"content": b"\xff\xfe", "headers": {"content-type": "application/json"}}),
+            ("/specifications", {"json": "text"}),
+            ("/exports", {"json": None}),
+            ("/exports", {"json": {"quotes": {"a": 1}}}),
+            ("/exports", {"json": {"table": ["quotes"]}})
+        ]
+        for path, body in requests:
+            response = self.client.post(path, **body)
+            self.assertEqual(response.status_code, 400, (path, body))
+            self.assertIn("error", response.json())
+
+    def test_drawing_upload_is_streamed_and_removed(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (20, 20), "white").save(buffer, format="PNG")
+
+        with patch("kalla.vision.analyze_drawing_with_openai", return_value="Length 3000mm"):
+            response = self.client.post(
+                "/drawings/analyze?wait=true",
+                files={"files": ("sketch.png", buffer.getvalue(), "image/png")},
+                data={"analysis_type": "dimensions"}
+            )
+
+        job = response.json()
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["result"][0]["analysis_result"], "Length 3000mm")
+        self.assertEqual(job["result"][0]["drawing_name"], "sketch.png")
+
+        lookup = self.client.get(f"/jobs/{job['job_id']}")
+        self.assertEqual(lookup.json()["status"], "completed")
+        self.assertFalse(any(name.endswith("sketch.png") for name in os.listdir(api.UPLOAD_DIR)))
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get("/jobs/missing").status_code, 404)
+
+    def test_invalid_drawing_options_are_rejected(self):
+        files = {"files": ("sketch.png", b"not read", "image/png")}
+        for data in ({"dpi": "high"}, {"dpi": "5000"}, {"provider": "mistral"}):
+            response = self.client.post("/drawings/analyze", files=files, data=data)
+            self.assertEqual(response.status_code, 400, data)
+
+    def test_finished_jobs_are_evicted(self):
+        store = api.JobStore(ttl=60, max_jobs=2)
+        for i, finished_at in enumerate((None, 100.0, 150.0, 190.0)):
+            store.jobs[f"job{i}"] = {"job_id": f"job{i}", "finished_at": finished_at}
+
+        store.evict(now=200.0)
+        # job1 has expired, job2 is the oldest finished job over the limit; running jobs stay
+        self.assertEqual(sorted(store.jobs), ["job0", "job3"])
+
+    def test_store_calls_do_not_block_the_event_loop(self):
+        class SlowStore:
+            def put_job(self, job):
+                time.sleep(0.1)
+
+            def get_job(self, job_id):
+                time.sleep(0.1)
+
+        async def run():
+            store = api.JobStore(store=SlowStore())
+            job = store.submit("noop", lambda: "done")
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(tick())
+            finished = await store.wait(job["job_id"])
+            missing = await store.get("missing")
+            ticker.cancel()
+            return finished, missing, ticks
+
+        finished, missing, ticks = asyncio.run(run())
+        self.assertEqual((finished["status"], finished["result"]), ("completed", "done"))
+        self.assertIsNone(missing)
+        # Four 0.1 s store calls: the loop keeps running while they wait
+        self.assertGreater(ticks, 10)
+
+if __name__ == '__main__':
+    unittest.main()
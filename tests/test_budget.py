@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for per-RFQ cost and latency budgets
+"""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PIL import Image, ImageDraw
+
+from kalla import api, cli, routing
+from kalla.budget import Budget, image_tokens, priority_order, DEGRADED_PIXELS
+
+def drawing(size=(400, 300), width=6):
+    image = Image.new("RGB", size, "white")
+    if width:
+        ImageDraw.Draw(image).rectangle((50, 50, size[0] - 50, size[1] - 50), outline="black", width=width)
+    return image
+
+class TestBudget(unittest.TestCase):
+    """Test cases for the Budget accounting and budgeted analyzer"""
+
+    def setUp(self):
+        self.calls = []
+
+        def analyze(image, analysis_type, note=None, model=None):
+            self.calls.append((image.size, model))
+            return "ok"
+
+        self.analyze = analyze
+
+    def test_image_tokens(self):
+        self.assertEqual(image_tokens(drawing((512, 512))), 85 + 170)
+        # Scaled to 2048 x 512: four tiles
+        self.assertEqual(image_tokens(drawing((4000, 1000))), 85 + 170 * 4)
+        # Scaled to 768 x 1024: four tiles
+        self.assertEqual(image_tokens(drawing((1500, 2000))), 85 + 170 * 4)
+
+    def test_unlimited_budget_is_none(self):
+        self.assertIsNone(Budget.from_env())
+        self.assertIsNotNone(Budget.from_env(max_tokens=100))
+
+    def test_charges_are_settled_against_the_answer(self):
+        budget = Budget(max_tokens=100000)
+        budget.analyzer(self.analyze)(drawing(), "dimensions")
+        report = budget.report()
+        # Prompt and image, plus one token of answer once the output reservation is released
+        self.assertEqual(report["tokens"], 300 + image_tokens(drawing()) + 1)
+        self.assertEqual(report["calls"], 1)
+        self.assertGreater(report["cost_eur"], 0)
+
+    def test_failed_call_releases_its_reservation(self):
+        def analyze(image, analysis_type, note=None, model=None):
+            raise TimeoutError("vision call timed out")
+
+        budget = Budget(max_tokens=100000)
+        with self.assertRaises(TimeoutError):
+            budget.analyzer(analyze)(drawing(), "dimensions")
+        # The prompt and image stay charged, the output allowance does not
+        self.assertEqual(budget.report()["tokens"], 300 + image_tokens(drawing()))
+
+    def test_degrades_near_the_limit(self):
+        budget = Budget(max_cost=1.0)
+        budget.cost = 0.7
+        analyze = budget.analyzer(self.analyze)
+        analyze(drawing((3000, 2000)), "dimensions")
+
+        size, model = self.calls[0]
+        self.assertEqual(max(size), DEGRADED_PIXELS)
+        self.assertEqual(model, routing.models("vision")[0])
+        self.assertEqual(budget.report()["degraded_calls"], 1)
+
+    def test_exhausted_budget_makes_no_call(self):
+        budget = Budget(max_tokens=1000)
+        budget.tokens = 900
+        result = budget.analyzer(self.analyze)(drawing(), "dimensions")
+        self.assertTrue(result.startswith("Error: RFQ budget exhausted (tokens"))
+        self.assertEqual(self.calls, [])
+
+    def test_low_value_pages_are_skipped_first(self):
+        budget = Budget(max_tokens=1000)
+        budget.tokens = 700
+        self.assertIsNone(budget.skip_reason(0.2))
+        self.assertIn("low-value", budget.skip_reason(0.001))
+        self.assertEqual(priority_order([0.01, 0.3, 0.1]), [1, 2, 0])
+
+class TestBudgetedRuns(unittest.TestCase):
+    """Test cases for budgets in the API and command line"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        del os.environ["OPENAI_API_KEY"]
+
+    def test_api_analyzes_most_informative_image_first(self):
+        files = []
+        for name, width in (("light.png", 2), ("heavy.png", 20), ("medium.png", 8)):
+            path = os.path.join(self.tmp.name, name)
+            drawing(width=width).save(path)
+            files.append((name, path))
+
+        # Room for one call before the estimate reserve is reached
+        with patch("kalla.vision.analyze_drawing_with_openai", return_value="ok") as analyze:
+            results = api.analyze_drawing_files(files, budget=Budget(max_tokens=600))
+
+        self.assertEqual(analyze.call_count, 1)
+        self.assertEqual([r["drawing_name"] for r in results], ["light.png", "heavy.png", "medium.png"])
+        self.assertEqual([r.get("skipped") for r in results], ["budget", None, "budget"])
+        self.assertTrue(results[0]["analysis_result"].startswith("Skipped: RFQ budget exhausted"))
+
+    def test_cli_reports_budget(self):
+        path = os.path.join(self.tmp.name, "drawing.pdf")
+        document = fitz.open()
+        document.new_page().insert_text((72, 72), "Plan")
+        document.new_page().insert_text((72, 72), "Section A-A, elevation and details", fontsize=30)
+        document.save(path)
+        document.close()
+
+        stdout = io.StringIO()
+        with patch("kalla.vision.analyze_drawing_with_openai", return_value="ok") as analyze, \
+                patch("sys.stdout", stdout):
+            cli.main(["analyze", path, "--jobs", "1", "--max-tokens", "1200", "--quiet"])
+        result = json.loads(stdout.getvalue())
+
+        self.assertEqual(analyze.call_count, 1)
+        analyses = result["drawing_analyses"]
+        self.assertEqual([a["page_number"] for a in analyses], [1, 2])
+        self.assertEqual([a.get("skipped") for a in analyses], ["budget", None])
+        self.assertEqual((result["budget"]["skipped_pages"], result["budget"]["limits"]["tokens"]), (1, 1200))
+
+if __name__ == "__main__":
+    unittest.main()
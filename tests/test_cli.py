@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the command-line estimation tool
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+
+from kalla import cli
+from kalla.cache import DiskCache
+
+def write_pdf(path, pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    document.save(path)
+    document.close()
+
+class TestCli(unittest.TestCase):
+    """Test cases for `python -m kalla` with model calls patched out"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spec = os.path.join(self.tmp.name, "spec.pdf")
+        self.drawing = os.path.join(self.tmp.name, "drawing.pdf")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        write_pdf(self.spec, ["Conference table 3000 x 1200"])
+        write_pdf(self.drawing, ["Plan", "Section"])
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        del os.environ["OPENAI_API_KEY"]
+
+    def run_cli(self, *args, analysis="ok"):
+        stdout = io.StringIO()
+        with patch("kalla.vision.analyze_drawing_with_openai", return_value=analysis) as analyze, \
+                patch("kalla.extraction.extract_specifications_with_openai", return_value={"quantity": "1"}), \
+                patch("kalla.pricing.generate_cost_estimate", return_value={
+                    "material_costs": [{"item": "Oak", "total_cost": "10"}],
+                    "labor_costs": [], "total_cost": "10"
+                }), patch("sys.stdout", stdout):
+            exit_code = cli.main(list(args))
+        return exit_code, stdout.getvalue(), analyze.call_count
+
+    def test_estimate_json(self):
+        exit_code, output, calls = self.run_cli(
+            "estimate", self.spec, self.drawing, "--jobs", "2", "--quiet"
+        )
+        result = json.loads(output)
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(calls, 2)
+        self.assertEqual([a["page_number"] for a in result["drawing_analyses"]], [1, 2])
+        self.assertEqual(result["cost_estimate"]["total_cost"], "10.00")
+
+    def test_estimate_csv(self):
+        _, output, _ = self.run_cli("estimate", self.spec, "--format", "csv", "--quiet")
+        lines = output.splitlines()
+        self.assertEqual(lines[0], "section,item,specification,quantity,unit_cost,total_cost")
+        self.assertTrue(lines[1].startswith("material,Oak"))
+
+    def test_cache_dir_skips_repeat_calls(self):
+        self.run_cli("analyze", self.drawing, "--cache-dir", self.cache_dir, "--quiet")
+        _, _, calls = self.run_cli("analyze", self.drawing, "--cache-dir", self.cache_dir, "--quiet")
+        self.assertEqual(calls, 0)
+
+    def test_failed_analysis_is_not_cached(self):
+        _, output, _ = self.run_cli("analyze", self.drawing, "--cache-dir", self.cache_dir, "--quiet",
+                                    analysis=None)
+        _, _, calls = self.run_cli("analyze", self.drawing, "--cache-dir", self.cache_dir, "--quiet")
+        self.assertEqual([a["analysis_result"] for a in json.loads(output)["drawing_analyses"]], [None, None])
+        self.assertEqual(calls, 2)
+
+class TestDiskCache(unittest.TestCase):
+    """Test cases for the result cache shared by --jobs threads"""
+
+    def test_concurrent_writes_of_one_key(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory)
+            value = {"analysis": "x" * 100000}
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda _: cache.set("k" * 64, value), range(32)))
+
+            self.assertEqual(cache.get("k" * 64), value)
+            self.assertEqual(os.listdir(os.path.join(directory, "kk")), ["k" * 64 + ".json"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk export of quotes and drawing analyses
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla import cli
+from kalla.export import export_file, export_tables, flatten_fields, write_parquet, available_formats
+
+try:
+    from starlette.testclient import TestClient
+    from kalla import api
+except ImportError:
+    api = None
+
+def make_quote(project_name, total_cost):
+    return {
+        "timestamp": "2024-05-01 10:00:00",
+        "specifications": {
+            "project_name": project_name,
+            "quantity": "2",
+            "dimensions": {"length": "3000", "width": "1200"},
+            "materials": [{"material_type": "Solid Oak", "quantity": "3.6 sqm"}],
+            "special_features": ["Cable management", "Adjustable feet"]
+        },
+        "cost_estimate": {
+            "material_costs": [{"item": "Solid Oak", "quantity": "3.6 sqm", "unit_cost": "85.00", "total_cost": "306.00"}],
+            "labor_costs": [{"operation": "Assembly", "hours": "4", "hourly_rate": "45", "total_cost": "180.00"}],
+            "overhead_costs": {"percentage": "15", "amount": "72.90"},
+            "total_cost": total_cost,
+            "price_per_unit": "279.45"
+        }
+    }
+
+DRAWINGS = [
+    {"drawing_name": "set.pdf (Page 1)", "file_type": "pdf", "page_number": 1, "total_pages": 2,
+     "analysis_result": "Skipped: blank page", "skipped": "blank", "image": object()},
+    {"drawing_name": "set.pdf (Page 2)", "file_type": "pdf", "page_number": 2, "total_pages": 2,
+     "analysis_type": "dimensions", "model_used": "OpenAI gpt-4o", "analysis_result": "Length: 3000mm"}
+]
+
+def read_csv(data):
+    return list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+class TestExport(unittest.TestCase):
+    """Test cases for flattening and writing export tables"""
+
+    def setUp(self):
+        self.quotes = [make_quote("Table A", "558.90"), make_quote("Table B", "1200.00")]
+
+    def test_flatten_fields(self):
+        fields = dict(flatten_fields(self.quotes[0]["specifications"]))
+        self.assertEqual(fields["dimensions.length"], "3000")
+        self.assertEqual(fields["materials.0.material_type"], "Solid Oak")
+        self.assertEqual(fields["special_features"], "Cable management; Adjustable feet")
+
+    def test_zip_bundle(self):
+        with zipfile.ZipFile(export_file("zip", self.quotes, DRAWINGS)) as bundle:
+            self.assertEqual(sorted(bundle.namelist()),
+                             ["cost_lines.csv", "drawings.csv", "quotes.csv", "specifications.csv"])
+            quotes = read_csv(bundle.read("quotes.csv"))
+            lines = read_csv(bundle.read("cost_lines.csv"))
+            drawings = read_csv(bundle.read("drawings.csv"))
+
+        self.assertEqual([row["project_name"] for row in quotes], ["Table A", "Table B"])
+        self.assertEqual(float(quotes[1]["total_cost"]), 1200.0)
+        self.assertEqual([row["section"] for row in lines if row["quote_id"] == "1"],
+                         ["material", "labor", "overhead_costs"])
+        self.assertEqual([row["skipped"] for row in drawings], ["blank", ""])
+        self.assertNotIn("image", drawings[0])
+
+    def test_single_table_csv(self):
+        rows = read_csv(export_file("csv", self.quotes, table="cost_lines").read())
+        self.assertEqual(len(rows), 6)
+        self.assertEqual([(row["quantity"], row["unit"]) for row in rows[:3]],
+                         [("3.6", "sqm"), ("4.0", "hours"), ("", "")])
+
+    @unittest.skipUnless("parquet" in available_formats(), "pyarrow not installed")
+    def test_parquet_is_written_in_batches(self):
+        import pyarrow.parquet as pq
+
+        sink = io.BytesIO()
+        write_parquet("specifications", export_tables(self.quotes * 10)["specifications"], sink, batch_rows=25)
+        parquet_file = pq.ParquetFile(io.BytesIO(sink.getvalue()))
+        self.assertGreater(parquet_file.num_row_groups, 1)
+        self.assertEqual(parquet_file.metadata.num_rows, 20 * 7)
+
+    @unittest.skipUnless("parquet" in available_formats(), "pyarrow not installed")
+    def test_parquet_numeric_columns(self):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(export_file("parquet", self.quotes, table="quotes"))
+        self.assertEqual(table.column("total_cost").to_pylist(), [558.9, 1200.0])
+        self.assertEqual(table.column("quote_id").to_pylist(), [1, 2])
+
+class TestExportCommand(unittest.TestCase):
+    """Test cases for `python -m kalla export`"""
+
+    def test_history_and_estimate_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            history = os.path.join(tmp, "quote_history.json")
+            estimate = os.path.join(tmp, "estimate.json")
+            output = os.path.join(tmp, "quotes.zip")
+            with open(history, "w") as f:
+                json.dump([make_quote("Table A", "558.90")], f)
+            with open(estimate, "w") as f:
+                quote = make_quote("Table B", "1200.00")
+                json.dump({"specifications": quote["specifications"], "cost_estimate": quote["cost_estimate"],
+                           "drawing_analyses": DRAWINGS[1:]}, f)
+
+            self.assertEqual(cli.main(["export", history, estimate, "-o", output, "--quiet"]), 0)
+            with zipfile.ZipFile(output) as bundle:
+                self.assertEqual(len(read_csv(bundle.read("quotes.csv"))), 2)
+                self.assertEqual(len(read_csv(bundle.read("drawings.csv"))), 1)
+
+@unittest.skipIf(api is None, "starlette/httpx not installed")
+class TestExportApi(unittest.TestCase):
+    """Test cases for the /exports endpoint"""
+
+    def test_export_is_streamed(self):
+        client = TestClient(api.app)
+        response = client.post("/exports", json={
+            "quotes": [make_quote("Table A", "558.90")],
+            "drawing_analyses": DRAWINGS[1:],
+            "format": "csv",
+            "table": "drawings"
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment", response.headers["content-disposition"])
+        self.assertEqual(read_csv(response.content)[0]["analysis_result"], "Length: 3000mm")
+
+    def test_unknown_format(self):
+        client = TestClient(api.app)
+        self.assertEqual(client.post("/exports", json={"format": "pdf"}).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
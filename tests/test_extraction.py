@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for chunked specification extraction and partial-result merging
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.extraction import chunk_text, merge_specifications, extract_specifications_chunked
+
+class TestChunking(unittest.TestCase):
+    """Test cases for splitting long documents"""
+
+    def test_pages_are_grouped_up_to_limit(self):
+        chunks = chunk_text(["a" * 40, "b" * 40, "c" * 40], max_chars=100)
+        self.assertEqual(len(chunks), 2)
+        self.assertIn("b" * 40, chunks[0])
+        self.assertEqual(chunks[1], "c" * 40)
+
+    def test_long_page_is_split_at_paragraphs(self):
+        page = "\n\n".join(["x" * 60, "y" * 60, "z" * 60])
+        chunks = chunk_text([page], max_chars=100)
+        self.assertEqual([chunk.strip() for chunk in chunks], ["x" * 60, "y" * 60, "z" * 60])
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunk_text(["w" * 250], max_chars=100)))
+
+    def test_chunks_keep_source_order(self):
+        # An oversized item table between short paragraphs
+        table = "\n".join(f"K-{i:02d} Cabinet door, oak veneer, qty {i}" for i in range(1, 30))
+        page = "\n\n".join(["Project: school kitchen", table, "Delivery: week 12", "Finish: matt lacquer"])
+        chunks = chunk_text([page], max_chars=200)
+
+        self.assertEqual("".join(chunks), page)
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+        # Item lines are never cut, so each quantity stays with its item
+        lines = [line for chunk in chunks for line in chunk.strip().split("\n") if line]
+        self.assertEqual(lines, [line for line in page.split("\n") if line])
+        self.assertEqual("\n".join(chunk_text(["a" * 40, "b" * 40, "c" * 40], max_chars=100)),
+                         "\n".join(["a" * 40, "b" * 40, "c" * 40]))
+
+class TestMerge(unittest.TestCase):
+    """Test cases for merging partial specifications"""
+
+    def test_merge_is_deterministic_and_deduplicated(self):
+        partials = [
+            {
+                "project_name": "School kitchen",
+                "furniture_type": "",
+                "dimensions": {"length": "3000", "width": "N/A"},
+                "materials": [{"material_type": "Oak", "specifications": "25mm", "quantity": "3 sqm"}],
+                "construction_methods": ["Dowels"],
+                "additional_notes": "Deliver in May"
+            },
+            {
+                "furniture_type": "Cabinet",
+                "dimensions": {"width": "600"},
+                "materials": [
+                    {"material_type": "oak ", "specifications": "25mm", "quantity": "4.5 sqm"},
+                    {"material_type": "Steel", "quantity": "8 pieces"}
+                ],
+                "construction_methods": ["dowels", "Cam locks"],
+                "additional_notes": "deliver in may"
+            }
+        ]
+        merged = merge_specifications(partials)
+
+        self.assertEqual(merged["project_name"], "School kitchen")
+        self.assertEqual(merged["furniture_type"], "Cabinet")
+        self.assertEqual(merged["dimensions"], {"length": "3000", "width": "600", "height": ""})
+        self.assertEqual([m["quantity"] for m in merged["materials"]], ["4.5 sqm", "8 pieces"])
+        self.assertEqual(merged["construction_methods"], ["Dowels", "Cam locks"])
+        self.assertEqual(merged["additional_notes"], "Deliver in May")
+
+    def test_chunks_are_extracted_separately(self):
+        with patch("kalla.extraction.extract_specifications_with_openai",
+                   side_effect=lambda text, *args, **kwargs: {"special_features": [text[:1]]}) as mocked:
+            merged = extract_specifications_chunked(["a" * 80, "b" * 80], "specification", max_chars=100)
+
+        self.assertEqual(mocked.call_count, 2)
+        self.assertEqual(mocked.call_args_list[1].kwargs["part"], (2, 2))
+        self.assertEqual(merged["special_features"], ["a", "b"])
+
+if __name__ == '__main__':
+    unittest.main()
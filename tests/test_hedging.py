@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged requests and provider failover
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla import hedging
+from kalla.hedging import LatencyTracker, hedged, hedged_analyzer
+
+class FixedDeadline(LatencyTracker):
+    def deadline(self, provider):
+        return 0.05
+
+class ServerError(Exception):
+    status_code = 503
+
+class BadRequest(Exception):
+    status_code = 400
+
+class Provider:
+    """Fake provider call that sleeps, then answers or raises"""
+
+    def __init__(self, answer, delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer
+
+class TestHedged(unittest.TestCase):
+    """Test cases for hedging and failover between two providers"""
+
+    def test_fast_primary_is_not_hedged(self):
+        primary, fallback = Provider("openai answer"), Provider("anthropic answer")
+        result = hedged([("openai", primary), ("anthropic", fallback)], tracker=FixedDeadline())
+        self.assertEqual(result, "openai answer")
+        self.assertEqual(fallback.calls, 0)
+
+    def test_slow_primary_is_hedged(self):
+        primary, fallback = Provider("openai answer", delay=1.0), Provider("anthropic answer")
+        start = time.time()
+        result = hedged([("openai", primary), ("anthropic", fallback)], tracker=FixedDeadline())
+        self.assertEqual(result, "anthropic answer")
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_server_error_fails_over_immediately(self):
+        tracker = LatencyTracker()
+        primary, fallback = Provider(ServerError("overloaded")), Provider("anthropic answer")
+        start = time.time()
+        self.assertEqual(hedged([("openai", primary), ("anthropic", fallback)], tracker=tracker), "anthropic answer")
+        self.assertLess(time.time() - start, hedging.DEFAULT_DEADLINE_SECONDS)
+
+    def test_error_string_fails_over(self):
+        primary = Provider("Error: OpenAI API key not available. Please check your .env file.")
+        result = hedged([("openai", primary), ("anthropic", Provider("anthropic answer"))], tracker=FixedDeadline())
+        self.assertEqual(result, "anthropic answer")
+
+    def test_client_error_is_raised(self):
+        fallback = Provider("anthropic answer")
+        with self.assertRaises(BadRequest):
+            hedged([("openai", Provider(BadRequest("invalid image"))), ("anthropic", fallback)],
+                   tracker=FixedDeadline())
+        self.assertEqual(fallback.calls, 0)
+
+    def test_all_failing_raises_last_error(self):
+        with self.assertRaises(ServerError):
+            hedged([("openai", Provider(ServerError())), ("anthropic", Provider(ServerError()))],
+                   tracker=FixedDeadline())
+
+    def test_analyzer_passes_arguments(self):
+        def analyze(image, analysis_type, note=None):
+            return f"{image}:{analysis_type}:{note}"
+        analyzer = hedged_analyzer([("openai", analyze)], tracker=FixedDeadline())
+        self.assertEqual(analyzer("img", "dimensions", note="crop"), "img:dimensions:crop")
+
+class TestLatencyTracker(unittest.TestCase):
+    """Test cases for p95-based deadlines"""
+
+    def test_default_until_enough_samples(self):
+        tracker = LatencyTracker()
+        tracker.record("openai", 100.0)
+        self.assertEqual(tracker.deadline("openai"), hedging.DEFAULT_DEADLINE_SECONDS)
+
+    def test_p95_deadline(self):
+        tracker = LatencyTracker()
+        for seconds in range(1, 101):
+            tracker.record("openai", float(seconds))
+        self.assertEqual(tracker.deadline("openai"), 96.0)
+
+        fast = LatencyTracker()
+        for _ in range(hedging.MIN_SAMPLES):
+            fast.record("openai", 0.1)
+        self.assertEqual(fast.deadline("openai"), hedging.MIN_DEADLINE_SECONDS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-item RFQ extraction merging and vectorized item pricing
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.extraction import merge_item_lists
+from kalla.pricing import price_items
+
+MATERIAL_DB = {
+    "materials": [
+        {"name": "Solid Oak", "price_per_sqm": "85.00"},
+        {"name": "Steel Legs", "price_per_piece": "45.00"}
+    ],
+    "labor_rates": {"cutting": 25.00, "assembly": 30.00}
+}
+
+ITEMS = [
+    {
+        "item_id": "T-01",
+        "quantity": "2",
+        "materials": [
+            {"material_type": "Solid Oak", "quantity": "3.6 sqm"},
+            {"material_type": "Steel Legs", "quantity": "4 pieces"}
+        ],
+        "operations": [{"operation": "Assembly", "hours": "2"}]
+    },
+    {
+        "item_id": "K-01",
+        "quantity": "10",
+        "materials": [{"material_type": "Melamine board", "quantity": "2 sqm"}],
+        "operations": [{"operation": "Cutting", "hours": "0.5"}, {"operation": "Drilling", "hours": "1"}]
+    }
+]
+
+class TestItemPricing(unittest.TestCase):
+    """Test cases for pricing item lists"""
+
+    def test_per_item_and_aggregate_totals(self):
+        priced = price_items(ITEMS, MATERIAL_DB, overhead_percentage=10, margin_percentage=0)
+        per_item = priced["items"].set_index("item_id")
+
+        # (3.6 * 85 + 4 * 45) * 2 + 2 * 30 * 2 = 1092, plus 10% overhead
+        self.assertAlmostEqual(per_item.loc["T-01", "total_cost"], 1201.20)
+        self.assertAlmostEqual(per_item.loc["T-01", "price_per_unit"], 600.60)
+        # Only cutting is priced: 0.5 * 25 * 10 = 125, plus 10% overhead
+        self.assertAlmostEqual(per_item.loc["K-01", "total_cost"], 137.50)
+
+        totals = priced["totals"]
+        self.assertEqual(totals["item_count"], 2)
+        self.assertEqual(totals["piece_count"], 12.0)
+        self.assertAlmostEqual(totals["total_cost"], 1338.70)
+        self.assertEqual(totals["unpriced_material_lines"], 1)
+        self.assertEqual(totals["unpriced_operation_lines"], 1)
+
+    def test_many_items(self):
+        items = [dict(ITEMS[0], item_id=f"T-{i}") for i in range(500)]
+        priced = price_items(items, MATERIAL_DB, overhead_percentage=0, margin_percentage=0)
+        self.assertEqual(len(priced["materials"]), 1000)
+        self.assertAlmostEqual(priced["totals"]["total_cost"], 1092.0 * 500)
+
+    def test_duplicate_item_ids_are_priced_separately(self):
+        item = {
+            "item_id": "K-01",
+            "quantity": "2",
+            "materials": [{"material_type": "Solid Oak", "quantity": "2 sqm"}],
+            "operations": [{"operation": "Assembly", "hours": "0.5"}]
+        }
+        items = [dict(item, description="Base unit"), dict(item, description="Wall unit")]
+        priced = price_items(items, MATERIAL_DB, overhead_percentage=0, margin_percentage=0)
+
+        self.assertEqual(list(priced["items"]["line"]), [1, 2])
+        self.assertEqual(list(priced["items"]["material_cost"]), [340.0, 340.0])
+        self.assertEqual(len(priced["materials"]), 2)
+        self.assertAlmostEqual(priced["totals"]["material_cost"], 680.0)
+        self.assertAlmostEqual(priced["totals"]["labor_cost"], 60.0)
+
+    def test_empty_item_list(self):
+        self.assertEqual(price_items([], MATERIAL_DB)["totals"]["total_cost"], 0.0)
+
+    def test_merge_item_lists_drops_repeats(self):
+        merged = merge_item_lists([
+            {"project_name": "Kitchen", "items": [{"item_id": "K-01"}, {"item_id": "K-02"}]},
+            {"items": [{"item_id": "k-01 "}, {"item_id": "K-03"}]}
+        ])
+        self.assertEqual(merged["project_name"], "Kitchen")
+        self.assertEqual([item["item_id"] for item in merged["items"]], ["K-01", "K-02", "K-03"])
+
+    def test_merge_item_lists_keeps_distinct_items(self):
+        shelf = {"item_id": "", "description": "Shelf", "dimensions": {"length": "600", "width": "300"}}
+        wide_shelf = {"item_id": "", "description": "Shelf", "dimensions": {"length": "800", "width": "300"}}
+        self.assertEqual(len(merge_item_lists([{"items": [shelf, wide_shelf]}, {"items": [shelf]}])["items"]), 3)
+
+        door = {"item_id": "D-1", "description": "Door", "quantity": "1"}
+        merged = merge_item_lists([
+            {"items": [door, door, dict(door, quantity="2")]},
+            {"items": [door, "garbage", dict(door, item_id="d-1 ")]},
+            None
+        ])
+        # Two identical lines in one chunk are both kept; the next chunk's repeats are overlap
+        self.assertEqual([item["quantity"] for item in merged["items"]], ["1", "1", "2"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests that the kalla package can be imported without Streamlit or model SDKs
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["streamlit", "openai", "anthropic", "PyPDF2", "fitz", "pandas", "PIL"]
+
+class TestLazyImports(unittest.TestCase):
+    """Importing kalla modules must not pull in heavy dependencies"""
+
+    def test_core_modules_import_without_heavy_dependencies(self):
+        script = (
+            "import sys\n"
+            "import kalla, kalla.config, kalla.prompts, kalla.providers, kalla.pdf, "
+            "kalla.vision, kalla.extraction, kalla.pricing, kalla.similarity\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        self.assertEqual(output, "")
+
+    def test_package_resolves_exports_lazily(self):
+        import kalla
+        self.assertTrue(callable(kalla.generate_cost_estimate))
+        with self.assertRaises(AttributeError):
+            kalla.does_not_exist
+
+if __name__ == '__main__':
+    unittest.main()
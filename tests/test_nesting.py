@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for sheet nesting and nested material quantities
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.nesting import pack_sheets, nest_materials, parts_from_spec, sheet_size
+from kalla.pricing import price_estimate
+
+MATERIAL_DB = {
+    "materials": [
+        {"name": "Melamine Board", "sheet_size": "2800x2070mm", "price_per_sheet": "60.00"},
+        {"name": "Solid Oak", "sheet_length": "3000", "sheet_width": "1250", "price_per_sqm": "85.00"},
+        {"name": "Steel Legs", "price_per_piece": "45.00"}
+    ]
+}
+
+class TestPacking(unittest.TestCase):
+    """Test cases for the guillotine packer"""
+
+    def test_exact_quarters_fill_one_sheet(self):
+        result = pack_sheets([{"length": 1000, "width": 500, "quantity": 4}], 2000, 1000, kerf=0)
+        self.assertEqual(result["sheets"], 1)
+        self.assertEqual(result["yield"], 1.0)
+
+    def test_kerf_is_left_between_parts(self):
+        result = pack_sheets([{"length": 998, "width": 498, "quantity": 4}], 2000, 1000, kerf=4)
+        self.assertEqual(result["sheets"], 1)
+        result = pack_sheets([{"length": 1000, "width": 500, "quantity": 4}], 2000, 1000, kerf=4)
+        self.assertEqual(result["sheets"], 2)
+
+    def test_parts_are_rotated_to_fit(self):
+        result = pack_sheets([{"length": 400, "width": 900, "quantity": 1}], 1000, 500, kerf=0)
+        self.assertEqual(result["sheets"], 1)
+        self.assertEqual(result["layouts"][0][0]["length"], 900)
+
+    def test_oversized_parts_are_reported(self):
+        result = pack_sheets([{"name": "top", "length": 3500, "width": 900}], 2800, 2070)
+        self.assertEqual(result["sheets"], 0)
+        self.assertEqual(result["unplaced"][0]["name"], "top")
+
+    def test_hundreds_of_parts_are_fast(self):
+        parts = [{"length": 300 + (i * 37) % 900, "width": 200 + (i * 53) % 500} for i in range(500)]
+        start = time.perf_counter()
+        result = pack_sheets(parts, 2800, 2070)
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertGreater(result["yield"], 0.7)
+        self.assertEqual(sum(len(layout) for layout in result["layouts"]), 500)
+
+class TestNestedQuantities(unittest.TestCase):
+    """Test cases for nesting per material and feeding quantities to pricing"""
+
+    def test_sheet_size_formats(self):
+        self.assertEqual(sheet_size(MATERIAL_DB["materials"][0]), (2800.0, 2070.0))
+        self.assertEqual(sheet_size(MATERIAL_DB["materials"][1]), (3000.0, 1250.0))
+        self.assertIsNone(sheet_size(MATERIAL_DB["materials"][2]))
+
+    def test_spec_panel_nesting_replaces_model_quantity(self):
+        spec = {
+            "quantity": "3",
+            "dimensions": {"length": "3000", "width": "1200"},
+            "materials": [{"material_type": "Solid Oak"}, {"material_type": "Steel Legs"}]
+        }
+        nesting = nest_materials(parts_from_spec(spec, MATERIAL_DB), MATERIAL_DB)
+        self.assertEqual(list(nesting), ["Solid Oak"])
+        self.assertEqual(nesting["Solid Oak"]["sheets"], 3)
+
+        takeoff = {"material_costs": [{"item": "Solid Oak", "quantity": "10.8 sqm", "total_cost": "0"}]}
+        matches = [{"material": "Solid Oak", "unit_price": 85.0, "unit": "sqm"}]
+        estimate = price_estimate(takeoff, matches, nesting=nesting)
+        self.assertEqual(estimate["material_costs"][0]["quantity"], "11.25 sqm")
+        self.assertEqual(estimate["material_costs"][0]["total_cost"], "956.25")
+
+    def test_cut_list_and_sheet_priced_material(self):
+        spec = {"quantity": "2", "cut_list": [
+            {"part": "side", "material": "Melamine Board", "length": "720", "width": "560", "quantity": "2"}
+        ]}
+        nesting = nest_materials(parts_from_spec(spec, MATERIAL_DB), MATERIAL_DB)
+        takeoff = {"material_costs": [{"item": "Melamine Board", "quantity": "1.6 sqm"}]}
+        matches = [{"material": "Melamine Board", "unit_price": 60.0, "unit": "sheet"}]
+        estimate = price_estimate(takeoff, matches, nesting=nesting)
+        self.assertEqual(estimate["material_costs"][0]["quantity"], "1 sheets")
+        self.assertEqual(estimate["material_costs"][0]["total_cost"], "60.00")
+
+    def test_sheets_are_charged_once_per_material(self):
+        spec = {"quantity": "2", "cut_list": [
+            {"part": "top", "material": "Melamine Board", "length": "1200", "width": "600", "quantity": "1"},
+            {"part": "side", "material": "Melamine Board", "length": "720", "width": "560", "quantity": "2"}
+        ]}
+        nesting = nest_materials(parts_from_spec(spec, MATERIAL_DB), MATERIAL_DB)
+        takeoff = {"material_costs": [
+            {"item": "Melamine Board top", "quantity": "1.4 sqm"},
+            {"item": "Melamine Board sides", "quantity": "1.6 sqm"}
+        ]}
+        matches = [{"material": "Melamine Board", "unit_price": 60.0, "unit": "sheet"}] * 2
+        estimate = price_estimate(takeoff, matches, nesting=nesting)
+        sheets = nesting["Melamine Board"]["sheets"]
+        self.assertEqual([line["quantity"] for line in estimate["material_costs"]],
+                         [f"{sheets} sheets", "0 sheets"])
+        self.assertEqual(estimate["total_cost"], f"{sheets * 60.0:.2f}")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the local OCR pre-pass (Tesseract itself is patched out)
+"""
+
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from kalla import ocr
+from kalla.ocr import words_from_data, hints_from_words, analyze_with_ocr, ocr_analyzer
+
+TESSERACT_DATA = {
+    "text": ["", "1200", "mm", "R25", "TOP", "800", "x", "450", "~"],
+    "conf": [-1, 91, 88, 85, 90, 40, 70, 80, 95],
+    "left": [0, 100, 150, 400, 500, 600, 650, 700, 900],
+    "top": [0, 50, 50, 300, 20, 80, 80, 80, 900],
+    "width": [0, 40, 20, 30, 40, 30, 5, 30, 5],
+    "height": [0, 10, 10, 10, 10, 10, 10, 10, 5]
+}
+
+class Recorder:
+    """Stand-in for a vision call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, image, analysis_type, note=None):
+        self.calls.append((image.size, analysis_type, note))
+        return "model answer"
+
+class TestHints(unittest.TestCase):
+    """Test cases for turning OCR output into hints"""
+
+    def test_words_and_dimensions(self):
+        words = words_from_data(TESSERACT_DATA, 1000, 1000)
+        self.assertNotIn("800", [w["text"] for w in words])  # below confidence
+
+        hints = hints_from_words(words)
+        self.assertEqual([d["text"] for d in hints["dimensions"]], ["1200 mm", "R25", "450"])
+        self.assertEqual(hints["dimensions"][0]["unit"], "mm")
+        self.assertEqual(hints["dimensions"][1]["value"], 25.0)
+        self.assertEqual([l["text"] for l in hints["labels"]], ["TOP"])
+        self.assertEqual((hints["labels"][0]["x"], hints["labels"][0]["y"]), (0.52, 0.025))
+
+class TestAnalyzeWithOcr(unittest.TestCase):
+    """Test cases for routing between local answers, hinted and plain vision calls"""
+
+    def setUp(self):
+        self.image = Image.new("RGB", (3000, 2000), "white")
+        self.hints = hints_from_words(words_from_data(TESSERACT_DATA, 3000, 2000))
+
+    def test_dimensions_answered_locally(self):
+        analyze = Recorder()
+        result, skipped = analyze_with_ocr(self.image, "dimensions", analyze, hints=self.hints)
+        self.assertTrue(skipped)
+        self.assertEqual(analyze.calls, [])
+        self.assertIn("1200 mm", result)
+
+    def test_other_types_get_hints_and_smaller_image(self):
+        analyze = Recorder()
+        result, skipped = analyze_with_ocr(self.image, "materials", analyze, hints=self.hints)
+        self.assertFalse(skipped)
+        size, analysis_type, note = analyze.calls[0]
+        self.assertEqual(max(size), 1024)
+        self.assertIn("R25", note)
+
+    def test_without_tesseract_falls_back_to_plain_call(self):
+        analyze = Recorder()
+        with patch("kalla.ocr.ocr_available", return_value=False):
+            result = ocr_analyzer(analyze)(self.image, "dimensions")
+        self.assertEqual(result, "model answer")
+        self.assertEqual(analyze.calls, [((3000, 2000), "dimensions", None)])
+
+    def test_tile_calls_pass_through(self):
+        analyze = Recorder()
+        with patch("kalla.ocr.ocr_hints") as ocr_hints:
+            ocr_analyzer(analyze)(self.image, "dimensions", note="crop of the top-left region")
+        ocr_hints.assert_not_called()
+        self.assertEqual(analyze.calls[0][2], "crop of the top-left region")
+
+class TestPool(unittest.TestCase):
+    """Test cases for the shared OCR process pool"""
+
+    def test_concurrent_first_calls_share_one_pool(self):
+        def slow_pool(max_workers):
+            time.sleep(0.05)
+            return object()
+
+        with patch.object(ocr, "_pool", None), patch("kalla.ocr.ProcessPoolExecutor", side_effect=slow_pool) as pool:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                pools = list(executor.map(lambda _: ocr._ocr_pool(), range(4)))
+
+        self.assertEqual(pool.call_count, 1)
+        self.assertTrue(all(p is pools[0] for p in pools))
+
+if __name__ == '__main__':
+    unittest.main()
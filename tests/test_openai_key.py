@@ -9,10 +9,10 @@ import unittest
 from unittest.mock import patch, MagicMock
 from dotenv import load_dotenv
 
-# Add the parent directory to the path so we can import utils
+# Add the parent directory to the path so we can import kalla
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils import load_api_keys
+from kalla.config import load_api_keys
 
 class TestOpenAIKeyLoading(unittest.TestCase):
     """Test cases for OpenAI API key loading functionality"""
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the dependency-tracked estimation pipeline and local pricing
+"""
+
+import copy
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.cache import MemoryCache
+from kalla.pipeline import Pipeline, add_estimate_nodes
+from kalla.pricing import takeoff_material_db
+
+MATERIAL_DB = {
+    "materials": [
+        {"name": "Solid Oak", "grade": "A", "price_per_sqm": "85.00", "supplier": "TimberCo"},
+        {"name": "Steel Legs", "price_per_piece": "45.00", "supplier": "MetalWorks"}
+    ],
+    "labor_rates": {"cutting": 25.00, "assembly": 30.00}
+}
+
+TAKEOFF = {
+    "material_costs": [
+        {"item": "Solid Oak tabletop", "quantity": "3.6 sqm", "unit_cost": "80", "total_cost": "288"},
+        {"item": "Steel Legs", "quantity": "4 pieces", "unit_cost": "40", "total_cost": "160"}
+    ],
+    "labor_costs": [
+        {"operation": "Cutting", "hours": "2", "hourly_rate": "20", "total_cost": "40"},
+        {"operation": "Assembly", "hours": "4", "hourly_rate": "20", "total_cost": "80"}
+    ],
+    "overhead_costs": {"percentage": "10", "amount": "0"},
+    "profit_margin": {"percentage": "0", "amount": "0"}
+}
+
+class TestPipeline(unittest.TestCase):
+    """Test cases for memoized nodes and local repricing"""
+
+    def setUp(self):
+        self.memo = MemoryCache()
+        self.generate = MagicMock(side_effect=lambda spec, db, drawings: copy.deepcopy(TAKEOFF))
+
+    def run_pipeline(self, spec, material_db):
+        pipeline = Pipeline(self.memo)
+        pipeline.add("spec", lambda: spec, fingerprint=spec)
+        add_estimate_nodes(pipeline, "spec", [], material_db, generate=self.generate)
+        return pipeline, pipeline.get("pricing")
+
+    def test_prices_come_from_material_db(self):
+        _, estimate = self.run_pipeline({"quantity": "2"}, MATERIAL_DB)
+
+        self.assertEqual(estimate["material_costs"][0]["total_cost"], "306.00")
+        self.assertEqual(estimate["material_costs"][1]["total_cost"], "180.00")
+        self.assertEqual(estimate["labor_costs"][1]["total_cost"], "120.00")
+        # (306 + 180 + 50 + 120) * 1.10
+        self.assertEqual(estimate["total_cost"], "721.60")
+        self.assertEqual(estimate["price_per_unit"], "360.80")
+
+    def test_labor_rate_change_reprices_without_model_call(self):
+        self.run_pipeline({"quantity": "1"}, MATERIAL_DB)
+        changed_db = copy.deepcopy(MATERIAL_DB)
+        changed_db["labor_rates"]["assembly"] = 40.00
+
+        pipeline, estimate = self.run_pipeline({"quantity": "1"}, changed_db)
+
+        self.assertEqual(self.generate.call_count, 1)
+        self.assertEqual(pipeline.computed, ["pricing"])
+        self.assertEqual(estimate["labor_costs"][1]["total_cost"], "160.00")
+
+    def test_price_change_reprices_without_model_call(self):
+        sheet_db = copy.deepcopy(MATERIAL_DB)
+        sheet_db["materials"][0]["sheet_size"] = "2800x2070"
+        spec = {"quantity": "1", "dimensions": {"length": "1200", "width": "800"}, "materials": ["Solid Oak"]}
+        self.run_pipeline(spec, sheet_db)
+        changed_db = copy.deepcopy(sheet_db)
+        changed_db["materials"][0]["price_per_sqm"] = "95.00"
+
+        pipeline, estimate = self.run_pipeline(spec, changed_db)
+
+        self.assertEqual(self.generate.call_count, 1)
+        self.assertEqual(pipeline.computed, ["material_matching", "pricing"])
+        self.assertEqual(estimate["material_costs"][0]["unit_cost"], "95.00")
+
+    def test_spec_change_regenerates_takeoff(self):
+        self.run_pipeline({"quantity": "1"}, MATERIAL_DB)
+        pipeline, _ = self.run_pipeline({"quantity": "1", "finish_requirements": "Lacquer"}, MATERIAL_DB)
+
+        self.assertEqual(self.generate.call_count, 2)
+        self.assertIn("takeoff", pipeline.computed)
+
+    def test_takeoff_prompt_excludes_prices(self):
+        db = takeoff_material_db(MATERIAL_DB)
+        self.assertNotIn("price_per_sqm", db["materials"][0])
+        self.assertEqual(db["labor_operations"], ["assembly", "cutting"])
+
+if __name__ == '__main__':
+    unittest.main()
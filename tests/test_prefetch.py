@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for speculative analysis of uploads
+"""
+
+import io
+import os
+import sys
+import threading
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PIL import Image, ImageDraw
+
+from kalla.prefetch import Prefetcher, prepare_file
+
+OPTIONS = ("openai", "comprehensive", True, False, False)
+
+def pdf_bytes():
+    """Two pages: empty and a drawing with enough outlines to pass screening"""
+    document = fitz.open()
+    document.new_page(width=842, height=595)
+    drawing = document.new_page(width=842, height=595)
+    for i in range(12):
+        drawing.draw_rect(fitz.Rect(100 + i * 50, 150, 140 + i * 50, 400))
+    data = document.tobytes()
+    document.close()
+    return data
+
+def png_bytes():
+    image = Image.new("RGB", (400, 300), "white")
+    ImageDraw.Draw(image).rectangle((50, 50, 350, 250), outline="black", width=6)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class TestPrefetch(unittest.TestCase):
+    """Test cases for the upload prefetcher"""
+
+    def setUp(self):
+        self.calls = []
+
+        def analyze(image, pdf_file, page_number, options):
+            self.calls.append((page_number, options))
+            return f"analysis of page {page_number}", []
+
+        self.prefetcher = Prefetcher(analyze)
+
+    def test_prepare_file(self):
+        prepared = prepare_file(pdf_bytes(), is_pdf=True)
+        self.assertEqual(len(prepared["images"]), 2)
+        self.assertEqual([s["content"] for s in prepared["screenings"]], ["blank", "drawing"])
+        self.assertEqual(prepare_file(pdf_bytes(), is_pdf=True, screen=False)["screenings"], [None, None])
+
+    def test_prefetched_analysis_is_reused(self):
+        data = pdf_bytes()
+        digest = self.prefetcher.start(data, True, OPTIONS)
+
+        self.assertEqual(len(self.prefetcher.prepared(digest)["images"]), 2)
+        self.assertEqual(self.prefetcher.analysis(digest, 1, OPTIONS), ("analysis of page 1", []))
+        # The blank page is screened out and never analyzed
+        self.assertIsNone(self.prefetcher.analysis(digest, 0, OPTIONS))
+        self.assertEqual(self.calls, [(1, OPTIONS)])
+
+        # Starting again with the same file and options does no more work
+        self.assertEqual(self.prefetcher.start(data, True, OPTIONS), digest)
+        self.prefetcher.analysis(digest, 1, OPTIONS)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_other_options_miss(self):
+        digest = self.prefetcher.start(png_bytes(), False, OPTIONS)
+        self.assertEqual(self.prefetcher.analysis(digest, 0, OPTIONS), ("analysis of page None", []))
+        self.assertIsNone(self.prefetcher.analysis(digest, 0, ("openai", "dimensions", True, False, False)))
+
+    def test_changed_options_restart(self):
+        digest = self.prefetcher.start(png_bytes(), False, OPTIONS)
+        dimensions = ("openai", "dimensions", True, False, False)
+        self.prefetcher.start(png_bytes(), False, dimensions)
+        self.assertIsNotNone(self.prefetcher.analysis(digest, 0, dimensions))
+        self.assertIsNone(self.prefetcher.analysis(digest, 0, OPTIONS))
+
+    def test_cancelled_work_is_not_used(self):
+        release = threading.Event()
+
+        def analyze(image, pdf_file, page_number, options):
+            release.wait(5)
+            self.calls.append(page_number)
+            return "late", []
+
+        prefetcher = Prefetcher(analyze)
+        digest = prefetcher.start(png_bytes(), False, OPTIONS)
+        prefetcher.prepared(digest)
+        prefetcher.retain(set())
+        release.set()
+        self.assertIsNone(prefetcher.analysis(digest, 0, OPTIONS))
+        self.assertIsNone(prefetcher.prepared(digest))
+
+    def test_error_results_are_not_reused(self):
+        prefetcher = Prefetcher(lambda image, pdf_file, page_number, options: ("Error: timeout", []))
+        digest = prefetcher.start(png_bytes(), False, OPTIONS)
+        self.assertIsNone(prefetcher.analysis(digest, 0, OPTIONS))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for opt-in stage profiling
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PIL import Image
+
+from kalla import pdf, profiling, vision
+from kalla.pipeline import Pipeline
+from kalla.profiling import Profile, stage, propagate
+
+class TestProfile(unittest.TestCase):
+    """Test cases for stage recording"""
+
+    def test_stages_are_nested_and_ordered(self):
+        with Profile("test") as profile:
+            with stage("outer"):
+                with stage("inner", page=2):
+                    time.sleep(0.01)
+
+        waterfall = profile.waterfall()
+        self.assertEqual([(s["stage"], s["depth"]) for s in waterfall], [("outer", 0), ("inner", 1)])
+        self.assertEqual(waterfall[1]["page"], 2)
+        self.assertGreaterEqual(waterfall[0]["seconds"], waterfall[1]["seconds"])
+        self.assertGreaterEqual(profile.seconds, 0.01)
+        self.assertIsNone(profiling.current())
+
+    def test_nothing_is_recorded_outside_a_run(self):
+        with stage("ignored"):
+            pass
+        profile = Profile("test")
+        with profile:
+            pass
+        with stage("after"):
+            pass
+        self.assertEqual(profile.stages, [])
+
+    def test_pool_work_is_recorded_through_propagate(self):
+        def work(i):
+            with stage("work"):
+                time.sleep(0.01)
+            return i
+
+        with Profile("test") as profile, stage("batch"):
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                self.assertEqual(list(executor.map(propagate(work), range(6))), list(range(6)))
+
+        totals = {t["stage"]: t for t in profile.totals()}
+        self.assertEqual(totals["work"]["count"], 6)
+        self.assertTrue(all(s["depth"] == 1 for s in profile.stages if s["stage"] == "work"))
+        self.assertTrue(any(s["thread"] != "MainThread" for s in profile.stages))
+
+    def test_dump_writes_stages_and_profiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with Profile("test", cprofile=True, memory=True) as profile, stage("build"):
+                data = [bytes(1000) for _ in range(100)]
+            path = profile.dump(directory)
+
+            with open(path) as f:
+                summary = json.load(f)
+            self.assertEqual(summary["stages"][0]["stage"], "build")
+            self.assertTrue(os.path.exists(path[:-len(".json")] + ".prof"))
+            self.assertTrue(os.path.exists(path[:-len(".json")] + ".tracemalloc"))
+        self.assertTrue(profile.top_functions())
+        self.assertTrue(profile.top_allocations())
+        del data
+
+    def test_cprofile_and_tracemalloc_serve_one_run_at_a_time(self):
+        import tracemalloc
+
+        def other_session():
+            with Profile("other", cprofile=True, memory=True) as profile, stage("work"):
+                pass
+            return profile
+
+        with Profile("test", cprofile=True, memory=True) as profile:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                other = executor.submit(other_session).result()
+            self.assertTrue(tracemalloc.is_tracing())
+
+        self.assertTrue(other.tools_busy)
+        self.assertIsNone(other.stats)
+        self.assertEqual([s["stage"] for s in other.stages], ["work"])
+        self.assertTrue(other.summary()["tools_busy"])
+        self.assertFalse(profile.tools_busy)
+        self.assertIsNotNone(profile.stats)
+        self.assertIsNotNone(profile.snapshot)
+
+        # Freed once the first run stops
+        with Profile("next", cprofile=True) as profile:
+            pass
+        self.assertFalse(profile.tools_busy)
+        self.assertIsNotNone(profile.stats)
+
+    def test_tracemalloc_started_elsewhere_keeps_running(self):
+        import tracemalloc
+
+        tracemalloc.start()
+        try:
+            with Profile("test", memory=True) as profile:
+                pass
+            self.assertIsNotNone(profile.snapshot)
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+class TestInstrumentedStages(unittest.TestCase):
+    """Test cases for the stages marked in library code"""
+
+    def test_pdf_encode_model_and_pipeline_stages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "drawing.pdf")
+            document = fitz.open()
+            document.new_page().insert_text((72, 72), "Plan")
+            document.save(path)
+            document.close()
+
+            pipeline = Pipeline()
+            pipeline.add("spec", lambda: pdf.extract_pages_from_pdf_path(path))
+            pipeline.add("images", lambda spec: pdf.pdf_to_images(path, dpi=36), deps=("spec",))
+
+            with patch("kalla.vision.openai_client") as client, Profile("test") as profile:
+                client.return_value.chat.completions.create.return_value.choices[0].message.content = "ok"
+                images = pipeline.get("images")
+                vision.analyze_drawing_with_openai(images[0], "dimensions", api_key="sk-test")
+
+        stages = [(s["stage"], s["depth"]) for s in profile.waterfall()]
+        self.assertEqual(stages, [
+            ("pipeline.spec", 0), ("pdf.extract_text", 1), ("pipeline.images", 0), ("pdf.render", 1),
+            ("pdf.png_to_pil", 1), ("encode.base64", 0), ("model.openai", 0)
+        ])
+        self.assertIsInstance(images[0], Image.Image)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for routing jobs between small and large models
+"""
+
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from kalla import routing, extraction
+
+LONG_ANSWER = "Overall length 3000mm, width 1200mm, height 750mm. " * 5
+
+def simple_detail():
+    image = Image.new("RGB", (1200, 850), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((200, 200, 1000, 600), outline="black", width=3)
+    draw.text((550, 170), "800", fill="black")
+    return image
+
+def dense_plan():
+    image = Image.new("RGB", (1200, 850), "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(0, 850, 14):
+        draw.text((10, row), "W-01 900x2100  K-12 600  R25  SCALE 1:50  " * 4, fill="black")
+    return image
+
+class Recorder:
+    """Stand-in for a vision call returning a fixed answer per model"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.models = []
+
+    def __call__(self, image, analysis_type, note=None, model=None):
+        self.models.append(model)
+        return self.answers[model]
+
+class TestClassification(unittest.TestCase):
+    """Test cases for local job classification"""
+
+    def test_pages(self):
+        self.assertEqual(routing.classify_page(Image.new("RGB", (1200, 850), "white")), "blank")
+        self.assertEqual(routing.classify_page(simple_detail()), "simple")
+        self.assertEqual(routing.classify_page(dense_plan()), "dense")
+
+    def test_text(self):
+        self.assertEqual(routing.classify_text("Table 3000 x 1200"), "short_spec")
+        self.assertEqual(routing.classify_text("x" * (routing.LONG_SPEC_CHARS + 1)), "long_spec")
+
+class TestVisionRouting(unittest.TestCase):
+    """Test cases for routed drawing analysis"""
+
+    def setUp(self):
+        self.small, self.large = routing.models("vision")
+        routing.STATS.clear()
+
+    def test_simple_page_stays_on_small_model(self):
+        analyze = Recorder({self.small: LONG_ANSWER})
+        routing.vision_analyzer(analyze)(simple_detail(), "dimensions")
+        self.assertEqual(analyze.models, [self.small])
+
+    def test_dense_page_goes_to_large_model(self):
+        analyze = Recorder({self.large: LONG_ANSWER})
+        routing.vision_analyzer(analyze)(dense_plan(), "dimensions")
+        self.assertEqual(analyze.models, [self.large])
+
+    def test_hedging_answer_is_escalated(self):
+        analyze = Recorder({self.small: "The text is illegible and I cannot read the dimensions.",
+                            self.large: LONG_ANSWER})
+        result = routing.vision_analyzer(analyze)(simple_detail(), "dimensions")
+        self.assertEqual(analyze.models, [self.small, self.large])
+        self.assertEqual(result, LONG_ANSWER)
+        self.assertEqual(routing.STATS.summary()[self.small]["escalations"], 1)
+
+    def test_blank_page_short_answer_is_accepted(self):
+        analyze = Recorder({self.small: "Blank page."})
+        routing.vision_analyzer(analyze)(Image.new("RGB", (1200, 850), "white"), "comprehensive")
+        self.assertEqual(analyze.models, [self.small])
+
+class TestExtractionRouting(unittest.TestCase):
+    """Test cases for routed specification extraction"""
+
+    def setUp(self):
+        self.small, self.large = routing.models("text")
+
+    def test_invalid_json_is_escalated(self):
+        calls = []
+
+        def extract(model):
+            calls.append(model)
+            if model == self.small:
+                raise json.JSONDecodeError("Expecting value", "", 0)
+            return {"project_name": "Boardroom"}
+
+        self.assertEqual(routing.route_extraction(extract, "Table"), {"project_name": "Boardroom"})
+        self.assertEqual(calls, [self.small, self.large])
+
+    def test_chunked_extraction_is_routed_when_enabled(self):
+        def fake_extract(text, document_type, api_key=None, part=None, model=None):
+            if model == self.small:
+                return {"project_name": "", "furniture_type": "", "quantity": "", "materials": []}
+            return {"project_name": "Boardroom", "furniture_type": "table", "quantity": "2", "materials": []}
+
+        with patch.dict(os.environ, {"KALLA_MODEL_ROUTING": "1"}), \
+                patch("kalla.extraction.extract_specifications_with_openai", side_effect=fake_extract) as mocked:
+            spec = extraction.extract_specifications_chunked(["Boardroom table, 2 pieces"], "specification")
+
+        self.assertEqual(spec["project_name"], "Boardroom")
+        self.assertEqual([c.kwargs["model"] for c in mocked.call_args_list], [self.small, self.large])
+
+    def test_routing_disabled_uses_default_model(self):
+        with patch.dict(os.environ, {"KALLA_MODEL_ROUTING": ""}), \
+                patch("kalla.extraction.extract_specifications_with_openai", return_value={}) as mocked:
+            extraction.extract_specifications_chunked(["Boardroom table"], "specification")
+        self.assertNotIn("model", mocked.call_args.kwargs)
+
+if __name__ == '__main__':
+    unittest.main()
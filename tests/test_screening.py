@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for blank and cover page screening
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PIL import Image, ImageDraw
+
+from kalla import pdf
+from kalla.api import analyze_drawing_files
+from kalla.screening import BLANK_INK, classify_content, ink_density, screen_pdf_pages, skipped_result
+
+def grey_photo(width=800, height=600):
+    """A blank sheet photographed under light falling off from left to right"""
+    photo = Image.new("L", (width, height))
+    photo.putdata([int(215 - 90 * x / width) for y in range(height) for x in range(width)])
+    return photo.convert("RGB")
+
+def write_drawing_set(path):
+    """Three A4 pages: empty, a text-only cover sheet and a drawing with outlines and dimensions"""
+    document = fitz.open()
+    document.new_page(width=842, height=595)
+
+    cover = document.new_page(width=842, height=595)
+    cover.insert_text((300, 250), "OAK RECEPTION DESK", fontsize=24)
+    cover.insert_text((300, 290), "Drawing set rev B  -  Project 1234", fontsize=12)
+
+    drawing = document.new_page(width=842, height=595)
+    drawing.draw_rect(fitz.Rect(20, 20, 822, 575))
+    for i in range(12):
+        drawing.draw_rect(fitz.Rect(100 + i * 50, 150, 140 + i * 50, 400))
+        drawing.draw_line(fitz.Point(100 + i * 50, 420), fitz.Point(140 + i * 50, 420))
+        drawing.insert_text((100 + i * 50, 440), "400", fontsize=8)
+    document.save(path)
+    document.close()
+
+class TestScreening(unittest.TestCase):
+    """Test cases for classifying pages before analysis"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "set.pdf")
+        write_drawing_set(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pdf_pages(self):
+        images = pdf.pdf_to_images(self.path, dpi=72)
+        contents = [screening["content"] for screening in screen_pdf_pages(self.path, images)]
+        self.assertEqual(contents, ["blank", "cover", "drawing"])
+
+    def test_raster_images(self):
+        self.assertEqual(classify_content(Image.new("RGB", (800, 600), "white"))["content"], "blank")
+
+        sketch = Image.new("RGB", (800, 600), "white")
+        draw = ImageDraw.Draw(sketch)
+        draw.rectangle((100, 100, 700, 500), outline="black", width=3)
+        draw.line((100, 540, 700, 540), fill="black", width=2)
+        # Raster images have no vector objects to count, so only blank pages are skipped
+        self.assertEqual(classify_content(sketch)["content"], "drawing")
+
+    def test_ink_is_measured_against_the_paper(self):
+        self.assertLess(ink_density(grey_photo()), BLANK_INK)
+        self.assertEqual(classify_content(grey_photo())["content"], "blank")
+
+        sketch = grey_photo()
+        ImageDraw.Draw(sketch).rectangle((100, 100, 700, 500), outline=(40, 40, 40), width=3)
+        on_grey = ink_density(sketch)
+        self.assertGreater(on_grey, BLANK_INK)
+
+        on_white = Image.new("RGB", (800, 600), "white")
+        ImageDraw.Draw(on_white).rectangle((100, 100, 700, 500), outline="black", width=3)
+        self.assertAlmostEqual(on_grey, ink_density(on_white), delta=0.01)
+
+    def test_skipped_result(self):
+        result = skipped_result("set.pdf (Page 1)", {"content": "blank", "reason": "blank page"}, page_number=1)
+        self.assertEqual(result["skipped"], "blank")
+        self.assertEqual(result["analysis_result"], "Skipped: blank page")
+        self.assertEqual(result["page_number"], 1)
+
+    def test_skipped_pages_make_no_model_call(self):
+        calls = []
+
+        def analyze(image, analysis_type, note=None):
+            calls.append(analysis_type)
+            return "Overall length: 3000mm"
+
+        with patch("kalla.vision.drawing_analyzer", return_value=analyze):
+            results = analyze_drawing_files([("set.pdf", self.path)], "dimensions", dpi=72, skip_blank=True)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result.get("skipped") for result in results], ["blank", "cover", None])
+        self.assertEqual(results[2]["analysis_result"], "Overall length: 3000mm")
+        self.assertEqual(results[1]["total_pages"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
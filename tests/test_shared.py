@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for state shared between processes
+"""
+
+import os
+import asyncio
+import sys
+import json
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.testclient import TestClient
+
+from kalla import api
+from kalla.pipeline import Pipeline
+from kalla.shared import SqliteStore, SharedCache, open_store
+from kalla.similarity import QuoteIndex
+
+SPEC = {"furniture_type": "table", "quantity": "2", "dimensions": {"length": "2000", "width": "900"}}
+ESTIMATE = {"total_cost": "1000.00", "price_per_unit": "500.00"}
+
+def append_quotes(path, count):
+    store = SqliteStore(path)
+    for i in range(count):
+        store.append_quote({"timestamp": str(i), "specifications": SPEC, "cost_estimate": ESTIMATE})
+    return count
+
+class TestSharedStore(unittest.TestCase):
+    """Test cases for the SQLite shared store"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "shared.db")
+        self.store = SqliteStore(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache_is_shared_between_stores(self):
+        self.store.set("pipeline", "key", {"total_cost": "10"})
+        self.assertEqual(SqliteStore(self.path).get("pipeline", "key"), {"total_cost": "10"})
+        self.assertIsNone(self.store.get("sections", "key"))
+        self.assertIsInstance(open_store(f"sqlite:///{self.path}"), SqliteStore)
+
+    def test_shared_cache_as_pipeline_memo(self):
+        calls = []
+
+        def run(memo):
+            pipeline = Pipeline(memo)
+            pipeline.add("takeoff", lambda: calls.append(1) or {"lines": [1, 2]}, fingerprint="spec")
+            return pipeline.get("takeoff")
+
+        self.assertEqual(run(SharedCache(self.store, "pipeline")), {"lines": [1, 2]})
+        # Another process with its own local cache is served from the store
+        self.assertEqual(run(SharedCache(SqliteStore(self.path), "pipeline")), {"lines": [1, 2]})
+        self.assertEqual(len(calls), 1)
+
+    def test_values_without_json_stay_local(self):
+        cache = SharedCache(self.store, "tables")
+        value = {"rows": {1, 2}}
+        self.assertIs(cache.set("key", value), value)
+        self.assertIs(cache.get("key"), value)
+        self.assertIsNone(SharedCache(self.store, "tables").get("key"))
+
+    def test_concurrent_appends_from_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            counts = list(executor.map(append_quotes, [self.path] * 4, [25] * 4))
+
+        ids = [quote_id for quote_id, _ in self.store.quotes_since(0)]
+        self.assertEqual(len(ids), sum(counts))
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_quote_index_sees_other_replicas(self):
+        history = os.path.join(self.tmp.name, "quote_history.json")
+        with open(history, "w") as f:
+            json.dump([{"timestamp": "old", "specifications": SPEC, "cost_estimate": ESTIMATE}], f)
+
+        first = QuoteIndex(history, store=self.store)
+        second = QuoteIndex(history, store=SqliteStore(self.path))
+        # The JSON history is imported into the empty store once
+        self.assertEqual((len(first), len(second)), (1, 1))
+
+        first.add(SPEC, ESTIMATE, timestamp="new")
+        self.assertEqual(second.refresh(), 1)
+        self.assertEqual([q["timestamp"] for q in second.quotes], ["old", "new"])
+        self.assertEqual(len(second.frame()), 2)
+
+    def test_jobs_are_visible_from_other_replicas(self):
+        api.jobs.store, previous = self.store, api.jobs.store
+        try:
+            with patch("kalla.pricing.generate_cost_estimate", return_value={"total_cost": "1"}):
+                response = TestClient(api.app).post("/estimates?wait=true", json={"spec_data": {}})
+        finally:
+            api.jobs.store = previous
+
+        other = api.JobStore(store=SqliteStore(self.path))
+        job = asyncio.run(other.get(response.json()["job_id"]))
+        self.assertEqual((job["operation"], job["status"]), ("generate_cost_estimate", "completed"))
+        self.assertIsNone(asyncio.run(other.get("missing")))
+
+    def test_job_endpoint_reads_shared_store(self):
+        self.store.put_job({"job_id": "remote", "operation": "generate_cost_estimate", "status": "completed"})
+        api.jobs.store, previous = self.store, api.jobs.store
+        try:
+            response = TestClient(api.app).get("/jobs/remote")
+        finally:
+            api.jobs.store = previous
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "completed")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for similar-quote retrieval and estimate scaling
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.similarity import QuoteIndex, scale_estimate
+
+TABLE_SPEC = {
+    "project_name": "Office Conference Table",
+    "furniture_type": "Conference Table",
+    "dimensions": {"length": "3000", "width": "1200", "height": "750"},
+    "materials": [
+        {"material_type": "Solid Oak", "quantity": "3.6 sqm"},
+        {"material_type": "Steel Legs", "quantity": "4 pieces"}
+    ],
+    "construction_methods": ["Mortise and tenon joints"],
+    "quantity": "1"
+}
+
+TABLE_ESTIMATE = {
+    "material_costs": [
+        {"item": "Solid Oak", "quantity": "3.6 sqm", "unit_cost": "85.00", "total_cost": "306.00"}
+    ],
+    "labor_costs": [
+        {"operation": "assembly", "hours": "10", "hourly_rate": "30.00", "total_cost": "300.00"}
+    ],
+    "overhead_costs": {"percentage": "10%", "amount": "60.60"},
+    "profit_margin": {"percentage": "0", "amount": "0"},
+    "total_cost": "666.60",
+    "price_per_unit": "666.60"
+}
+
+CABINET_SPEC = {
+    "furniture_type": "Kitchen Cabinet",
+    "dimensions": {"length": "600", "width": "560", "height": "720"},
+    "materials": [{"material_type": "Melamine Board"}],
+    "construction_methods": ["Cam locks"],
+    "quantity": "12"
+}
+
+class TestQuoteIndex(unittest.TestCase):
+    """Test cases for the quote similarity index"""
+
+    def test_nearest_prefers_same_family(self):
+        index = QuoteIndex()
+        index.add(CABINET_SPEC, {"total_cost": "1"})
+        index.add(TABLE_SPEC, TABLE_ESTIMATE)
+
+        larger_table = dict(TABLE_SPEC, dimensions={"length": "3300", "width": "1200", "height": "750"})
+        score, quote = index.nearest(larger_table, k=1)[0]
+
+        self.assertEqual(quote["specifications"]["furniture_type"], "Conference Table")
+        self.assertGreater(score, 0.9)
+
+    def test_suggest_estimate_below_threshold(self):
+        index = QuoteIndex()
+        index.add(CABINET_SPEC, {"total_cost": "1"})
+        self.assertIsNone(index.suggest_estimate(TABLE_SPEC))
+
+    def test_scale_estimate_recomputes_totals(self):
+        double_table = dict(TABLE_SPEC, quantity="2")
+        scaled = scale_estimate(TABLE_ESTIMATE, TABLE_SPEC, double_table)
+
+        self.assertEqual(scaled["material_costs"][0]["total_cost"], "612.00")
+        self.assertEqual(scaled["material_costs"][0]["quantity"], "7.20 sqm")
+        self.assertEqual(scaled["labor_costs"][0]["total_cost"], "600.00")
+        self.assertEqual(scaled["overhead_costs"]["amount"], "121.20")
+        self.assertEqual(scaled["total_cost"], "1333.20")
+        self.assertEqual(scaled["price_per_unit"], "666.60")
+
+    def test_counted_lines_scale_with_piece_count_only(self):
+        estimate = dict(TABLE_ESTIMATE, material_costs=TABLE_ESTIMATE["material_costs"] + [
+            {"item": "Steel Legs", "quantity": "4 pieces", "unit_cost": "25.00", "total_cost": "100.00"}
+        ])
+        longer_pair = dict(TABLE_SPEC, quantity="2", dimensions={"length": "3300", "width": "1200", "height": "750"})
+        oak, legs = scale_estimate(estimate, TABLE_SPEC, longer_pair)["material_costs"]
+
+        self.assertEqual(oak["quantity"], "7.92 sqm")
+        self.assertEqual(legs["quantity"], "8.00 pieces")
+        self.assertEqual(legs["total_cost"], "200.00")
+
+    def test_index_persists_to_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history", "quotes.json")
+            QuoteIndex(path).add(TABLE_SPEC, TABLE_ESTIMATE)
+            self.assertEqual(len(QuoteIndex(path)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for memoized display tables
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.cache import MemoryCache
+from kalla.tables import flatten_json, cost_lines_frame, estimate_tables, json_to_df, memoized, table_memo
+
+ESTIMATE = {
+    "material_costs": [
+        {"item": "Solid Oak", "quantity": "3.6 sqm", "unit_cost": "€85.00", "total_cost": "306.00"},
+        {"item": "Steel Legs", "quantity": "4 pieces", "unit_cost": "25", "total_cost": "100"}
+    ],
+    "labor_costs": [{"operation": "Assembly", "hours": "4", "hourly_rate": "45,50", "total_cost": "182"}]
+}
+
+class TestTables(unittest.TestCase):
+    """Test cases for flattening and normalizing estimate tables"""
+
+    def test_flatten_json(self):
+        frame = flatten_json({
+            "project_name": "Table",
+            "dimensions": {"length": "3000"},
+            "materials": [{"material_type": "Oak"}, {"material_type": "Steel"}],
+            "notes": None
+        })
+        self.assertEqual(frame["Field"].tolist(), [
+            "project_name", "dimensions.length", "materials[0].material_type", "materials[1].material_type", "notes"
+        ])
+        self.assertEqual(frame["Value"].tolist(), ["Table", "3000", "Oak", "Steel", ""])
+
+    def test_numeric_columns_are_parsed(self):
+        frame = cost_lines_frame(ESTIMATE["material_costs"])
+        self.assertEqual(list(frame.columns), ["item", "quantity", "unit", "unit_cost", "total_cost"])
+        self.assertEqual(frame["quantity"].tolist(), [3.6, 4.0])
+        self.assertEqual(frame["unit"].tolist(), ["sqm", "pcs"])
+        self.assertEqual(frame["total_cost"].sum(), 406.0)
+        self.assertEqual(cost_lines_frame(ESTIMATE["labor_costs"])["hourly_rate"].tolist(), [45.5])
+
+    def test_tables_are_memoized_by_content(self):
+        memo = table_memo()
+        first = estimate_tables(memo, ESTIMATE)
+        self.assertIs(estimate_tables(memo, dict(ESTIMATE)), first)
+        changed = dict(ESTIMATE, labor_costs=[])
+        self.assertIsNot(estimate_tables(memo, changed), first)
+        self.assertIs(json_to_df(memo, {"a": 1}), json_to_df(memo, {"a": 1}))
+
+    def test_memo_drops_least_recently_used(self):
+        memo = MemoryCache(max_entries=2)
+        builds = []
+
+        def build(value):
+            builds.append(value)
+            return value
+
+        memoized(memo, "n", build, 1)
+        memoized(memo, "n", build, 2)
+        memoized(memo, "n", build, 1)
+        memoized(memo, "n", build, 3)
+        memoized(memo, "n", build, 1)
+        memoized(memo, "n", build, 2)
+        self.assertEqual(builds, [1, 2, 3, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for region-of-interest tiling of large-format drawings
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from PIL import Image, ImageDraw
+
+from kalla import pdf
+from kalla.tiling import detect_regions, region_label, merge_tile_findings, analyze_tiled, analyze_with_tiles
+
+# Sheet sizes in points
+A1 = (2384, 1684)
+A4 = (842, 595)
+
+def draw_sheet(width=2400, height=1700):
+    """Drawing with a border, plain outlines, a title block bottom-right and a dimension cluster top-left"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((50, 50, width - 50, height - 50), outline="black", width=3)
+    draw.rectangle((600, 500, 1700, 1100), outline="black", width=4)
+    for i in range(20):
+        draw.text((1900, 1400 + i * 12), "TITLE BLOCK 1234 DRAWN BY XX SCALE 1:10", fill="black")
+    for i in range(15):
+        draw.text((200, 200 + i * 12), "1200 mm  R25  8 x 4", fill="black")
+    return image
+
+def write_sheet_pdf(path, size):
+    document = fitz.open()
+    page = document.new_page(width=size[0], height=size[1])
+    page.draw_rect(fitz.Rect(20, 20, size[0] - 20, size[1] - 20))
+    for i in range(30):
+        page.insert_text((size[0] - 400, size[1] - 300 + i * 8), "TITLE BLOCK  DRG 1234  SCALE 1:10", fontsize=6)
+    document.save(path)
+    document.close()
+
+class FakeAnalyze:
+    """Stand-in for a vision call that records notes and the threads it ran on"""
+
+    def __init__(self):
+        self.notes = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, image, analysis_type, note=None):
+        with self._lock:
+            self.notes.append(note)
+            self.threads.add(threading.get_ident())
+        if note is None:
+            return "Overall length: 3000mm\nMaterial: oak"
+        return "Overall length: 3000mm\nDrawing number: 1234"
+
+class TestRegionDetection(unittest.TestCase):
+    """Test cases for dense-region detection"""
+
+    def test_finds_text_clusters_not_outlines(self):
+        boxes = detect_regions(draw_sheet())
+        self.assertEqual([region_label(box) for box in boxes], ["bottom-right", "top-left"])
+        for x0, y0, x1, y1 in boxes:
+            self.assertLess((x1 - x0) * (y1 - y0), 0.25)
+
+    def test_blank_page_has_no_regions(self):
+        self.assertEqual(detect_regions(Image.new("RGB", (800, 600), "white")), [])
+
+    def test_max_regions(self):
+        self.assertEqual(len(detect_regions(draw_sheet(), max_regions=1)), 1)
+
+class TestMerge(unittest.TestCase):
+    """Test cases for merging overview and region findings"""
+
+    def test_repeated_lines_and_errors_are_dropped(self):
+        merged = merge_tile_findings("Length: 3000mm", [
+            ((0.7, 0.7, 1.0, 1.0), "- Length: 3000mm\nDrawing number: 1234"),
+            ((0.0, 0.0, 0.3, 0.3), "Error: timeout")
+        ])
+        self.assertIn("Whole sheet overview:\nLength: 3000mm", merged)
+        self.assertIn("Detail, bottom-right region:\nDrawing number: 1234", merged)
+        self.assertEqual(merged.count("3000mm"), 1)
+        self.assertNotIn("timeout", merged)
+
+    def test_tiles_are_analyzed_concurrently_with_notes(self):
+        analyze = FakeAnalyze()
+        tiles = [((0.7, 0.7, 1.0, 1.0), Image.new("RGB", (10, 10))),
+                 ((0.0, 0.0, 0.3, 0.3), Image.new("RGB", (10, 10)))]
+        merged = analyze_tiled(Image.new("RGB", (10, 10)), tiles, "dimensions", analyze, max_workers=3)
+
+        self.assertEqual(len(analyze.notes), 3)
+        self.assertEqual(sum(1 for note in analyze.notes if note and "bottom-right" in note), 1)
+        self.assertIn("Drawing number: 1234", merged)
+
+class TestLargeFormat(unittest.TestCase):
+    """Test cases for choosing between whole-page and tiled analysis"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def analyze_page(self, size):
+        path = os.path.join(self.tmp.name, "sheet.pdf")
+        write_sheet_pdf(path, size)
+        analyze = FakeAnalyze()
+        overview = pdf.render_pdf_page(path, 0, dpi=50)
+        result, boxes = analyze_with_tiles(overview, "dimensions", analyze, pdf_file=path, page_number=0)
+        return result, boxes, analyze
+
+    def test_a1_sheet_is_tiled(self):
+        result, boxes, analyze = self.analyze_page(A1)
+        self.assertTrue(boxes)
+        self.assertEqual(len(analyze.notes), len(boxes) + 1)
+        self.assertIn("Detail, bottom-right region", result)
+
+    def test_a4_sheet_is_sent_whole(self):
+        result, boxes, analyze = self.analyze_page(A4)
+        self.assertEqual(boxes, [])
+        self.assertEqual(analyze.notes, [None])
+
+    def test_regions_are_rendered_at_high_resolution(self):
+        path = os.path.join(self.tmp.name, "sheet.pdf")
+        write_sheet_pdf(path, A1)
+        crop, = pdf.render_pdf_regions(path, 0, [(0.5, 0.5, 1.0, 1.0)], dpi=300, max_pixels=2048)
+        self.assertEqual(max(crop.size), 2048)
+
+if __name__ == '__main__':
+    unittest.main()
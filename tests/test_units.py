@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for number and unit parsing of model output
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.units import to_number, to_numbers, parse_measure, parse_measures, to_mm, format_money
+from kalla.normalize import normalize_spec, normalize_estimate, normalize_quote, quotes_frame
+from kalla.similarity import QuoteIndex
+
+class TestUnits(unittest.TestCase):
+    """Test cases for parsing numbers, units, sizes and ranges"""
+
+    def test_thousands_and_decimal_separators(self):
+        self.assertEqual(to_number("€1,234.50"), 1234.5)
+        self.assertEqual(to_number("1.234,50 EUR"), 1234.5)
+        self.assertEqual(to_number("85,50"), 85.5)
+        self.assertEqual(to_number("1,234"), 1234.0)
+        self.assertEqual(to_number("0,125 m3"), 0.125)
+        self.assertEqual(to_number("1234,567"), 1234.567)
+        self.assertEqual(to_number("3.6 sqm"), 3.6)
+        self.assertEqual(to_numbers(["1,234.50", "85,50", "n/a"]).tolist()[:2], [1234.5, 85.5])
+
+    def test_units_are_canonical(self):
+        self.assertEqual(parse_measure("120 cm")["value"], 1200.0)
+        self.assertEqual(parse_measure("3 m")["unit"], "mm")
+        self.assertEqual(parse_measure("3.6 m²")["unit"], "sqm")
+        self.assertEqual(parse_measure("4 pieces")["unit"], "pcs")
+        self.assertEqual(parse_measure("€85.00")["unit"], "EUR")
+        self.assertEqual(parse_measure("14 days")["value"], 2.0)
+        self.assertEqual(to_mm("3 m"), 3000.0)
+        self.assertIsNone(to_mm("3.6 sqm"))
+
+    def test_sizes_and_ranges(self):
+        size = parse_measure("1200 x 800 x 750 mm")
+        self.assertEqual(size["values"], [1200.0, 800.0, 750.0])
+        self.assertEqual(size["unit"], "mm")
+        self.assertEqual(parse_measure("40x40mm")["values"], [40.0, 40.0])
+
+        delivery = parse_measure("4-6 weeks")
+        self.assertEqual((delivery["low"], delivery["high"], delivery["value"]), (4.0, 6.0, 5.0))
+        self.assertIsNone(parse_measure("to be confirmed")["value"])
+
+    def test_parse_measures(self):
+        frame = parse_measures(["3.6 sqm", None, "2 m"])
+        self.assertEqual(frame["unit"].tolist(), ["sqm", "", "mm"])
+        self.assertEqual(frame["value"].fillna(-1).tolist(), [3.6, -1, 2000.0])
+
+    def test_format_money(self):
+        self.assertEqual(format_money("1234.5"), "€1,234.50")
+        self.assertEqual(format_money(None), "N/A")
+
+class TestNormalize(unittest.TestCase):
+    """Test cases for typed specification and estimate records"""
+
+    ESTIMATE = {
+        "material_costs": [{"item": "Solid Oak", "quantity": "3.6 sqm", "unit_cost": "€85.00", "total_cost": "€306.00"}],
+        "labor_costs": [{"operation": "Assembly", "hours": "4 hours", "hourly_rate": "45", "total_cost": "180"}],
+        "overhead_costs": {"percentage": "15%", "amount": "72.90"},
+        "total_cost": "€1,100.00",
+        "delivery_timeline": "4-6 weeks"
+    }
+
+    def test_normalize_spec(self):
+        spec = normalize_spec({"dimensions": {"length": "3 m", "width": "1200"}, "quantity": "8 pieces",
+                               "materials": [{"material_type": "Oak", "quantity": "3.6 m2"}]})
+        self.assertEqual((spec["length_mm"], spec["width_mm"], spec["height_mm"]), (3000.0, 1200.0, None))
+        self.assertEqual(spec["quantity"], 8.0)
+        self.assertEqual(spec["materials"][0]["quantity_unit"], "sqm")
+
+    def test_normalize_estimate(self):
+        estimate = normalize_estimate(self.ESTIMATE)
+        self.assertEqual(estimate["lines_total"], 486.0)
+        self.assertEqual(estimate["total_cost"], 1100.0)
+        self.assertEqual(estimate["overhead_percentage"], 15.0)
+        self.assertEqual(estimate["material_costs"][0]["quantity_unit"], "sqm")
+        self.assertEqual((estimate["delivery_weeks_low"], estimate["delivery_weeks_high"]), (4.0, 6.0))
+
+    def test_quote_index_frame(self):
+        index = QuoteIndex()
+        index.add({"project_name": "A", "dimensions": {"length": "3000"}}, self.ESTIMATE)
+        index.add({"project_name": "B", "dimensions": {"length": "2 m"}}, dict(self.ESTIMATE, total_cost="900"))
+        frame = index.frame()
+        self.assertEqual(frame["total_cost"].sum(), 2000.0)
+        self.assertEqual(frame["length_mm"].tolist(), [3000.0, 2000.0])
+        self.assertEqual(quotes_frame([normalize_quote({})]).shape[0], 1)
+
+if __name__ == '__main__':
+    unittest.main()
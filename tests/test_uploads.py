@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed upload store
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+
+from kalla import pdf
+from kalla.prefetch import prepare_file
+from kalla.uploads import store_upload, store_uploads, prune_uploads
+
+class Upload(io.BytesIO):
+    """Stand-in for a Streamlit UploadedFile"""
+
+    def __init__(self, data, name, type="application/pdf", file_id=None):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+        self.file_id = file_id or name
+
+def pdf_bytes(*pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+class TestUploads(unittest.TestCase):
+    """Test cases for storing uploads and reading them from disk"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_store_is_content_addressed(self):
+        data = pdf_bytes("Oak desk")
+        first = store_upload(Upload(data, "Tender.PDF"), self.store)
+        second = store_upload(Upload(data, "copy.pdf"), self.store)
+
+        self.assertEqual(first.path, second.path)
+        self.assertTrue(first.path.endswith(".pdf"))
+        self.assertEqual((first.name, first.type, first.size), ("Tender.PDF", "application/pdf", len(data)))
+        self.assertEqual(os.listdir(self.store), [os.path.basename(first.path)])
+        with first.mmap() as mapped:
+            self.assertEqual(mapped[:], data)
+
+    def test_handles_read_from_disk(self):
+        stored = store_upload(Upload(pdf_bytes("Oak desk", "Steel legs"), "spec.pdf"), self.store)
+
+        self.assertEqual([text.strip() for text in pdf.extract_pages_from_pdf(stored)], ["Oak desk", "Steel legs"])
+        self.assertEqual(len(pdf.pdf_to_images(stored, dpi=30)), 2)
+        self.assertEqual(len(prepare_file(stored, is_pdf=True, screen=False)["images"]), 2)
+
+    def test_store_uploads_reuses_handles(self):
+        handles = {}
+        upload = Upload(pdf_bytes("Oak desk"), "spec.pdf")
+        first = store_uploads([upload], handles, self.store)[0]
+        os.utime(first.path, (0, 0))
+
+        second = store_uploads([upload], handles, self.store)[0]
+        self.assertIs(first, second)
+        # Reuse marks the file as in use
+        self.assertGreater(os.path.getmtime(first.path), 0)
+
+        store_uploads([Upload(pdf_bytes("Walnut"), "other.pdf")], handles, self.store)
+        self.assertEqual(list(handles), ["other.pdf"])
+
+    def test_prune_uploads(self):
+        stored = store_upload(Upload(pdf_bytes("Oak desk"), "spec.pdf"), self.store)
+        self.assertEqual(prune_uploads(self.store, max_age_hours=1), 0)
+        old = time.time() - 2 * 3600
+        os.utime(stored.path, (old, old))
+        self.assertEqual(prune_uploads(self.store, max_age_hours=1), 1)
+        self.assertFalse(os.path.exists(stored.path))
+
+if __name__ == '__main__':
+    unittest.main()
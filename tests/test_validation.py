@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for estimate consistency checks
+"""
+
+import os
+import sys
+import json
+import unittest
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kalla.validation import structure_issues, arithmetic_issues, reconcile_estimate, checked_estimate
+
+def make_estimate():
+    return {
+        "material_costs": [
+            {"item": "Solid Oak", "quantity": "3.6 sqm", "unit_cost": "€85.00", "total_cost": "360.00"},
+            {"item": "Steel Legs", "quantity": "4 pieces", "unit_cost": "25", "total_cost": "100.00"}
+        ],
+        "labor_costs": [{"operation": "Assembly", "hours": "2", "hourly_rate": "40", "total_cost": "80.00"}],
+        "overhead_costs": {"percentage": "10", "amount": "50.00"},
+        "total_cost": "600.00",
+        "price_per_unit": "300.00"
+    }
+
+class TestValidation(unittest.TestCase):
+    """Test cases for reconciling model estimates"""
+
+    def test_consistent_estimate_has_no_issues(self):
+        estimate = reconcile_estimate(make_estimate(), pieces=2)
+        self.assertEqual(arithmetic_issues(estimate, pieces=2), [])
+
+    def test_arithmetic_issues(self):
+        fields = [issue["field"] for issue in arithmetic_issues(make_estimate(), pieces=2)]
+        self.assertEqual(fields, ["material_costs[0].total_cost", "overhead_costs.amount", "total_cost", "price_per_unit"])
+
+    def test_reconcile_corrects_totals(self):
+        estimate = make_estimate()
+        reconciled = reconcile_estimate(estimate, pieces=2)
+
+        self.assertEqual(reconciled["material_costs"][0]["total_cost"], "306.00")
+        self.assertEqual(reconciled["overhead_costs"]["amount"], "48.60")
+        self.assertEqual(reconciled["total_cost"], "534.60")
+        self.assertEqual(reconciled["price_per_unit"], "267.30")
+        self.assertEqual(reconciled["consistency"]["corrections"][0]["expected"], 306.0)
+        # The input is left unchanged
+        self.assertEqual(estimate["total_cost"], "600.00")
+
+    def test_structure_issues(self):
+        self.assertEqual(structure_issues(make_estimate()), [])
+        self.assertEqual(structure_issues({"total_cost": "100"}), ["estimate has no cost lines"])
+        self.assertEqual(structure_issues("not json"), ["estimate is not a JSON object"])
+        broken = {"material_costs": [{"item": "Oak", "quantity": "some"}]}
+        self.assertEqual(structure_issues(broken), ["material_costs[0] has no usable total_cost"])
+        self.assertEqual(structure_issues({"material_costs": [{"item": "Oak", "quantity": "2"}]}, priced=False), [])
+        unreadable = dict(make_estimate(), profit_margin={"percentage": "market rate", "amount": "60.00"})
+        self.assertEqual(structure_issues(unreadable), ["profit_margin has no usable percentage"])
+
+    def test_unreadable_percentage_keeps_its_amount(self):
+        estimate = dict(make_estimate(), overhead_costs={"percentage": "standard", "amount": "50.00"})
+        self.assertNotIn("overhead_costs.amount", [issue["field"] for issue in arithmetic_issues(estimate)])
+        reconciled = reconcile_estimate(estimate)
+        self.assertEqual(reconciled["overhead_costs"]["amount"], "50.00")
+        self.assertEqual(reconciled["total_cost"], "536.00")
+
+    def test_arithmetic_errors_do_not_regenerate(self):
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return make_estimate()
+
+        estimate = checked_estimate(generate, pieces=2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(estimate["total_cost"], "534.60")
+        self.assertEqual(estimate["consistency"]["regenerations"], 0)
+
+    def test_broken_structure_regenerates_once(self):
+        responses = [{"total_cost": "100"}, make_estimate()]
+        estimate = checked_estimate(lambda: responses.pop(0), pieces=2, max_regenerations=1)
+        self.assertEqual(responses, [])
+        self.assertEqual(estimate["total_cost"], "534.60")
+        self.assertEqual(estimate["consistency"]["regenerations"], 1)
+
+    def test_invalid_json_and_non_objects_regenerate(self):
+        def invalid_json():
+            return json.loads("{\"material_costs\": [")
+
+        responses = [invalid_json, lambda: ["not", "an", "object"], make_estimate]
+        estimate = checked_estimate(lambda: responses.pop(0)(), pieces=2, max_regenerations=2)
+        self.assertEqual(responses, [])
+        self.assertEqual(estimate["total_cost"], "534.60")
+        self.assertEqual(estimate["consistency"]["regenerations"], 2)
+
+        estimate = checked_estimate(invalid_json, max_regenerations=1)
+        self.assertEqual(estimate["consistency"]["regenerations"], 1)
+        self.assertTrue(estimate["consistency"]["structure_issues"][0].startswith("response is not valid JSON"))
+
+    def test_unreadable_percentage_regenerates(self):
+        responses = [dict(make_estimate(), overhead_costs={"percentage": "n/a", "amount": "50.00"}), make_estimate()]
+        estimate = checked_estimate(lambda: responses.pop(0), pieces=2, max_regenerations=1)
+        self.assertEqual(estimate["overhead_costs"]["amount"], "48.60")
+        self.assertEqual(estimate["consistency"]["regenerations"], 1)
+
+    def test_still_broken_estimate_is_flagged(self):
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return {"total_cost": "100"}
+
+        estimate = checked_estimate(generate, max_regenerations=1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(estimate["total_cost"], "100")
+        self.assertEqual(estimate["consistency"]["structure_issues"], ["estimate has no cost lines"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for combined multi-section drawing analysis and image encoding
+"""
+
+import json
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the path so we can import kalla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from kalla.cache import image_digest
+from kalla.prompts import SECTION_TYPES
+from kalla import vision
+from kalla.vision import (
+    parse_sections, encode_image, analyze_drawing_sections_with_openai, analyze_drawing_with_openai,
+    analyze_drawing_with_anthropic
+)
+
+class TestSections(unittest.TestCase):
+    """Test cases for parsing combined analysis responses"""
+
+    def test_parse_sections_with_code_fence_and_lists(self):
+        text = "```json\n" + json.dumps({
+            "dimensions": "Length 3000mm",
+            "materials": ["Oak top", "Steel legs"],
+            "construction": {"joints": "mortise and tenon"},
+            "complexity": "Medium"
+        }) + "\n```"
+        sections = parse_sections(text)
+
+        self.assertEqual(sections["materials"], "- Oak top\n- Steel legs")
+        self.assertEqual(sections["construction"], "joints: mortise and tenon")
+        self.assertIn("DIMENSIONS\nLength 3000mm", sections["comprehensive"])
+        self.assertIn("COMPLEXITY\nMedium", sections["comprehensive"])
+
+    def test_invalid_response_is_an_error_for_every_section(self):
+        sections = parse_sections("I cannot read this drawing.")
+        self.assertEqual(set(sections), set(SECTION_TYPES + ["comprehensive"]))
+        self.assertTrue(all(text.startswith("Error") for text in sections.values()))
+
+    def test_one_call_answers_all_types(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices = [
+            MagicMock(message=MagicMock(content=json.dumps({t: f"{t} answer" for t in SECTION_TYPES})))
+        ]
+        with patch("kalla.vision.openai_client", return_value=client):
+            sections = analyze_drawing_sections_with_openai(Image.new("RGB", (20, 20)), api_key="sk-test")
+
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+        self.assertEqual(sections["materials"], "materials answer")
+        prompt = client.chat.completions.create.call_args.kwargs["messages"][1]["content"][0]["text"]
+        for analysis_type in SECTION_TYPES:
+            self.assertIn(f'"{analysis_type}"', prompt)
+
+    def test_image_digest_follows_pixels(self):
+        white = Image.new("RGB", (20, 20), "white")
+        self.assertEqual(image_digest(white), image_digest(white.copy()))
+        self.assertNotEqual(image_digest(white), image_digest(Image.new("RGB", (20, 20), "black")))
+
+class TestEncoding(unittest.TestCase):
+    """Test cases for the shared image payload"""
+
+    def test_one_encoding_serves_every_provider_and_analysis_type(self):
+        openai = MagicMock()
+        openai.chat.completions.create.return_value.choices = [MagicMock(message=MagicMock(content="ok"))]
+        anthropic = MagicMock()
+        anthropic.messages.create.return_value.content = [MagicMock(text="ok")]
+        image = Image.new("RGB", (200, 100), "white")
+
+        with patch("kalla.vision.openai_client", return_value=openai), \
+                patch("kalla.vision.anthropic_client", return_value=anthropic), \
+                patch("kalla.vision.base64.b64encode", wraps=vision.base64.b64encode) as b64encode:
+            for analysis_type in ("dimensions", "materials"):
+                analyze_drawing_with_openai(image, analysis_type, api_key="sk-test")
+            analyze_drawing_with_anthropic(image, "dimensions", api_key="sk-ant-test")
+
+        self.assertEqual(b64encode.call_count, 1)
+        url = openai.chat.completions.create.call_args.kwargs["messages"][1]["content"][1]["image_url"]["url"]
+        source = anthropic.messages.create.call_args.kwargs["messages"][0]["content"][1]["source"]
+        self.assertEqual(url, f"data:image/jpeg;base64,{source['data']}")
+
+    def test_payloads_follow_the_pixels(self):
+        image = Image.new("RGB", (200, 100), "white")
+        jpeg = encode_image(image)
+        self.assertIs(encode_image(image), jpeg)
+        # The same page rendered again is a new object with the same pixels
+        self.assertIs(encode_image(image.copy()), jpeg)
+        self.assertEqual(encode_image(image, "png")[0], "image/png")
+
+        # Edited in place at the same size, e.g. an annotation
+        ImageDraw.Draw(image).line((0, 0, 200, 100), fill="black")
+        annotated = encode_image(image)
+        self.assertNotEqual(annotated, jpeg)
+
+        image.thumbnail((50, 50))
+        self.assertNotEqual(encode_image(image), annotated)
+        with self.assertRaises(ValueError):
+            encode_image(image, "tiff")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,102 @@
 import os
 import streamlit as st
-from dotenv import load_dotenv
+from kalla.config import load_api_keys as load_api_keys_from_env
 
 def load_api_keys():
     """Load API keys from .env file and set them in session state"""
-    # Load environment variables from .env file
-    load_dotenv()
-    
-    # Get API keys from environment variables
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
+    api_keys_loaded = load_api_keys_from_env()
     
     # Set API keys in session state if not already set and keys are not empty
-    if openai_api_key and openai_api_key.strip() != '' and 'openai_api_key' not in st.session_state:
-        st.session_state.openai_api_key = openai_api_key
+    if api_keys_loaded['openai_api_key'] and 'openai_api_key' not in st.session_state:
+        st.session_state.openai_api_key = os.getenv("OPENAI_API_KEY")
     
-    if anthropic_api_key and anthropic_api_key.strip() != '' and 'anthropic_api_key' not in st.session_state:
-        st.session_state.anthropic_api_key = anthropic_api_key
+    if api_keys_loaded['anthropic_api_key'] and 'anthropic_api_key' not in st.session_state:
+        st.session_state.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
     
-    return {
-        'openai_api_key': openai_api_key is not None and openai_api_key.strip() != '',
-        'anthropic_api_key': anthropic_api_key is not None and anthropic_api_key.strip() != ''
-    } 
\ No newline at end of file
+    return api_keys_loaded
+
+# Profiled runs kept per session for the sidebar panel
+PROFILE_RUNS = 10
+
+def start_profile(page):
+    """Show the sidebar Profiling options and start profiling this run of page when enabled.
+
+    Returns the started kalla.profiling.Profile, or None when profiling is off.
+    """
+    from kalla import profiling
+
+    # A run interrupted by a rerun or st.stop() never reached finish_profile; stopping it also
+    # frees cProfile and tracemalloc for other sessions
+    for stale in (profiling.current(), st.session_state.get(f"profile_active_{page}")):
+        if stale is not None:
+            stale.stop()
+
+    with st.sidebar:
+        st.header("Profiling")
+        enabled = st.checkbox("Profile page runs", value=profiling.PROFILE_ENABLED, key=f"profile_{page}")
+        if not enabled:
+            return None
+        use_cprofile = st.checkbox("cProfile", value=profiling.PROFILE_CPROFILE, key=f"profile_cprofile_{page}")
+        use_tracemalloc = st.checkbox("tracemalloc", value=profiling.PROFILE_TRACEMALLOC,
+                                      key=f"profile_tracemalloc_{page}")
+    profile = profiling.Profile(page, cprofile=use_cprofile, memory=use_tracemalloc).start()
+    st.session_state[f"profile_active_{page}"] = profile
+    return profile
+
+def finish_profile(profile):
+    """Stop and dump a run started by start_profile and show the session's recent runs in the sidebar"""
+    if profile is None:
+        return
+    import time
+    import pandas as pd
+    import altair as alt
+
+    profile.stop()
+    summary = profile.summary()
+    summary["path"] = profile.dump()
+    runs = st.session_state.setdefault(f"profile_runs_{profile.name}", [])
+    runs.append(summary)
+    del runs[:-PROFILE_RUNS]
+
+    with st.sidebar:
+        labels = [
+            f"{time.strftime('%H:%M:%S', time.localtime(run['started_at']))}: "
+            f"{run['seconds']:.2f} s, {len(run['stages'])} stages"
+            for run in runs
+        ]
+        index = st.selectbox("Run", range(len(runs)), index=len(runs) - 1, format_func=lambda i: labels[i],
+                             key=f"profile_run_{profile.name}")
+        run = runs[index]
+
+        if run["stages"]:
+            # One bar per stage from its start to its end, indented by nesting depth
+            stages = pd.DataFrame(run["stages"])
+            stages["end"] = stages["start"] + stages["seconds"]
+            stages["label"] = [
+                f"{i:>3} {'  ' * entry['depth']}{entry['stage']}" for i, entry in enumerate(run["stages"])
+            ]
+            stages["kind"] = stages["stage"].str.split(".").str[0]
+            chart = alt.Chart(stages).mark_bar().encode(
+                x=alt.X("start:Q", title="seconds"),
+                x2="end:Q",
+                y=alt.Y("label:N", sort=None, title=None),
+                color=alt.Color("kind:N", legend=None),
+                tooltip=["stage", "thread", alt.Tooltip("seconds:Q", format=".3f")]
+            ).properties(height=max(120, 18 * len(stages)))
+            st.altair_chart(chart, use_container_width=True)
+            st.dataframe(pd.DataFrame(run["totals"]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No profiled stages ran.")
+
+        if run["top_functions"]:
+            st.caption("cProfile, by cumulative time")
+            st.dataframe(pd.DataFrame(run["top_functions"], columns=["function", "seconds", "calls"]),
+                         use_container_width=True, hide_index=True)
+        if run["top_allocations"]:
+            st.caption("tracemalloc, largest allocation sites")
+            st.dataframe(pd.DataFrame(run["top_allocations"], columns=["line", "KiB", "blocks"]),
+                         use_container_width=True, hide_index=True)
+        if run.get("tools_busy"):
+            st.caption("cProfile and tracemalloc were in use by another session's run, so this run "
+                       "has stage timings only")
+        st.caption(f"Saved to {run['path']}")